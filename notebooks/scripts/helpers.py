@@ -3,6 +3,7 @@ import json
 import random
 import unicodedata
 import numpy as np
+from scipy import sparse
 from tqdm import tqdm
 from nltk.stem import PorterStemmer
 import sys
@@ -43,15 +44,18 @@ def stem_keywords(courses):
 
 
 def keyword_intersection(courses):
-    intersects = np.zeros((len(courses), len(courses)))
-
-    for i, course in tqdm(enumerate(courses), total=len(courses)):
-        for j, other_course in enumerate(courses):
-            intersects[i, j] = len(
-                set(course["KEYWORDS"]) & set(other_course["KEYWORDS"])
-            )
-
-    return intersects
+    # Intersection counts as X·Xᵀ of the binary course x keyword matrix X; the sparse
+    # assets for the backend are built by `python -m scripts.build_intersections`
+    vocabulary = {}
+    rows, columns = [], []
+    for i, course in enumerate(courses):
+        for keyword in set(course["KEYWORDS"]):
+            rows.append(i)
+            columns.append(vocabulary.setdefault(keyword, len(vocabulary)))
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(courses), len(vocabulary))
+    )
+    return (incidence @ incidence.T).toarray()
 
 
 def get_only_generated_info(courses):
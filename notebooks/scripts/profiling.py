@@ -7,11 +7,13 @@ from typing import List, Callable, Literal
 import numpy as np
 
 from app.courses import CourseClient
+from app.recommend.store import EmbeddingStore
 from app.types import CourseWithId
 
 # Initialize the CourseClient
 course_client = CourseClient("./assets/courses/")
 all_embeds = np.load("./assets/embeddings_tomas_03.npy", allow_pickle=True)
+embedding_store = EmbeddingStore(all_embeds, course_client)
 
 def get_random_course_codes(n: int) -> List[str]:
     """Get random course codes from the course client"""
@@ -47,7 +49,7 @@ def line_profiler_analysis():
             liked_codes,
             disliked_codes,
             [],
-            all_embeds,
+            embedding_store,
             course_client,
             1,
             0.8
@@ -0,0 +1,149 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+# Directory of the mapped layout inside the asset directory, and its manifest
+MAPPED_DIR = "mapped"
+MANIFEST_NAME = "manifest.json"
+LAYOUT_VERSION = 1
+
+
+class MappedAssets:
+    """
+    Read side of the mapped asset layout: raw, uncompressed arrays opened with `np.memmap`.
+
+    Every array is a headerless `.bin` file, so its data starts at offset 0 and is page
+    aligned; dtype and shape are recorded in `manifest.json`. The arrays are never copied
+    into process memory, so every worker process maps the same page-cache pages.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: Directory with `manifest.json` and the `.bin` files.
+        :raises FileNotFoundError: If there is no manifest.
+        :raises ValueError: If the manifest has an unsupported layout version.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        if self.manifest.get("version") != LAYOUT_VERSION:
+            raise ValueError(f"Unsupported mapped asset layout version {self.manifest.get('version')}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest["arrays"] or name in self.manifest["matrices"]
+
+    def array(self, name: str) -> npt.NDArray:
+        """
+        Maps an array read-only.
+        """
+        entry = self.manifest["arrays"][name]
+        shape = tuple(entry["shape"])
+        if 0 in shape:
+            # Empty files cannot be mapped
+            return np.empty(shape, dtype=np.dtype(entry["dtype"]))
+        return np.memmap(os.path.join(self.directory, entry["file"]), dtype=np.dtype(entry["dtype"]), mode="r", shape=shape)
+
+    def csr(self, name: str) -> sp.csr_matrix:
+        """
+        Builds a CSR matrix on top of its mapped data, indices and indptr arrays, without copying them.
+        """
+        entry = self.manifest["matrices"][name]
+        matrix = sp.csr_matrix(
+            (self.array(f"{name}.data"), self.array(f"{name}.indices"), self.array(f"{name}.indptr")),
+            shape=tuple(entry["shape"]),
+            copy=False,
+        )
+        # Written in canonical form; flagging it keeps scipy from sorting the read-only arrays in place
+        matrix.has_sorted_indices = True
+        matrix.has_canonical_format = True
+        return matrix
+
+    def files(self) -> List[str]:
+        """
+        Paths of all mapped files, e.g. to attribute shared pages in a memory report.
+        """
+        return [os.path.join(self.directory, entry["file"]) for entry in self.manifest["arrays"].values()]
+
+    def stale_sources(self, assets_dir: str) -> List[str]:
+        """
+        Source files that changed since the layout was written.
+
+        :param assets_dir: Directory the source paths in the manifest are relative to.
+        :return: Relative paths of sources that are missing or differ in size or modification time.
+        """
+        stale = []
+        for source, recorded in self.manifest.get("sources", {}).items():
+            try:
+                stat = os.stat(os.path.join(assets_dir, source))
+            except OSError:
+                stale.append(source)
+                continue
+            if stat.st_size != recorded["size"] or stat.st_mtime_ns != recorded["mtime_ns"]:
+                stale.append(source)
+        return stale
+
+
+class MappedAssetWriter:
+    """
+    Write side of the mapped asset layout, the manifest is written by `close`.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest: Dict[str, Any] = {"version": LAYOUT_VERSION, "arrays": {}, "matrices": {}, "sources": {}}
+
+    def add_array(self, name: str, array: npt.ArrayLike) -> None:
+        """
+        Writes an array as a raw little-endian, C-ordered `.bin` file.
+        """
+        array = np.ascontiguousarray(array)
+        dtype = array.dtype.newbyteorder("<") if array.dtype.byteorder == ">" else array.dtype
+        array = array.astype(dtype, copy=False)
+        if dtype.hasobject:
+            raise TypeError(f"Array {name} has dtype {dtype}, which cannot be mapped")
+        file = f"{name}.bin"
+        array.tofile(os.path.join(self.directory, file))
+        self.manifest["arrays"][name] = {"file": file, "dtype": dtype.str, "shape": list(array.shape)}
+
+    def add_csr(self, name: str, matrix: sp.spmatrix, index_dtype: Optional[np.dtype] = None) -> None:
+        """
+        Writes a sparse matrix in canonical CSR form as three arrays.
+
+        :param index_dtype: Dtype of indices and indptr, int32 when the matrix fits (as scipy would pick).
+        """
+        matrix = sp.csr_matrix(matrix, copy=True)
+        matrix.sum_duplicates()
+        matrix.sort_indices()
+        if index_dtype is None:
+            index_dtype = np.int32 if max(matrix.nnz, *matrix.shape) <= np.iinfo(np.int32).max else np.int64
+        self.add_array(f"{name}.data", matrix.data)
+        self.add_array(f"{name}.indices", matrix.indices.astype(index_dtype, copy=False))
+        self.add_array(f"{name}.indptr", matrix.indptr.astype(index_dtype, copy=False))
+        self.manifest["matrices"][name] = {"shape": list(matrix.shape), "nnz": int(matrix.nnz)}
+
+    def add_source(self, assets_dir: str, source: str) -> None:
+        """
+        Records size and modification time of a source file so stale layouts can be detected.
+        """
+        stat = os.stat(os.path.join(assets_dir, source))
+        self.manifest["sources"][source] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def close(self) -> None:
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def open_mapped_assets(assets_dir: str) -> Optional[MappedAssets]:
+    """
+    Opens the mapped layout of an asset directory, None if it has not been converted.
+    """
+    directory = os.path.join(assets_dir, MAPPED_DIR)
+    if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return None
+    return MappedAssets(directory)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class ResultCache(Generic[T]):
+    """
+    In-process LRU cache with a TTL and single-flight deduplication.
+
+    Concurrent requests for a key that is being computed await the same future
+    instead of computing it again. Results computed before an `invalidate()` are
+    never stored, so a reload cannot be overwritten by a request that started earlier.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param maxsize: Maximum number of cached results, 0 disables caching (single-flight still applies).
+        :param ttl: Seconds a result stays valid.
+        :param clock: Monotonic time source.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the cached result of `key`, computing it at most once at a time.
+
+        :param key: Canonical, hashable cache key.
+        :param compute: Coroutine factory producing the result on a miss.
+        :return: The cached or freshly computed result. Exceptions are propagated to every waiter and never cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > self._clock():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return value
+            del self._entries[key]
+            self._counters["expirations"] += 1
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self._counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        generation = self._generation
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+        future.set_result(value)
+        if generation == self._generation:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: T) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self) -> None:
+        """
+        Drops every cached result and detaches computations that are still running.
+        """
+        self._entries.clear()
+        self._pending.clear()
+        self._generation += 1
+        self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache counters and current size.
+        """
+        return {**self._counters, "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl, "in_flight": len(self._pending)}
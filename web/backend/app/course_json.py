@@ -0,0 +1,100 @@
+import json
+from dataclasses import asdict, fields as dataclass_fields
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from app.courses import CourseClient
+from app.types import CourseSummary, Recommendation
+
+# Per-request fields that are never part of the stored course record
+REQUEST_FIELDS = ("ID", "SIMILARITY", "RECOMMENDED_FROM")
+SUMMARY_FIELDS = [f.name for f in dataclass_fields(CourseSummary) if f.name not in REQUEST_FIELDS]
+
+
+def encode_json(value) -> bytes:
+    """
+    Encodes a value the same way FastAPI's JSONResponse does.
+    """
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class CourseJSONCache:
+    """
+    Course records pre-encoded once as JSON fragments for the full and summary views.
+
+    A fragment is the encoded record including `ID` but without the closing brace, so a
+    response is assembled by appending the per-request `SIMILARITY` and `RECOMMENDED_FROM`
+    and joining the fragments, without building or validating any course objects.
+    """
+
+    def __init__(self, courseClient: CourseClient, full_cache_size: Optional[int] = None, chunk_size: int = 1024) -> None:
+        """
+        :param courseClient: Client providing the course records.
+        :param full_cache_size: Encode full records lazily into an LRU of this size instead of
+            all at startup, meant for the lean catalogue mode. None encodes everything eagerly.
+        :param chunk_size: Number of courses hydrated at once while encoding.
+        """
+        self.courseClient = courseClient
+        ids = courseClient.df["ID"].to_numpy()
+
+        self._summary: Dict[int, bytes] = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            for course_id, record in zip(chunk.tolist(), courseClient.project_courses(chunk, SUMMARY_FIELDS + ["ID"])):
+                self._summary[course_id] = encode_json(record)[:-1]
+
+        self._full: Dict[int, bytes] = {}
+        if full_cache_size is None:
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                for course_id, course in zip(chunk.tolist(), courseClient.get_courses_by_ids(chunk)):
+                    self._full[course_id] = self._encode_full(course)
+            self._full_fragment = self._full.get
+        else:
+            self._full_fragment = lru_cache(maxsize=full_cache_size)(self._load_full)
+
+    @staticmethod
+    def _encode_full(course) -> bytes:
+        record = asdict(course)
+        del record["SIMILARITY"], record["RECOMMENDED_FROM"]
+        return encode_json(record)[:-1]
+
+    def _load_full(self, course_id: int) -> Optional[bytes]:
+        course = self.courseClient.get_course_by_id(course_id)
+        return None if course is None else self._encode_full(course)
+
+    def fragment(self, course_id: int, summary: bool) -> Optional[bytes]:
+        """
+        Returns the open JSON fragment of a course, None for unknown IDs.
+        """
+        return self._summary.get(course_id) if summary else self._full_fragment(course_id)
+
+    def encode_course(self, course_id: int, summary: bool, similarity: float = 0.0, recommended_from: Optional[List[str]] = None) -> Optional[bytes]:
+        """
+        Encodes a single course with the per-request fields spliced in.
+        """
+        fragment = self.fragment(int(course_id), summary)
+        if fragment is None:
+            return None
+        return b"".join((
+            fragment,
+            b',"SIMILARITY":', encode_json(float(similarity)),
+            b',"RECOMMENDED_FROM":', encode_json(recommended_from),
+            b"}",
+        ))
+
+    def encode_recommendations(self, recommended: Iterable[Recommendation], summary: bool) -> bytes:
+        """
+        Encodes a `RecommendationResponse` body from cached fragments.
+        """
+        parts = [self.encode_course(r.ID, summary, r.SIMILARITY, r.RECOMMENDED_FROM) for r in recommended]
+        return b'{"recommended_courses":[' + b",".join(part for part in parts if part is not None) + b"]}"
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Bytes held by the encoded fragments.
+        """
+        return {
+            "summary_bytes": sum(len(f) for f in self._summary.values()),
+            "full_bytes": sum(len(f) for f in self._full.values()),
+        }
@@ -1,24 +1,124 @@
 import os
+import re
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Any
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Callable, Dict, Iterable, List, Optional, Any
+from app.logger import logger
 from app.types import CourseWithId
 
+# Large free-text columns, only needed when a full course record is returned
+TEXT_COLUMNS = [
+    "PREREQUISITES",
+    "FIELDS_OF_STUDY",
+    "LECTURES_SEMINARS_HOMEWORK",
+    "SYLLABUS",
+    "OBJECTIVES",
+    "TEXT_PREREQUISITS",
+    "ASSESMENT_METHODS",
+    "TEACHING_METHODS",
+    "TEACHER_INFO",
+    "LEARNING_OUTCOMES",
+    "LITERATURE",
+    "FOLLOWUP_COURSES",
+]
+
+# Columns with a value -> course IDs posting list, used by the baseline recommender
+POSTING_COLUMNS = ["TEACHERS", "FACULTY", "DEPARTMENT"]
+
+# An eligibility rule maps row-aligned column arrays to a boolean array marking ineligible courses
+EligibilityRule = Callable[[Dict[str, np.ndarray]], np.ndarray]
+
+
+def name_contains(column: str, keywords: List[str]) -> EligibilityRule:
+    """
+    Rule marking courses whose lowercased `column` contains any of the keywords.
+
+    :param column: Name of a string column, e.g. 'NAME'.
+    :param keywords: Lowercase fragments to look for.
+    :return: The eligibility rule.
+    """
+    pattern = "|".join(re.escape(keyword) for keyword in keywords)
+
+    def rule(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        values = pd.Series(columns[column], dtype=object)
+        return values.str.lower().str.contains(pattern, regex=True, na=False).to_numpy(dtype=bool)
+    return rule
+
+
+def any_rule(*rules: EligibilityRule) -> EligibilityRule:
+    """
+    Rule marking courses marked by any of the given rules.
+    """
+    def rule(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.logical_or.reduce([r(columns) for r in rules])
+    return rule
+
+
+# Courses marked by any of these rules are never recommended, evaluated once at load time
+INELIGIBILITY_RULES: Dict[str, EligibilityRule] = {
+    "thesis": any_rule(name_contains("NAME", ['thesis', 'diplomov', 'bakalářsk']), name_contains("NAME_EN", ['thesis'])),
+    "state_exam": any_rule(name_contains("NAME", ['státnic']), name_contains("NAME_EN", ['state exam'])),
+}
+
+
+def text_source_metadata(courses_path: str) -> Dict[bytes, bytes]:
+    """
+    Size and modification time of `courses.parquet`, stored in the schema metadata of
+    `courses_text.arrow` by `scripts.convert_assets` so a stale Arrow file is detected.
+    """
+    stat = os.stat(courses_path)
+    return {b"source_size": str(stat.st_size).encode(), b"source_mtime_ns": str(stat.st_mtime_ns).encode()}
+
+
+def posting_keys(column: str, value: Optional[str]) -> List[str]:
+    """
+    Normalized posting keys of a column value: the first 2 teachers split on '-',
+    otherwise the stripped value itself.
+
+    :param column: One of `POSTING_COLUMNS`.
+    :param value: The raw column value.
+    :return: List of keys, empty for missing values.
+    """
+    if not value:
+        return []
+    if column == "TEACHERS":
+        return [teacher.strip() for teacher in value.split('-') if teacher.strip()][:2]
+    return [value.strip()]
+
 
 class CourseClient:
     """
     A client class to load and manage courses using pandas for optimized storage and retrieval.
     """
 
-    def __init__(self, data_dir: str = "data/generated") -> None:
+    def __init__(self, data_dir: str = "data/generated", lazy_text: bool = False, text_cache_size: int = 1024) -> None:
         """
         :param data_dir: Path to the directory with JSON files containing courses.
+        :param lazy_text: Keep only the small columns in memory and read the text columns on demand.
+        :param text_cache_size: Number of courses whose text columns are kept in the LRU cache.
         """
         self.data_dir: str = data_dir
+        self.lazy_text: bool = lazy_text
+
+        courses_path = os.path.join(self.data_dir, "courses.parquet")
+        self.text_columns: List[str] = []
+        self._text_table: Optional[pa.Table] = None
+        if lazy_text:
+            schema = pq.read_schema(courses_path)
+            self.text_columns = [column for column in TEXT_COLUMNS if column in schema.names]
+            columns = [column for column in schema.names if column not in self.text_columns]
+            self._text_table = self._open_text_table(courses_path)
+            self._text_row = lru_cache(maxsize=text_cache_size)(self._read_text_row)
+        else:
+            columns = None
 
         self.df = pd.read_parquet(
-            os.path.join(self.data_dir, "courses.parquet"),
+            courses_path,
             engine="pyarrow",
+            columns=columns,
             memory_map=True,
         )
         self.id_df = pd.read_parquet(
@@ -30,17 +130,111 @@ class CourseClient:
         self.df.set_index('CODE', drop=False, inplace=True)
         self.id_df.set_index('ID', drop=False, inplace=True)
 
-    def _convert_numpy_arrays(self, course_dict: Dict[str, Any]) -> Dict[str, Any]:
+        self._build_index()
+
+    def _build_index(self) -> None:
         """
-        Convert any numpy arrays in the course dictionary to Python lists for serialization.
-        
-        :param course_dict: Dictionary containing course data
-        :return: Dictionary with numpy arrays converted to lists
+        Builds plain dict/NumPy lookups so hot paths avoid pandas scalar indexing:
+        one array per column (row-aligned), ID -> row offset, code -> IDs and the
+        teacher/faculty/department -> IDs posting lists.
+        """
+        self._columns: Dict[str, np.ndarray] = {}
+        for column in self.df.columns:
+            values = self.df[column].to_numpy()
+            if values.dtype == object:
+                values = values.copy()
+                values[pd.isna(values)] = None
+                for i, value in enumerate(values):
+                    if isinstance(value, np.ndarray):
+                        values[i] = value.tolist()
+            self._columns[column] = values
+
+        ids = self.id_df['ID'].to_numpy()
+        self._id_to_row = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        self._id_to_row[ids] = self.id_df['index'].to_numpy()
+
+        self._code_to_ids: Dict[str, np.ndarray] = {}
+        grouped: Dict[str, List[int]] = {}
+        for code, course_id in zip(self._columns['CODE'], self._columns['ID']):
+            grouped.setdefault(code, []).append(int(course_id))
+        for code, code_ids in grouped.items():
+            self._code_to_ids[code] = np.array(code_ids, dtype=np.int64)
+
+        self._postings: Dict[str, Dict[str, np.ndarray]] = {}
+        for column in POSTING_COLUMNS:
+            lists: Dict[str, List[int]] = {}
+            if column in self._columns:
+                for value, course_id in zip(self._columns[column], self._columns['ID']):
+                    for key in posting_keys(column, value):
+                        lists.setdefault(key, []).append(int(course_id))
+            self._postings[column] = {key: np.unique(key_ids) for key, key_ids in lists.items()}
+
+        self._ineligible: Dict[str, np.ndarray] = {
+            name: rule(self._columns) for name, rule in INELIGIBILITY_RULES.items()
+        }
+        self._ineligible_masks: Dict[int, np.ndarray] = {}
+
+    def _open_text_table(self, courses_path: str) -> pa.Table:
+        """
+        Opens the text columns without converting them to Python objects.
+
+        Prefers an uncompressed Arrow IPC file (`courses_text.arrow`) which is memory-mapped
+        zero-copy; otherwise the columns are decoded from the parquet file into Arrow buffers.
+        The Arrow file is only used if it was written from the current parquet file, its rows
+        would not line up with the catalogue otherwise.
+        """
+        arrow_path = os.path.join(self.data_dir, "courses_text.arrow")
+        if os.path.exists(arrow_path):
+            table = pa.ipc.open_file(pa.memory_map(arrow_path)).read_all()
+            metadata = table.schema.metadata or {}
+            current = all(metadata.get(key) == value for key, value in text_source_metadata(courses_path).items())
+            if current and table.num_rows == pq.read_metadata(courses_path).num_rows:
+                return table.select(self.text_columns)
+            logger.warning(f"{arrow_path} is stale (courses.parquet changed), reading the text columns from parquet; run scripts.convert_assets")
+        return pq.read_table(courses_path, columns=self.text_columns, memory_map=True)
+
+    def _read_text_row(self, row: int) -> Dict[str, Any]:
+        """
+        Reads the text columns of a single row, wrapped in an LRU cache by the constructor.
+        """
+        return self._text_table.slice(row, 1).to_pylist()[0]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """
+        Reports the in-memory footprint of the catalogue.
+
+        :return: Bytes held by the pandas columns, the Arrow text columns and the text cache state.
+        """
+        usage: Dict[str, Any] = {
+            "mode": "lazy_text" if self.lazy_text else "full",
+            "columns_bytes": int(self.df.memory_usage(deep=True).sum()),
+        }
+        if self.lazy_text:
+            cache = self._text_row.cache_info()
+            usage["text_bytes"] = int(self._text_table.nbytes)
+            usage["text_cache"] = {"size": cache.currsize, "maxsize": cache.maxsize, "hits": cache.hits, "misses": cache.misses}
+        return usage
+
+    def _rows_for_ids(self, course_ids: Iterable[int]) -> np.ndarray:
+        """
+        Maps course IDs to row offsets, -1 for unknown IDs.
+        """
+        ids = np.asarray(course_ids, dtype=np.int64).reshape(-1)
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self._id_to_row))
+        rows[known] = self._id_to_row[ids[known]]
+        return rows
+
+    def _courses_at_rows(self, rows: np.ndarray) -> List[CourseWithId]:
+        """
+        Hydrates the courses at the given row offsets in a single batched pass.
         """
-        for key, value in course_dict.items():
-            if isinstance(value, np.ndarray):
-                course_dict[key] = value.tolist()
-        return course_dict
+        columns = {name: values[rows].tolist() for name, values in self._columns.items()}
+        records = [dict(zip(columns.keys(), record)) for record in zip(*columns.values())]
+        if self.lazy_text:
+            for row, record in zip(rows.tolist(), records):
+                record.update(self._text_row(row))
+        return [CourseWithId(**record) for record in records]
 
     def get_course_by_code(self, code: str) -> Optional[CourseWithId]:
         """
@@ -49,12 +243,10 @@ class CourseClient:
         :param code: The course code, e.g., 'CORE012'.
         :return: The course or None if not found.
         """
-        try:
-            row = self.df.loc[code]
-            course_dict = self._convert_numpy_arrays(row.to_dict())
-            return CourseWithId(**course_dict)
-        except (KeyError, TypeError):
+        ids = self._code_to_ids.get(code)
+        if ids is None:
             return None
+        return self.get_course_by_id(int(ids[0]))
 
     def get_course_by_id(self, course_id: int) -> Optional[CourseWithId]:
         """
@@ -63,14 +255,118 @@ class CourseClient:
         :param course_id: The course ID.
         :return: The course or None if not found.
         """
-        try:
-            idx = self.id_df.loc[course_id, 'index']
-            row = self.df.iloc[idx]
-            course_dict = self._convert_numpy_arrays(row.to_dict())
-            return CourseWithId(**course_dict)
-        except (KeyError, TypeError):
-            return None
-        
+        return self.get_courses_by_ids([course_id])[0]
+
+    def get_courses_by_ids(self, course_ids: Iterable[int]) -> List[Optional[CourseWithId]]:
+        """
+        Retrieves multiple courses by their IDs in one batched operation.
+
+        :param course_ids: The course IDs.
+        :return: The courses in the same order, None for unknown IDs.
+        """
+        rows = self._rows_for_ids(course_ids)
+        found = rows >= 0
+        courses: List[Optional[CourseWithId]] = [None] * len(rows)
+        for position, course in zip(np.flatnonzero(found), self._courses_at_rows(rows[found])):
+            courses[position] = course
+        return courses
+
+    def get_codes_by_ids(self, course_ids: Iterable[int]) -> List[Optional[str]]:
+        """
+        Gets the codes of the given course IDs without hydrating the courses.
+
+        :param course_ids: The course IDs.
+        :return: The course codes in the same order, None for unknown IDs.
+        """
+        rows = self._rows_for_ids(course_ids)
+        codes = self._columns['CODE'][np.maximum(rows, 0)].tolist()
+        return [code if row >= 0 else None for code, row in zip(codes, rows.tolist())]
+
+    def project_courses(self, course_ids: Iterable[int], fields: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Retrieves only the given fields of multiple courses.
+
+        Unrequested columns are never read, so a projection without text columns
+        does not touch the lazily loaded text in lean mode.
+
+        :param course_ids: The course IDs.
+        :param fields: Names of the course columns to include.
+        :return: One dict per course in the same order, None for unknown IDs.
+        """
+        rows = self._rows_for_ids(course_ids)
+        found = rows >= 0
+        found_rows = rows[found]
+        columns = {name: self._columns[name][found_rows].tolist() for name in fields if name in self._columns}
+        records = [dict(zip(columns.keys(), record)) for record in zip(*columns.values())] \
+            if columns else [{} for _ in found_rows]
+        text_fields = [name for name in fields if name in self.text_columns]
+        if text_fields:
+            for row, record in zip(found_rows.tolist(), records):
+                text = self._text_row(row)
+                record.update((name, text[name]) for name in text_fields)
+
+        projected: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        for position, record in zip(np.flatnonzero(found), records):
+            projected[position] = record
+        return projected
+
+    def course_fields(self) -> List[str]:
+        """
+        Names of all course columns, including the lazily loaded text columns.
+        """
+        return list(self._columns.keys()) + self.text_columns
+
+    def ids_for_codes(self, courses_codes: Iterable[str]) -> np.ndarray:
+        """
+        Gets the course IDs of the given codes, including every ID of duplicated codes.
+
+        :param courses_codes: Course codes, unknown codes are ignored
+        :return: Array of course IDs
+        """
+        ids = [self._code_to_ids[code] for code in courses_codes if code in self._code_to_ids]
+        return np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+
+    def posting_ids(self, column: str, keys: Iterable[str]) -> np.ndarray:
+        """
+        Gets the IDs of courses sharing any of the given keys in a posting column.
+
+        :param column: One of `POSTING_COLUMNS`.
+        :param keys: Keys as returned by `posting_keys`, unknown keys are ignored.
+        :return: Sorted array of unique course IDs.
+        """
+        postings = self._postings[column]
+        ids = [postings[key] for key in keys if key in postings]
+        return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+    def ineligible_mask(self, size: int) -> np.ndarray:
+        """
+        Boolean mask indexed by course ID, True for courses that must never be recommended:
+        courses marked by any of `INELIGIBILITY_RULES` and IDs missing from the catalogue.
+
+        The mask is computed once per size and is read-only, OR it into a request mask.
+
+        :param size: Length of the mask, usually the number of rows of a score matrix.
+        :return: The boolean mask.
+        """
+        mask = self._ineligible_masks.get(size)
+        if mask is None:
+            mask = np.ones(size, dtype=bool)
+            ids = self._columns['ID'].astype(np.int64)
+            eligible = ~np.logical_or.reduce(list(self._ineligible.values())) if self._ineligible else np.ones(len(ids), dtype=bool)
+            in_range = (ids >= 0) & (ids < size)
+            mask[ids[in_range & eligible]] = False
+            # An ID shared by several rows is ineligible if any of them is
+            mask[ids[in_range & ~eligible]] = True
+            mask.flags.writeable = False
+            self._ineligible_masks[size] = mask
+        return mask
+
+    def ineligibility_counts(self) -> Dict[str, int]:
+        """
+        Number of courses marked by each eligibility rule.
+        """
+        return {name: int(np.count_nonzero(marked)) for name, marked in self._ineligible.items()}
+
     def get_course_ids_by_codes(self, courses_codes: List[str]) -> List[int]:
         """
         Gets a list of course IDs from their codes.
@@ -78,20 +374,7 @@ class CourseClient:
         :param courses_codes: List of course codes
         :return: List of course IDs for valid codes
         """
-        result = []
-        for code in courses_codes:
-            try:
-                course = self.df.loc[code]
-
-                if isinstance(course, pd.DataFrame): # TODO: Solve duplicate course codes
-                    for _, row in course.iterrows():
-                        result.append(int(row['ID']))
-                    continue
-
-                result.append(int(course['ID']))
-            except KeyError:
-                continue
-        return result
+        return self.ids_for_codes(courses_codes).tolist()
 
     def all_courses(self) -> List[CourseWithId]:
         """
@@ -99,17 +382,19 @@ class CourseClient:
 
         :return: A list of all courses sorted by ID.
         """
-        # Sort by ID before converting to records
-        sorted_df = self.df.sort_values('ID')
-        records = sorted_df.to_dict(orient='records')
-        return [CourseWithId(**self._convert_numpy_arrays(record)) for record in records]
+        rows = np.argsort(self._columns['ID'], kind='stable')
+        return self._courses_at_rows(rows)
 
-    def filter_courses(self, course: CourseWithId) -> CourseWithId:
+    def filter_courses(self, course: CourseWithId) -> bool:
         """
-        Returns true if the course should be filtered
+        Returns true if the course should be filtered. Prefer `ineligible_mask` when scoring
+        many candidates, this evaluates the same rules on a single hydrated course.
 
         :param course: The course to check.
         :return: True if the course should be filtered, False otherwise.
         """
-        return (course.NAME and any(keyword in course.NAME.lower() for keyword in ['thesis', 'diplomov', 'bakalářsk', 'státnic'])) or \
-            (course.NAME_EN and any(keyword in course.NAME_EN.lower() for keyword in ['thesis', 'state exam']))
+        columns: Dict[str, np.ndarray] = {}
+        for column, value in vars(course).items():
+            columns[column] = np.empty(1, dtype=object)
+            columns[column][0] = value
+        return any(bool(rule(columns)[0]) for rule in INELIGIBILITY_RULES.values())
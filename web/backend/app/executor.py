@@ -0,0 +1,142 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    """
+    Raised when the recommendation executor has no free worker and its queue is full.
+    """
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Recommendation executor saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _ModelStats:
+    __slots__ = ("queued", "running", "submitted", "completed", "failed", "rejected", "wait_seconds", "max_wait_seconds", "run_seconds")
+
+    def __init__(self) -> None:
+        self.queued = self.running = self.submitted = self.completed = self.failed = self.rejected = 0
+        self.wait_seconds = self.max_wait_seconds = self.run_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "mean_wait_ms": self.wait_seconds / finished * 1000 if finished else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "mean_run_ms": self.run_seconds / finished * 1000 if finished else 0.0,
+        }
+
+
+class ModelExecutor:
+    """
+    Bounded thread pool running the CPU-bound recommenders off the event loop.
+
+    At most `max_workers` jobs run at once (NumPy releases the GIL in its kernels) and at
+    most `max_queue` wait for a worker; further submissions fail fast with
+    `ExecutorSaturated` instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        """
+        :param max_workers: Number of worker threads.
+        :param max_queue: Number of jobs allowed to wait for a free worker.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._models: Dict[str, _ModelStats] = {}
+
+    async def run(self, model: str, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Runs `fn(*args)` on a worker thread, accounted under `model`.
+
+        :raises ExecutorSaturated: If every worker is busy and the queue is full.
+        """
+        with self._lock:
+            stats = self._models.setdefault(model, _ModelStats())
+            if self._pending >= self.max_workers + self.max_queue:
+                stats.rejected += 1
+                raise ExecutorSaturated(self._retry_after())
+            self._pending += 1
+            stats.submitted += 1
+            stats.queued += 1
+        enqueued = time.perf_counter()
+
+        def job() -> T:
+            started = time.perf_counter()
+            with self._lock:
+                stats.queued -= 1
+                stats.running += 1
+                stats.wait_seconds += started - enqueued
+                stats.max_wait_seconds = max(stats.max_wait_seconds, started - enqueued)
+            failed = True
+            try:
+                result = fn(*args)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    stats.running -= 1
+                    stats.run_seconds += time.perf_counter() - started
+                    if failed:
+                        stats.failed += 1
+                    else:
+                        stats.completed += 1
+
+        def release_cancelled(future) -> None:
+            # A job cancelled before it started never reaches its own accounting
+            if future.cancelled():
+                with self._lock:
+                    self._pending -= 1
+                    stats.queued -= 1
+
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            with self._lock:
+                self._pending -= 1
+                stats.queued -= 1
+            raise
+        future.add_done_callback(release_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _retry_after(self) -> int:
+        """
+        Seconds until the queue is expected to drain, from the mean run time of all models.
+        """
+        finished = sum(stats.completed + stats.failed for stats in self._models.values())
+        run_seconds = sum(stats.run_seconds for stats in self._models.values())
+        mean_run = run_seconds / finished if finished else 1.0
+        return max(1, math.ceil(mean_run * self._pending / self.max_workers))
+
+    def stats(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Pool usage and per-model queue depth and wait times.
+        """
+        with self._lock:
+            models = {name: stats.as_dict() for name, stats in self._models.items() if model is None or name == model}
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "models": models,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,86 @@
+import os
+import resource
+import sys
+from typing import Dict, Iterable, Optional
+
+
+def resident_memory() -> int:
+    """
+    Returns the current resident set size of this process in bytes.
+
+    Reads /proc on Linux and falls back to the peak RSS reported by getrusage elsewhere.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Fields of /proc/<pid>/smaps_rollup reported by `memory_breakdown`, in kB there
+SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+    "Anonymous": "anonymous",
+}
+
+
+def memory_breakdown(pid: str = "self") -> Dict[str, int]:
+    """
+    Splits the resident memory of a process into pages shared with other processes and private ones.
+
+    PSS charges every shared page in equal parts to the processes mapping it, so summing the
+    PSS of all workers gives their real combined footprint. Linux only.
+
+    :param pid: Process ID, this process by default.
+    :return: Bytes per field of `SMAPS_FIELDS`, empty if /proc/<pid>/smaps_rollup is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return _parse_smaps(f)
+    except OSError:
+        return {}
+
+
+def mapped_file_memory(paths: Iterable[str], pid: str = "self") -> Dict[str, Dict[str, int]]:
+    """
+    Resident, shared and private bytes of the mappings of the given files.
+
+    :param paths: Files to report, e.g. the mapped assets.
+    :param pid: Process ID, this process by default.
+    :return: Per file the fields of `SMAPS_FIELDS`, files that are not mapped are left out.
+    """
+    wanted = {os.path.realpath(path) for path in paths}
+    usage: Dict[str, Dict[str, int]] = {}
+    try:
+        with open(f"/proc/{pid}/smaps") as f:
+            current: Optional[Dict[str, int]] = None
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if not fields[0].endswith(":"):
+                    # Mapping header: address perms offset dev inode [path]
+                    path = " ".join(fields[5:]) or None
+                    current = usage.setdefault(path, {}) if path in wanted else None
+                elif current is not None and fields[0][:-1] in SMAPS_FIELDS:
+                    key = SMAPS_FIELDS[fields[0][:-1]]
+                    current[key] = current.get(key, 0) + int(fields[1]) * 1024
+    except OSError:
+        return {}
+    return usage
+
+
+def _parse_smaps(lines: Iterable[str]) -> Dict[str, int]:
+    usage: Dict[str, int] = {}
+    for line in lines:
+        fields = line.split()
+        if fields and fields[0][:-1] in SMAPS_FIELDS:
+            usage[SMAPS_FIELDS[fields[0][:-1]]] = int(fields[1]) * 1024
+    return usage
@@ -0,0 +1,145 @@
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+# Asset with the IVF index of the normalized embeddings, written by scripts/build_ivf.py
+IVF_ASSET = "embeddings_ivf.npz"
+
+
+def spherical_kmeans(
+    embeds: npt.NDArray[np.float32],
+    clusters: int,
+    iterations: int = 10,
+    sample: Optional[int] = None,
+    seed: int = 0,
+    block_rows: int = 16384,
+) -> npt.NDArray[np.float32]:
+    """
+    k-means on the unit sphere: points are assigned to the centroid with the highest cosine
+    similarity and every centroid is the normalized mean of its points.
+
+    :param embeds: L2-normalized embeddings.
+    :param clusters: Number of centroids.
+    :param iterations: Number of assignment/update rounds.
+    :param sample: Train on this many random rows, all rows when None.
+    :param seed: Seed of the initial centroids and the sample.
+    :return: The (clusters x dim) normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    if sample is not None and sample < len(embeds):
+        train = np.asarray(embeds[np.sort(rng.choice(len(embeds), sample, replace=False))], dtype=np.float32)
+    else:
+        train = np.asarray(embeds, dtype=np.float32)
+    clusters = min(clusters, len(train))
+    centroids = train[rng.choice(len(train), clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = assign(train, centroids, block_rows)
+        members = sp.csr_matrix((np.ones(len(train)), (assignment, np.arange(len(train)))), shape=(clusters, len(train)))
+        sums = np.asarray(members @ train, dtype=np.float64)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        # Empty clusters restart from random points
+        sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        norms[empty] = 1
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+
+def assign(embeds: npt.NDArray[np.float32], centroids: npt.NDArray[np.float32], block_rows: int = 16384) -> npt.NDArray[np.int32]:
+    """
+    Index of the most similar centroid of every row, computed block by block.
+    """
+    assignment = np.empty(len(embeds), dtype=np.int32)
+    for start in range(0, len(embeds), block_rows):
+        block = np.asarray(embeds[start:start + block_rows], dtype=np.float32)
+        assignment[start:start + block_rows] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """
+    Inverted file index over the normalized embeddings for candidate generation.
+
+    Courses are partitioned into the cells of a spherical k-means quantizer. A query
+    probes the `nprobe` cells whose centroids are most similar to each of its target
+    vectors and returns the courses in them; the recommenders rescore these candidates
+    exactly, so only the recall depends on `nprobe` (higher is slower and more exact).
+    """
+
+    def __init__(self, centroids: npt.NDArray[np.float32], order: npt.NDArray, offsets: npt.NDArray, nprobe: int = 8) -> None:
+        """
+        :param centroids: The (cells x dim) normalized centroids.
+        :param order: Course IDs grouped by cell.
+        :param offsets: Cell c holds `order[offsets[c]:offsets[c + 1]]`.
+        :param nprobe: Number of cells probed per target vector.
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, embeds: npt.NDArray[np.float32], cells: int, iterations: int = 10, sample: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        """
+        Trains the quantizer and assigns every course to its cell.
+
+        :param embeds: L2-normalized embeddings, one row per course ID.
+        :param cells: Number of cells, around 4 * sqrt(courses) is a good start.
+        :param iterations: k-means iterations.
+        :param sample: Number of courses the quantizer is trained on, all when None.
+        """
+        centroids = spherical_kmeans(embeds, cells, iterations, sample, seed)
+        assignment = assign(embeds, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int64 if len(embeds) > np.iinfo(np.int32).max else np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))]).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    def save(self, path: str) -> None:
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str, courses: int, nprobe: int = 8) -> "IVFIndex":
+        """
+        :param courses: Number of courses of the embedding store the index must cover.
+        :raises ValueError: If the index was built for another number of courses.
+        """
+        with np.load(path) as asset:
+            index = cls(asset["centroids"], asset["order"], asset["offsets"], nprobe)
+        if len(index.order) != courses:
+            raise ValueError(f"Index {path} covers {len(index.order)} courses, the store has {courses}; rerun scripts.build_ivf")
+        return index
+
+    @property
+    def cells(self) -> int:
+        return len(self.centroids)
+
+    def candidates(self, targets: npt.NDArray, exclude: Optional[npt.NDArray[np.bool_]] = None, min_rows: int = 0) -> npt.NDArray[np.intp]:
+        """
+        Courses in the cells closest to any of the targets, sorted by ID.
+
+        :param targets: Normalized targets with shape (k, dim) or (dim,).
+        :param exclude: Optional mask of courses to leave out.
+        :param min_rows: The number of probed cells is doubled until at least this many courses are found.
+        :return: Candidate course IDs.
+        """
+        targets = np.asarray(targets, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        ranking = np.argsort(-(targets @ self.centroids.T), axis=1, kind="stable")
+        nprobe = max(1, min(self.nprobe, self.cells))
+        while True:
+            cells = np.unique(ranking[:, :nprobe])
+            starts, ends = self.offsets[cells], self.offsets[cells + 1]
+            lengths = ends - starts
+            # Concatenated ranges order[start:end] of all probed cells
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            rows = self.order[positions]
+            if exclude is not None:
+                rows = rows[~exclude[rows]]
+            if len(rows) >= min_rows or nprobe >= self.cells:
+                return np.sort(rows).astype(np.intp)
+            nprobe = min(2 * nprobe, self.cells)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes)
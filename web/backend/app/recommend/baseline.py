@@ -1,12 +1,19 @@
 import random
-from typing import List, Dict, Set
-from app.courses import CourseClient
-from app.types import CourseWithId
+from typing import List, Dict
+import numpy as np
+from app.courses import CourseClient, POSTING_COLUMNS, posting_keys
+from app.types import Recommendation
 
-def recommend_courses_baseline(liked: List[str], disliked: List[str], skipped: List[str], courseClient: CourseClient, n: int) -> List[CourseWithId]:
+# Score added for a shared key in each posting column
+POSTING_WEIGHTS = {"TEACHERS": 0.5, "FACULTY": 0.25, "DEPARTMENT": 0.25}
+
+def recommend_courses_baseline(liked: List[str], disliked: List[str], skipped: List[str], courseClient: CourseClient, n: int) -> List[Recommendation]:
     """
     Recommends courses based on shared teachers, faculty, and department.
     Only considers the first 2 teachers of each course.
+
+    Candidates are the union of the liked courses' posting lists, so the cost
+    scales with the number of related courses rather than the catalogue.
     
     Args:
         liked: List of course codes that the user likes
@@ -21,88 +28,48 @@ def recommend_courses_baseline(liked: List[str], disliked: List[str], skipped: L
     if not liked:
         return []
     
-    # Get all liked courses with their details
-    liked_courses = [courseClient.get_course_by_code(code) for code in liked]
-    liked_courses = [course for course in liked_courses if course is not None]
-    
-    if not liked_courses:
+    # First ID of every liked code, like get_course_by_code
+    liked_ids = [ids[0] for ids in (courseClient.ids_for_codes([code]) for code in liked) if len(ids)]
+    if not liked_ids:
         return []
-    
+
     # Extract features from liked courses
-    teachers_set: Set[str] = set()
-    faculties_set: Set[str] = set()
-    departments_set: Set[str] = set()
-    
-    for course in liked_courses:
-        if course.TEACHERS:
-            # Split teachers by comma and add only first 2 to set
-            course_teachers = [teacher.strip() for teacher in course.TEACHERS.split('-') if teacher.strip()]
-            for teacher in course_teachers[:2]:  # Only take first 2 teachers
-                if teacher:
-                    teachers_set.add(teacher)
+    keys: Dict[str, set] = {column: set() for column in POSTING_COLUMNS}
+    for course in courseClient.project_courses(liked_ids, POSTING_COLUMNS):
+        for column in POSTING_COLUMNS:
+            keys[column].update(posting_keys(column, course.get(column)))
 
-        if course.FACULTY:
-            faculties_set.add(course.FACULTY.strip())
-        
-        if course.DEPARTMENT:
-            departments_set.add(course.DEPARTMENT.strip())
+    # Score the union of postings, in ID order like a scan of all courses
+    postings = {column: courseClient.posting_ids(column, keys[column]) for column in POSTING_COLUMNS}
+    candidate_ids = np.unique(np.concatenate(list(postings.values())))
+    candidate_ids = candidate_ids[~np.isin(candidate_ids, courseClient.ids_for_codes(set(liked + disliked + skipped)))]
+
+    scores = np.zeros(len(candidate_ids))
+    for column in POSTING_COLUMNS:
+        scores += np.where(np.isin(candidate_ids, postings[column]), POSTING_WEIGHTS[column], 0.0)
 
-    # Calculate scores for all courses
-    all_courses = courseClient.all_courses()
+    # Duplicated codes keep the score of their last course
     course_scores: Dict[str, float] = {}
-    
-    excluded_codes = set(liked + disliked + skipped)
+    for code, score in zip(courseClient.get_codes_by_ids(candidate_ids), scores.tolist()):
+        course_scores[code] = score
 
-    for course in all_courses:
-        if course.CODE in excluded_codes:
-            continue
-        
-        score = 0.0
-        
-        # Check teachers (only first 2)
-        if course.TEACHERS:
-            course_teachers = [teacher.strip() for teacher in course.TEACHERS.split('-') if teacher.strip()]
-            course_teachers = course_teachers[:2]  # Only consider first 2 teachers
-            matching_teachers = sum(1 for teacher in course_teachers if teacher in teachers_set)
-            if matching_teachers > 0 and course_teachers:
-                score += 0.5
-        
-        # Check faculty
-        if course.FACULTY and course.FACULTY.strip() in faculties_set:
-            score += 0.25
-        
-        # Check department
-        if course.DEPARTMENT and course.DEPARTMENT.strip() in departments_set:
-            score += 0.25
-        
-        if score > 0:
-            course_scores[course.CODE] = score
-    
-    # Sort courses by score
-    sorted_codes = sorted(course_scores.keys(), key=lambda code: course_scores[code], reverse=True)
-    
     # Group courses by score
     courses_grouped_by_score: Dict[float, List[str]] = {}
-    for code in sorted_codes:
-        score = course_scores[code]
-        courses_grouped_by_score.setdefault(score, []).append(code)
+    for code in sorted(course_scores.keys(), key=lambda code: course_scores[code], reverse=True):
+        courses_grouped_by_score.setdefault(course_scores[code], []).append(code)
 
     # Shuffle within each score group and reconstruct the list
     final_sorted_codes = []
-    # Iterate through scores in descending order (implicit from sorted_codes_by_score)
-    unique_scores_desc = sorted(courses_grouped_by_score.keys(), reverse=True)
-    for score in unique_scores_desc:
+    for score in sorted(courses_grouped_by_score.keys(), reverse=True):
         codes_with_same_score = courses_grouped_by_score[score]
         random.shuffle(codes_with_same_score)
         final_sorted_codes.extend(codes_with_same_score)
     
     # Get top N courses
-    recommended_courses: List[CourseWithId] = []
+    recommended_courses: List[Recommendation] = []
 
     for code in final_sorted_codes[:n]:
-        course = courseClient.get_course_by_code(code)
-        if course is not None:
-            course.SIMILARITY = course_scores[code]
-            recommended_courses.append(course)
+        ids = courseClient.ids_for_codes([code])
+        recommended_courses.append(Recommendation(ID=int(ids[0]), CODE=code, SIMILARITY=course_scores[code]))
 
-    return recommended_courses
\ No newline at end of file
+    return recommended_courses
@@ -0,0 +1,231 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+from app.courses import CourseClient
+from app.recommend.embeddings import combination_floor, euclidean_distances, select_max_with_combinations
+from app.recommend.keywords import calculate_recommended_from
+from app.recommend.pairs import PairScorer
+from app.recommend.store import EmbeddingStore
+from app.recommend.topk import exclusion_mask, top_k
+from app.types import Recommendation
+
+
+class Profile(NamedTuple):
+    """Course IDs of one profile of a batch."""
+    liked: List[int]
+    disliked: List[int]
+    excluded: List[int]
+
+
+def resolve_profiles(profiles: List[Tuple[List[str], List[str], List[str]]], ids_for_codes) -> List[Profile]:
+    """
+    Maps (liked, disliked, skipped) code lists to IDs, keeping every ID of duplicated codes.
+    """
+    resolved = []
+    for liked, disliked, skipped in profiles:
+        resolved.append(Profile(
+            liked=list(ids_for_codes(liked)),
+            disliked=list(ids_for_codes(disliked)),
+            excluded=list(ids_for_codes(liked + disliked + skipped)),
+        ))
+    return resolved
+
+
+class EmbeddingBatchModel(ABC):
+    """
+    Scores a batch of profiles against the embedding matrix.
+
+    Every profile contributes a few target vectors; the targets of consecutive profiles are
+    stacked into blocks of at most `block_targets` columns and each block is scored with a
+    single matrix product. `select` then ranks one profile from its columns of the block.
+    """
+
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        self.store = store
+        self.courseClient = courseClient
+
+    @abstractmethod
+    def targets(self, profile: Profile) -> npt.NDArray[np.float32]:
+        """The target vectors of a profile, (k, dim) or a single (dim,) vector."""
+
+    @abstractmethod
+    def select(self, profile: Profile, similarity: npt.NDArray[np.float32], n: int) -> List[Recommendation]:
+        """The top n courses of a profile from the (courses, k) similarities of its targets."""
+
+    def excluded(self, profile: Profile) -> npt.NDArray[np.bool_]:
+        return exclusion_mask(len(self.store), profile.excluded)
+
+    def recommend(self, profiles: List[Profile], n: int, block_targets: int = 512) -> List[List[Recommendation]]:
+        results: List[List[Recommendation]] = [[] for _ in profiles]
+        for block, targets in self._blocks(profiles, block_targets):
+            similarity = self.store.similarity(np.vstack(targets))
+            offset = 0
+            for position, profile_targets in zip(block, targets):
+                columns = similarity[:, offset:offset + len(profile_targets)]
+                offset += len(profile_targets)
+                if profiles[position].liked:
+                    results[position] = self.select(profiles[position], columns, n)
+        return results
+
+    def _blocks(self, profiles: List[Profile], block_targets: int) -> Iterator[Tuple[List[int], List[npt.NDArray[np.float32]]]]:
+        block: List[int] = []
+        targets: List[npt.NDArray[np.float32]] = []
+        width = 0
+        for position, profile in enumerate(profiles):
+            if not profile.liked:
+                continue
+            profile_targets = np.asarray(self.targets(profile), dtype=np.float32).reshape(-1, self.store.dim)
+            if block and width + len(profile_targets) > block_targets:
+                yield block, targets
+                block, targets, width = [], [], 0
+            block.append(position)
+            targets.append(profile_targets)
+            width += len(profile_targets)
+        if block:
+            yield block, targets
+
+
+class SquaredSumBatchModel(EmbeddingBatchModel):
+    """Batch counterpart of `recommend_courses`."""
+
+    def targets(self, profile: Profile) -> npt.NDArray[np.float32]:
+        return np.vstack([
+            self.store.normalize(self.store.embeds[profile.liked]),
+            self.store.normalize(self.store.embeds[profile.disliked]).reshape(-1, self.store.dim),
+        ])
+
+    def select(self, profile: Profile, similarity: npt.NDArray[np.float32], n: int) -> List[Recommendation]:
+        liked_similarities = similarity[:, :len(profile.liked)]
+        scores = np.einsum("ij,ij->i", liked_similarities, liked_similarities)
+        scores[np.any(similarity[:, len(profile.liked):] >= 0.9, axis=1)] = 0
+        top_idxs, top_scores = top_k(scores, n, self.excluded(profile))
+        return [
+            Recommendation(ID=int(idx), CODE=self.store.codes[idx], SIMILARITY=float(score))
+            for idx, score in zip(top_idxs, top_scores)
+        ]
+
+
+class MaxBatchModel(EmbeddingBatchModel):
+    """Batch counterpart of `recommend_max`."""
+
+    def targets(self, profile: Profile) -> npt.NDArray[np.float32]:
+        return self.store.embeds[profile.liked + profile.disliked]
+
+    def select(self, profile: Profile, similarity: npt.NDArray[np.float32], n: int) -> List[Recommendation]:
+        similarity_liked = similarity[:, :len(profile.liked)]
+        best_match_liked = np.max(similarity_liked, axis=1)
+        if profile.disliked:
+            best_match_liked[np.max(similarity[:, len(profile.liked):], axis=1) > 0.9] = -np.inf
+        selected_idxs, _ = top_k(best_match_liked, n, self.excluded(profile))
+        return [
+            Recommendation(
+                ID=int(idx),
+                CODE=self.store.codes[idx],
+                RECOMMENDED_FROM=[self.store.codes[profile.liked[np.argmax(similarity_liked[idx])]]],
+            )
+            for idx in selected_idxs
+        ]
+
+
+class AverageBatchModel(EmbeddingBatchModel):
+    """Batch counterpart of `recommend_average`, one raw target vector per profile."""
+
+    def targets(self, profile: Profile) -> npt.NDArray[np.float32]:
+        target = np.mean(self.store.vectors(profile.liked), axis=0)
+        if profile.disliked:
+            target = target - np.mean(self.store.vectors(profile.disliked), axis=0) * 0.5
+        return target
+
+    def select(self, profile: Profile, similarity: npt.NDArray[np.float32], n: int) -> List[Recommendation]:
+        distances = euclidean_distances(self.store, self.targets(profile), dots=similarity[:, 0])
+        top_idxs, top_distances = top_k(-distances, n, self.excluded(profile))
+        return [
+            Recommendation(ID=int(idx), CODE=self.store.codes[idx], SIMILARITY=float(1.0 / (1.0 + distance)))
+            for idx, distance in zip(top_idxs, -top_distances)
+        ]
+
+
+class PairBatchModel(EmbeddingBatchModel):
+    """
+    Batch counterpart of `recommend_max_with_combinations`: the liked and disliked courses,
+    the pair targets are scored from the liked columns with `PairScorer`.
+    """
+
+    def targets(self, profile: Profile) -> npt.NDArray[np.float32]:
+        return self.store.embeds[profile.liked + profile.disliked]
+
+    def select(self, profile: Profile, similarity: npt.NDArray[np.float32], n: int) -> List[Recommendation]:
+        liked, disliked = len(profile.liked), len(profile.disliked)
+        scorer = PairScorer(self.store.embeds[profile.liked], self.store.norms[profile.liked])
+        excluded = self.excluded(profile) | self.courseClient.ineligible_mask(len(self.store))
+        floor = combination_floor(similarity[:, :liked], similarity[:, liked:] if disliked else None, excluded, n)
+        return select_max_with_combinations(
+            *scorer.best(similarity[:, :liked], floor),
+            scorer.pairs,
+            similarity[:, :liked],
+            similarity[:, liked:] if disliked else None,
+            profile.liked,
+            excluded,
+            self.store,
+            n,
+            verbose=False,
+        )
+
+
+def recommend_keywords_batch(
+    profiles: List[Profile],
+    matrix: sp.csr_matrix,
+    courseClient: CourseClient,
+    n: int,
+    block_profiles: int = 256,
+) -> List[List[Recommendation]]:
+    """
+    Batch counterpart of `recommend_courses_keywords`.
+
+    The liked and disliked rows of a block of profiles are summed with two sparse
+    products of a (profiles x courses) indicator matrix with the intersection matrix.
+    """
+    size = matrix.shape[0]
+    ineligible = courseClient.ineligible_mask(size)
+    results: List[List[Recommendation]] = [[] for _ in profiles]
+    for start in range(0, len(profiles), block_profiles):
+        block = profiles[start:start + block_profiles]
+        liked = _indicator([profile.liked for profile in block], size)
+        # Disliked rows are weighted by 0.5 / len(disliked), as in `find_top_courses`
+        disliked = _indicator([profile.disliked for profile in block], size, [0.5 / max(len(profile.disliked), 1) for profile in block])
+        scores = (liked @ matrix).toarray() - (disliked @ matrix).toarray()
+
+        for offset, profile in enumerate(block):
+            if not profile.liked:
+                continue
+            excluded = exclusion_mask(size, profile.excluded) | ineligible
+            ids = top_k(scores[offset], n, excluded)[0].tolist()
+            codes = courseClient.get_codes_by_ids(ids)
+            recommended_from = calculate_recommended_from(ids, profile.liked, matrix[profile.liked], courseClient)
+            results[start + offset] = [
+                Recommendation(ID=idx, CODE=code, RECOMMENDED_FROM=sources)
+                for idx, code, sources in zip(ids, codes, recommended_from)
+            ]
+    return results
+
+
+def _indicator(rows: List[List[int]], size: int, weights: Optional[List[float]] = None) -> sp.csr_matrix:
+    """Sparse (len(rows) x size) matrix with weights[r] at the given columns of row r, repeated columns add up."""
+    lengths = [len(columns) for columns in rows]
+    data = np.repeat(np.ones(len(rows)) if weights is None else np.asarray(weights), lengths)
+    row_idx = np.repeat(np.arange(len(rows)), lengths)
+    col_idx = np.fromiter((column for columns in rows for column in columns), dtype=np.int64, count=sum(lengths))
+    return sp.csr_matrix((data, (row_idx, col_idx)), shape=(len(rows), size))
+
+
+# Batch implementation of every embedding model that supports blocked scoring
+EMBEDDING_BATCH_MODELS: Dict[str, Type[EmbeddingBatchModel]] = {
+    "embeddings_v1": SquaredSumBatchModel,
+    "embeddings_max": MaxBatchModel,
+    "average": AverageBatchModel,
+    "max_with_combinations": PairBatchModel,
+}
+KEYWORD_BATCH_MODELS = ("keywords_gemini", "keywords_tfidf")
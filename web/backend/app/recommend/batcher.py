@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+import numpy.typing as npt
+
+
+class _Request:
+    __slots__ = ("targets", "vector", "done", "result", "error", "enqueued")
+
+    def __init__(self, targets: npt.NDArray[np.float32], vector: bool) -> None:
+        self.targets = targets
+        self.vector = vector
+        self.done = threading.Event()
+        self.result: Optional[npt.NDArray[np.float32]] = None
+        self.error: Optional[BaseException] = None
+        self.enqueued = time.perf_counter()
+
+
+class SimilarityBatcher:
+    """
+    Coalesces concurrent similarity products against one matrix into a single BLAS call.
+
+    Model threads call `similarity`, which queues their targets and blocks. A worker
+    thread collects requests for up to `window` seconds after the first one arrives, or
+    until `max_requests` requests or `max_targets` target vectors are queued, multiplies
+    the matrix with all stacked targets at once and hands every request its columns.
+    Under load the matrix is read once per batch instead of once per request.
+    """
+
+    def __init__(self, matrix: npt.NDArray[np.float32], window: float = 0.002, max_requests: int = 32, max_targets: int = 1024) -> None:
+        """
+        :param matrix: The (courses x dim) matrix every request is multiplied with.
+        :param window: Seconds to wait for more requests after the first one of a batch.
+        :param max_requests: Maximum number of requests in one batch.
+        :param max_targets: Maximum number of stacked target vectors in one batch, larger requests bypass the batcher.
+        """
+        self.matrix = matrix
+        self.window = window
+        self.max_requests = max_requests
+        self.max_targets = max_targets
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._pending: Optional[_Request] = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "bypassed": 0, "batches": 0, "targets": 0, "max_batch_requests": 0, "max_queue_depth": 0}
+        self._wait_seconds = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="similarity-batcher", daemon=True)
+        self._worker.start()
+
+    def similarity(self, targets: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Computes `matrix @ targets.T` as part of the next batch.
+
+        :param targets: Targets with shape (k, dim) or (dim,).
+        :return: Similarities with shape (courses, k) or (courses,).
+        """
+        targets = np.asarray(targets, dtype=np.float32)
+        vector = targets.ndim == 1
+        targets = targets.reshape(-1, self.matrix.shape[1])
+        request = _Request(targets, vector)
+        with self._lock:
+            bypass = self._closed or len(targets) > self.max_targets
+            if bypass:
+                self._counters["bypassed"] += 1
+            else:
+                self._queue.put(request)
+        if bypass:
+            result = self.matrix @ targets.T
+            return result[:, 0] if vector else result
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self) -> None:
+        while True:
+            request = self._pending if self._pending is not None else self._queue.get()
+            self._pending = None
+            if request is None:
+                return
+            stopping = False
+            batch = [request]
+            targets = len(request.targets)
+            deadline = time.perf_counter() + self.window
+            depth = self._queue.qsize()
+            while len(batch) < self.max_requests:
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                if targets + len(request.targets) > self.max_targets:
+                    # Starts the next batch
+                    self._pending = request
+                    break
+                batch.append(request)
+                targets += len(request.targets)
+            self._execute(batch, depth)
+            if stopping:
+                return
+
+    def _execute(self, batch: List[_Request], depth: int) -> None:
+        try:
+            stacked = batch[0].targets if len(batch) == 1 else np.vstack([request.targets for request in batch])
+            # (targets x courses), so every request gets contiguous rows
+            result = stacked @ self.matrix.T
+        except BaseException as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        now = time.perf_counter()
+        with self._lock:
+            self._counters["requests"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["targets"] += len(stacked)
+            self._counters["max_batch_requests"] = max(self._counters["max_batch_requests"], len(batch))
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], depth + 1)
+            self._wait_seconds += sum(now - request.enqueued for request in batch)
+
+        offset = 0
+        for request in batch:
+            rows = result[offset:offset + len(request.targets)]
+            offset += len(request.targets)
+            request.result = rows[0] if request.vector else rows.T
+            request.done.set()
+
+    def close(self) -> None:
+        """
+        Stops the worker after the queued requests are served, later calls compute directly.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Batch counters, current queue depth and the mean time a request waited.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            wait = self._wait_seconds
+        batches = counters["batches"]
+        return {
+            **counters,
+            "queue_depth": self._queue.qsize(),
+            "mean_batch_requests": counters["requests"] / batches if batches else 0.0,
+            "mean_wait_ms": wait / counters["requests"] * 1000 if counters["requests"] else 0.0,
+            "window_ms": self.window * 1000,
+            "max_requests": self.max_requests,
+            "max_targets": self.max_targets,
+        }
@@ -3,7 +3,11 @@ import numpy as np
 import numpy.typing as npt
 
 from app.courses import CourseClient
-from app.types import CourseWithId
+from app.recommend.mmr import Diversity, MMRReranker
+from app.recommend.pairs import PairScorer
+from app.recommend.store import EmbeddingStore
+from app.recommend.topk import exclusion_mask, ranked, top_k, top_k_indices
+from app.types import Recommendation
 
 Embedding: TypeAlias = npt.NDArray[np.float32]
 Embeddings: TypeAlias = npt.NDArray[np.float32]
@@ -14,103 +18,99 @@ def sort_by_similarity(
         liked_embeds: Embeddings,
         disliked_embeds: Embeddings,
         candidate_embeds: Embeddings,
-    ) -> List[Tuple[int, Embedding, Similarity]]:
+        k: Optional[int] = None,
+        exclude: Optional[npt.NDArray[np.bool_]] = None,
+    ) -> Tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
     """Sorts candidate embeddings based on their similarity to liked and disliked embeddings.
 
     For each candidate embedding, calculate its cosine similarity with all liked and disliked embeddings.
     A candidate is assigned a score of 0 if its similarity with any disliked embedding is 0.9 or higher.
     Otherwise, the score is the sum of the squared cosine similarities between the candidate and all liked embeddings.
 
-    The function returns a list of tuples, each containing the original index of the candidate,
-    the candidate embedding itself, and its calculated similarity score. The list is sorted
-    in descending order based on the similarity score.
+    All candidates are scored with a single matrix product against the stacked liked and
+    disliked embeddings and only the best k are selected and sorted.
 
     Args:
         liked_embeds: Embeddings of liked items.
         disliked_embeds: Embeddings of disliked items.
-        candidate_embeds: Embeddings of items to be scored and sorted.
+        candidate_embeds: L2-normalized embeddings of items to be scored and sorted.
+        k: Number of top candidates to return, all candidates when None.
+        exclude: Optional boolean mask of candidates that must not be returned.
 
     Returns:
-        A list of tuples (index, embedding, score), sorted by score in descending order.
+        A tuple (indices, scores) of the top candidates, sorted by score in descending order.
     """
-    # Precompute norms for efficiency
-    liked_norms = np.linalg.norm(liked_embeds, axis=1)
-    disliked_norms = np.linalg.norm(disliked_embeds, axis=1)
-
-    scores = [] # List to store (index, embedding, score) tuples
-    # Iterate through each candidate embedding
-    for i, candidate in enumerate(candidate_embeds):
-        # Calculate the norm of the current candidate embedding
-        candidate_norm = np.linalg.norm(candidate)
-
-        # Calculate dot products between the candidate and all disliked embeddings
-        disliked_dots = np.dot(disliked_embeds, candidate)
-        # Calculate cosine similarities with disliked embeddings
-        disliked_similarities = disliked_dots / (disliked_norms * candidate_norm)
-
-        # If similarity with any disliked item is too high, assign score 0 and skip
-        if np.any(disliked_similarities >= 0.9):
-            scores.append((i, candidate, 0))
-            continue
-
-        # Calculate dot products between the candidate and all liked embeddings
-        liked_dots = np.dot(liked_embeds, candidate)
-        # Calculate cosine similarities with liked embeddings
-        liked_similarities = liked_dots / (liked_norms * candidate_norm)
-        # Calculate the final score as the sum of squared similarities with liked items
-        score = Similarity(np.sum(liked_similarities ** 2))
-
-        # Append the result for this candidate
-        scores.append((i, candidate, score))
-
-    # Sort the candidates by score in descending order
-    scores.sort(key=lambda x: x[2], reverse=True)
-    return scores
+    liked_embeds = EmbeddingStore.normalize(liked_embeds).reshape(-1, candidate_embeds.shape[1])
+    disliked_embeds = EmbeddingStore.normalize(disliked_embeds).reshape(-1, candidate_embeds.shape[1])
+
+    # Shape: (len(candidate_embeds), len(liked_embeds) + len(disliked_embeds))
+    similarities = candidate_embeds @ np.vstack([liked_embeds, disliked_embeds]).T
+    liked_similarities = similarities[:, :len(liked_embeds)]
+    disliked_similarities = similarities[:, len(liked_embeds):]
+
+    # The score is the sum of squared similarities with liked items,
+    # candidates too similar to any disliked item get a score of 0
+    scores = np.einsum("ij,ij->i", liked_similarities, liked_similarities)
+    disliked_mask = np.any(disliked_similarities >= 0.9, axis=1)
+    scores[disliked_mask] = 0
+
+    return top_k(scores, len(scores) if k is None else k, exclude)
+
+def euclidean_distances(store: EmbeddingStore, target: Embedding, dots: Optional[npt.NDArray[np.float32]] = None) -> npt.NDArray[np.float32]:
+    """Euclidean distances between all raw course embeddings and a target vector.
+
+    Uses |e - t|^2 = |e|^2 - 2|e|(ê·t) + |t|^2 with the precomputed norms, so only
+    a single matrix-vector product over the normalized matrix is needed. The products
+    ê·t can be passed in when they were computed as part of a larger matrix product.
+    """
+    target = np.asarray(target, dtype=np.float32)
+    if dots is None:
+        dots = store.similarity(target)
+    squared = store.norms ** 2 - 2 * store.norms * dots + np.dot(target, target)
+    return np.sqrt(np.maximum(squared, 0))
+
+def candidate_pool(scores: npt.NDArray, size: int, excluded_idxs: List[int]) -> List[int]:
+    """Top `size` courses by score with the excluded ones removed, used as the MMR candidate list."""
+    excluded = exclusion_mask(len(scores), excluded_idxs)
+    return [int(i) for i in top_k_indices(scores, size) if not excluded[i]]
 
 def recommend_courses(
         liked_codes: List[str],
         disliked_codes: List[str],
         skipped_codes: List[str],
-        all_embeds: npt.NDArray,
+        store: EmbeddingStore,
         courseClient: CourseClient,
         n: int
-    ) -> List[CourseWithId]:
-    liked_ids = courseClient.get_course_ids_by_codes(liked_codes)
-    disliked_ids = courseClient.get_course_ids_by_codes(disliked_codes)
+    ) -> List[Recommendation]:
+    liked_ids = store.ids_for_codes(liked_codes)
+    disliked_ids = store.ids_for_codes(disliked_codes)
 
     if not liked_ids:
         raise ValueError("No liked courses found")
 
-    liked_embeds = all_embeds[liked_ids]
-    disliked_embeds = all_embeds[disliked_ids]
+    excluded = exclusion_mask(len(store), store.ids_for_codes(liked_codes + disliked_codes + skipped_codes))
 
-    top_candidates = sort_by_similarity(liked_embeds, disliked_embeds, all_embeds)
-    
-    res: List[CourseWithId] = []
-    for idx, _, sim in top_candidates:
-        if len(res) == n:
-            break
-
-        found = courseClient.get_course_by_id(idx)
-        if found is None:
-            continue
-
-        if found.CODE not in liked_codes \
-            and found.CODE not in disliked_codes \
-            and found.CODE not in skipped_codes:
-            found.SIMILARITY = sim
-            res.append(found)
+    top_idxs, top_scores = sort_by_similarity(
+        store.embeds[liked_ids],
+        store.embeds[disliked_ids],
+        store.embeds,
+        k=n,
+        exclude=excluded,
+    )
 
-    return res
+    return [
+        Recommendation(ID=int(idx), CODE=store.codes[idx], SIMILARITY=Similarity(sim))
+        for idx, sim in zip(top_idxs, top_scores)
+    ]
 
 def recommend_average(
     liked_codes: list[str],
     disliked_codes: list[str],
     skipped_codes: list[str],
-    all_embeds: np.ndarray,
+    store: EmbeddingStore,
     courseClient,
     n: int = 10
-) -> list[dict]:
+) -> list[Recommendation]:
     """
     Recommends courses based on the average of liked embeddings minus the average of disliked embeddings.
     
@@ -118,7 +118,7 @@ def recommend_average(
         liked_codes: List of course codes that the user likes
         disliked_codes: List of course codes that the user dislikes
         skipped_codes: List of course codes to skip in recommendations
-        all_embeds: Array of all course embeddings
+        store: Normalized course embeddings
         courseClient: Client for retrieving course information
         n: Number of recommendations to return
         
@@ -126,50 +126,35 @@ def recommend_average(
         List of recommended courses with similarity scores
     """
     # Get indices of liked and disliked courses
-    liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
-    disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
+    liked_indices = store.ids_for_codes(liked_codes)
+    disliked_indices = store.ids_for_codes(disliked_codes)
     
     # Skip empty sets
     if not liked_indices:
         return []
     
     # Calculate average embeddings
-    liked_avg = np.mean(all_embeds[liked_indices], axis=0)
+    liked_avg = np.mean(store.vectors(liked_indices), axis=0)
     
     # If there are disliked courses, subtract their average from the liked average
     if disliked_indices:
-        disliked_avg = np.mean(all_embeds[disliked_indices], axis=0)
+        disliked_avg = np.mean(store.vectors(disliked_indices), axis=0)
         target_embedding = liked_avg - disliked_avg*0.5
     else:
         target_embedding = liked_avg
     
     # Calculate Euclidean distances
-    distances = np.linalg.norm(all_embeds - target_embedding, axis=1)
-    
-    # Create a list of (index, distance) tuples and sort by distance (ascending)
-    indices_with_distances = [(i, dist) for i, dist in enumerate(distances)]
-    indices_with_distances.sort(key=lambda x: x[1])
+    distances = euclidean_distances(store, target_embedding)
     
-    # Filter out liked, disliked, and skipped courses
-    excluded_codes = set(liked_codes + disliked_codes + skipped_codes)
-    recommendations = []
-    
-    for i in range(len(indices_with_distances)):
-        if len(recommendations) >= n:
-            break
-            
-        idx, distance = indices_with_distances[i]
-        code = courseClient.get_course_by_id(idx).CODE
-        if code in excluded_codes:
-            continue
-        course = courseClient.get_course_by_id(idx)
-        if not course:
-            continue
+    # Select the closest courses, excluding liked, disliked, and skipped ones
+    excluded = exclusion_mask(len(store), store.ids_for_codes(liked_codes + disliked_codes + skipped_codes))
+    top_idxs, top_distances = top_k(-distances, n, excluded)
 
+    recommendations = []
+    for idx, distance in zip(top_idxs, -top_distances):
         # Convert distance to similarity (lower distance = higher similarity)
         similarity = 1.0 / (1.0 + distance)  # Simple conversion to a 0-1 scale
-        course.SIMILARITY = similarity
-        recommendations.append(course)
+        recommendations.append(Recommendation(ID=int(idx), CODE=store.codes[idx], SIMILARITY=float(similarity)))
     
     return recommendations
 
@@ -177,238 +162,281 @@ def recommend_mmr(
   liked_codes: list[str],
   disliked_codes: list[str],
   skipped_codes: list[str],
-  all_embeds: np.ndarray,
+  store: EmbeddingStore,
   courseClient,
   n: int = 10,
-  lambda_param: float = 0.7
-) -> list[dict]:
+  lambda_param: float = 0.7,
+  diversity: Diversity = "liked",
+) -> list[Recommendation]:
   # … same setup as before …
-  liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
+  liked_indices = store.ids_for_codes(liked_codes)
   if not liked_indices:
     return []
-  liked_avg = np.mean(all_embeds[liked_indices], axis=0)
+  liked_avg = np.mean(store.vectors(liked_indices), axis=0)
   if disliked_codes:
-    disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
-    disliked_avg = np.mean(all_embeds[disliked_indices], axis=0)
+    disliked_indices = store.ids_for_codes(disliked_codes)
+    disliked_avg = np.mean(store.vectors(disliked_indices), axis=0)
     target_embed = liked_avg - 0.5 * disliked_avg
   else:
     target_embed = liked_avg
 
   # 1) compute raw distances and raw target‐similarities
-  distances = np.linalg.norm(all_embeds - target_embed, axis=1)
+  distances = euclidean_distances(store, target_embed)
   sim_to_target = 1.0 / (1.0 + distances)
 
   excluded = set(liked_codes + disliked_codes + skipped_codes)
 
   # 2) build initial candidate list, sorted by descending sim_to_target
-  candidate_idxs = [
-    i for i in np.argsort(-sim_to_target)
-  ][:(max(n, 100) + len(excluded))]
-
-  excluded_idxs = courseClient.get_course_ids_by_codes(excluded)
-  candidate_idxs = [
-    c for c in candidate_idxs
-    if c not in excluded_idxs
-  ]
-
-  # 3) MMR re‐ranking loop
-  selected_idxs: list[int] = []
-  while len(selected_idxs) < n and candidate_idxs:
-    # Get current candidate and liked embeddings
-    current_candidate_embeds = all_embeds[candidate_idxs]
-    # liked_embeds can be calculated once outside the loop if liked_indices is static
-    liked_embeds = all_embeds[liked_indices]
-
-    # 1) Relevance term (vectorized)
-    rel_vector = sim_to_target[candidate_idxs]
-
-    # 2) Diversity term (vectorized)
-    # Calculate distances between each candidate and all liked embeddings
-    # Shape: (len(candidate_idxs), len(liked_indices))
-    distances_cl = np.linalg.norm(
-        current_candidate_embeds[:, None, :] - liked_embeds[None, :, :],
-        axis=2
-    )
-    # Convert distances to similarities
-    similarities_cl = 1.0 / (1.0 + distances_cl)
-    # Calculate diversity for each candidate (max similarity to any liked item)
-    # Shape: (len(candidate_idxs),)
-    div_vector = np.max(similarities_cl, axis=1)
-
-    # 3) Calculate MMR scores (vectorized)
-    mmr_scores_vector = lambda_param * rel_vector - (1 - lambda_param) * div_vector
+  candidate_idxs = candidate_pool(sim_to_target, max(n, 100) + len(excluded), store.ids_for_codes(excluded))
 
-    # 4) Find the index *within candidate_idxs* corresponding to the max score
-    max_score_local_idx = np.argmax(mmr_scores_vector)
+  # 3) MMR re‐ranking on the raw vectors, with 1 / (1 + distance) as the similarity
+  reranker = MMRReranker(store.vectors(candidate_idxs), sim_to_target[candidate_idxs], metric="euclidean")
+  selected = reranker.select(n, lambda_param, store.vectors(liked_indices), diversity)
+  selected_idxs = [candidate_idxs[i] for i in selected]
 
-    # 5) Get the actual course index (ID) with the highest score
-    next_idx = candidate_idxs[max_score_local_idx]
-
-    # 6) Add the best candidate to selected list and remove from candidates
-    selected_idxs.append(next_idx)
-    candidate_idxs.pop(max_score_local_idx) # More efficient than remove() when we have the index
-
-
-  # 4) fetch the courses in the final order
-  recommendations: list[CourseWithId] = []
-  for idx in selected_idxs:
-    course = courseClient.get_course_by_id(idx)
-    if course:
-      # you can still store the original distance or sim in an attribute
-      #course.SIMILARITY = float(distances[idx])
-      recommendations.append(course)
-
-  return recommendations
+  # 4) return the courses in the final order
+  # you can still store the original distance or sim in SIMILARITY
+  return [Recommendation(ID=int(idx), CODE=store.codes[idx]) for idx in selected_idxs]
 
 def recommend_max(
   liked_codes: list[str],
   disliked_codes: list[str],
   skipped_codes: list[str],
-  all_embeds: np.ndarray,
+  store: EmbeddingStore,
   courseClient,
   n: int = 10,
-) -> list[dict]:
+) -> list[Recommendation]:
   """
   Most smimilar to any of the liked based on cosine
   """
   excluded = set(liked_codes + disliked_codes + skipped_codes)
 
-  liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
-  disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
-  excluded_indices = courseClient.get_course_ids_by_codes(excluded)
-
-  liked_embeds = all_embeds[liked_indices]
-  disliked_embeds = all_embeds[disliked_indices]
+  liked_indices = store.ids_for_codes(liked_codes)
+  disliked_indices = store.ids_for_codes(disliked_codes)
+  excluded_indices = store.ids_for_codes(excluded)
+  excluded_mask = exclusion_mask(len(store), excluded_indices)
 
-  # 1. calculate overall similarity
-  candidate_embeds_norm = all_embeds / np.linalg.norm(all_embeds, axis=1, keepdims=True)
-  liked_embeds_norm = liked_embeds / np.linalg.norm(liked_embeds, axis=1, keepdims=True)
-  # Shape: (len(candidate_idxs), len(liked_indices))
-  similarity_liked = np.dot(candidate_embeds_norm, liked_embeds_norm.T)
+  def score(similarities):
+    # 2. select best match for each course
+    best_match_liked = np.max(similarities[0], axis=1)
 
-  # 2. select best match for each course
-  best_match_liked = np.max(similarity_liked, axis=1)
-
-  # 3. filter out courses that are too similar
-  if disliked_embeds.shape[0] > 0:
-    disliked_embeds_norm = disliked_embeds / np.linalg.norm(disliked_embeds, axis=1, keepdims=True)
-    similarity_disliked = np.dot(candidate_embeds_norm, disliked_embeds_norm.T)
-    best_match_disliked = np.max(similarity_disliked, axis=1)
-
-    to_filter_idx = np.where(best_match_disliked > 0.9)[0]
-    best_match_liked[to_filter_idx] = -np.inf
-
-  # 4. get indices of top n courses
-  selected_idxs = np.argsort(-best_match_liked)[:(n + len(excluded))]
-  selected_idxs = [i for i in selected_idxs if i not in excluded_indices]
+    # 3. filter out courses that are too similar
+    if disliked_indices:
+      best_match_disliked = np.max(similarities[1], axis=1)
 
-  # 5. fetch the courses in the final order
-  recommendations: list[dict] = []
-  for idx in selected_idxs:
-    course = courseClient.get_course_by_id(idx)
-    if course:
-      # Optionally, attach the similarity score
-      # course.SIMILARITY = float(best_match_liked[idx])
-      course.RECOMMENDED_FROM = [courseClient.get_course_by_id(liked_indices[np.argmax(similarity_liked[idx])]).CODE]
-      recommendations.append(course)
+      to_filter_idx = np.where(best_match_disliked > 0.9)[0]
+      best_match_liked[to_filter_idx] = -np.inf
+    return best_match_liked
 
-  return recommendations
+  # 1. calculate overall similarity (a store with a first-pass matrix rescores its shortlist exactly)
+  # Shape: (len(candidate_idxs), len(liked_indices))
+  targets = [store.embeds[liked_indices]] + ([store.embeds[disliked_indices]] if disliked_indices else [])
+  rows = None
+  if store.graph is not None and store.graph.serves(liked_indices):
+    # Small profiles: the union of the liked courses' neighbour lists, unless the lists run out
+    rows = store.graph.candidates(liked_indices)
+    similarities = store.candidate_similarity(targets, rows)
+    best_match_liked = score(similarities)
+    if not store.graph.covers(liked_indices, best_match_liked[~excluded_mask[rows]], n):
+      rows = None
+  if rows is None:
+    rows, similarities = store.rescored_similarity(targets, score, excluded_mask, min_rows=n)
+    best_match_liked = score(similarities)
+  similarity_liked = similarities[0]
+
+  # 4. get indices of top n candidates
+  selected_idxs, _ = top_k(best_match_liked, n, excluded_mask[rows])
+
+  # 5. return the courses in the final order
+  # Optionally, attach the similarity score as SIMILARITY=float(best_match_liked[idx])
+  return [
+    Recommendation(
+      ID=int(rows[idx]),
+      CODE=store.codes[rows[idx]],
+      RECOMMENDED_FROM=[store.codes[liked_indices[np.argmax(similarity_liked[idx])]]],
+    )
+    for idx in selected_idxs
+  ]
 
 def recommend_mmr_cos(
   liked_codes: list[str],
   disliked_codes: list[str],
   skipped_codes: list[str],
-  all_embeds: np.ndarray,
+  store: EmbeddingStore,
   courseClient,
   n: int = 10,
-  lambda_param: float = 0.7
-) -> list[dict]:
-  liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
+  lambda_param: float = 0.7,
+  diversity: Diversity = "liked",
+) -> list[Recommendation]:
+  liked_indices = store.ids_for_codes(liked_codes)
   if not liked_indices:
     return []
-  liked_avg = np.mean(all_embeds[liked_indices], axis=0)
+  liked_avg = np.mean(store.vectors(liked_indices), axis=0)
   if disliked_codes:
-    disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
-    disliked_avg = np.mean(all_embeds[disliked_indices], axis=0)
+    disliked_indices = store.ids_for_codes(disliked_codes)
+    disliked_avg = np.mean(store.vectors(disliked_indices), axis=0)
     target_embed = liked_avg - 0.5 * disliked_avg
   else:
     target_embed = liked_avg
 
-  # 1) compute cosine similarities directly
-  target_norm = np.linalg.norm(target_embed)
-  target_embed_norm = target_embed / target_norm if target_norm > 0 else target_embed
-  all_embeds_norm = all_embeds / np.linalg.norm(all_embeds, axis=1, keepdims=True)
-  
-  sim_to_target = np.dot(all_embeds_norm, target_embed_norm)
-
-  # 2) build initial candidate list, sorted by descending sim_to_target
   excluded = set(liked_codes + disliked_codes + skipped_codes)
-  excluded_idxs = courseClient.get_course_ids_by_codes(excluded)
-
-  # Filter out courses that are too similar to liked courses
-  # Calculate similarity to individual liked courses
-  liked_embeds_single = all_embeds[liked_indices]
-  liked_embeds_single_norm = liked_embeds_single / np.linalg.norm(liked_embeds_single, axis=1, keepdims=True)
-  similarity_to_single = np.dot(all_embeds_norm, liked_embeds_single_norm.T)
-  max_similarity_to_single = np.max(similarity_to_single, axis=1)
-  sim_to_target[max_similarity_to_single > 0.8] = -np.inf
+  excluded_idxs = store.ids_for_codes(excluded)
+  pool_size = max(n, 100) + len(excluded)
+  liked_embeds_norm = store.embeds[liked_indices]
+
+  def score(similarities):
+    # Filter out courses that are too similar to liked courses
+    sim_to_target = similarities[0].reshape(-1).copy()
+    sim_to_target[np.max(similarities[1], axis=1) > 0.8] = -np.inf
+    return sim_to_target
+
+  # 1) compute cosine similarities directly, to the target and to individual liked courses
+  # (a store with a first-pass matrix rescores its shortlist exactly)
+  excluded_mask = exclusion_mask(len(store), excluded_idxs)
+  rows, similarities = store.rescored_similarity(
+    [store.normalize(target_embed), liked_embeds_norm],
+    score,
+    excluded_mask,
+    min_rows=pool_size,
+  )
+  max_similarity_to_single = np.max(similarities[1], axis=1)
+  sim_to_target = score(similarities)
 
   print(f"[average] Filtered out {np.sum(max_similarity_to_single > 0.8)} courses that are too similar to liked ones")
 
-  candidate_idxs = [
-    i for i in np.argsort(-sim_to_target)
-  ][:(max(n, 100) + len(excluded))]
+  # 2) build initial candidate list, sorted by descending sim_to_target
+  candidate_positions = candidate_pool(sim_to_target, pool_size, np.flatnonzero(excluded_mask[rows]))
+  candidate_idxs = [int(rows[i]) for i in candidate_positions]
 
-  candidate_idxs = [
-    c for c in candidate_idxs
-    if c not in excluded_idxs
-  ]
+  # 3) MMR re‐ranking
+  reranker = MMRReranker(store.embeds[candidate_idxs], sim_to_target[candidate_positions])
+  selected_idxs = [candidate_idxs[i] for i in reranker.select(n, lambda_param, liked_embeds_norm, diversity)]
 
-  # 3) MMR re‐ranking loop
-  liked_embeds = all_embeds[liked_indices]
-  liked_embeds_norm = liked_embeds / np.linalg.norm(liked_embeds, axis=1, keepdims=True)
+  # 4) return the courses in the final order
+  # The cosine similarity could be stored directly as SIMILARITY=float(sim_to_target[idx])
+  return [Recommendation(ID=int(idx), CODE=store.codes[idx]) for idx in selected_idxs]
 
-  selected_idxs: list[int] = []
-  while len(selected_idxs) < n and candidate_idxs:
-    current_candidate_embeds = all_embeds[candidate_idxs]
+def pair_targets(liked_embeds: Embeddings) -> Tuple[Embeddings, List[Tuple[int, int]]]:
+  """
+  The normalized average of each pair of liked embeddings, a course paired with itself included,
+  and the (i, j) pair of liked indices of each target.
+  """
+  first, second = np.triu_indices(len(liked_embeds))
+  target_embeds_index_to_pair = list(zip(first.tolist(), second.tolist()))
+  targed_embeds = (liked_embeds[first] + liked_embeds[second]) / 2
+  return EmbeddingStore.normalize(targed_embeds).reshape(len(target_embeds_index_to_pair), liked_embeds.shape[1]), target_embeds_index_to_pair
+
+def combination_scores(
+  best_match_target_score: npt.NDArray[np.float32],
+  best_match_target: npt.NDArray[np.intp],
+  target_embeds_index_to_pair: List[Tuple[int, int]],
+  similarity_liked: npt.NDArray[np.float32],
+  similarity_disliked: Optional[npt.NDArray[np.float32]],
+) -> Tuple[npt.NDArray[np.float32], int, Optional[int]]:
+  """
+  Scores courses by their best matching pair target, given the similarity of all courses
+  to their best pair target (see `PairScorer.best`) and to the liked and the disliked courses
+  (one column each).
 
-    # 1) Relevance term (vectorized)
-    rel_vector = sim_to_target[candidate_idxs]
+  Returns:
+    A tuple (scores, number of courses filtered out as too similar to a liked one, number
+    filtered out as too similar to a disliked one or None without disliked courses).
+  """
+  indices_of_non_combinations_candidates = [k for k, (i, j) in enumerate(target_embeds_index_to_pair) if i == j]
+  best_match_target_score = best_match_target_score.copy()
 
-    # 2) Diversity term (vectorized)
-    # Normalize for cosine similarity
-    current_candidate_embeds_norm = current_candidate_embeds / np.linalg.norm(current_candidate_embeds, axis=1, keepdims=True)
-    
-    # Calculate cosine similarities between each candidate and all liked embeddings
-    # Shape: (len(candidate_idxs), len(liked_indices))
-    similarities_cl = np.dot(current_candidate_embeds_norm, liked_embeds_norm.T)
-    
-    # Calculate diversity for each candidate (max similarity to any liked item)
-    # Shape: (len(candidate_idxs),)
-    div_vector = np.max(similarities_cl, axis=1)
+  # Penalize courses that are closest to non-combinations
+  closest_to_non_combinations_candidates = np.isin(best_match_target, indices_of_non_combinations_candidates)
+  best_match_target_score[closest_to_non_combinations_candidates] *= 0.95
 
-    # 3) Calculate MMR scores (vectorized)
-    mmr_scores_vector = lambda_param * rel_vector - (1 - lambda_param) * div_vector
+  # Similarity to original liked courses for filtering
+  best_match_liked = np.max(similarity_liked, axis=1)
+
+  # Filter out courses that are too similar to liked ones
+  to_filter_idx = np.where(best_match_liked > 0.94)[0]
+  best_match_target_score[to_filter_idx] = -np.inf
+  num_filtered_out_liked = len(to_filter_idx)
 
-    # 4) Find the index *within candidate_idxs* corresponding to the max score
-    max_score_local_idx = np.argmax(mmr_scores_vector)
+  # 3. filter out courses that are too similar to disliked ones
+  num_filtered_out_disliked = None
+  if similarity_disliked is not None and similarity_disliked.shape[1]:
+    best_match_disliked = np.max(similarity_disliked, axis=1)
 
-    # 5) Get the actual course index (ID) with the highest score
-    next_idx = candidate_idxs[max_score_local_idx]
+    to_filter_idx = np.where(best_match_disliked > 0.8)[0]
+    best_match_target_score[to_filter_idx] = -np.inf
+    num_filtered_out_disliked = len(to_filter_idx)
 
-    # 6) Add the best candidate to selected list and remove from candidates
-    selected_idxs.append(next_idx)
-    candidate_idxs.pop(max_score_local_idx) # More efficient than remove() when we have the index
+  return best_match_target_score, num_filtered_out_liked, num_filtered_out_disliked
 
+def combination_floor(
+  similarity_liked: npt.NDArray[np.float32],
+  similarity_disliked: Optional[npt.NDArray[np.float32]],
+  excluded: npt.NDArray[np.bool_],
+  n: int,
+) -> float:
+  """
+  A score at least n courses reach in `combination_scores`: a course's best pair target is at
+  least as similar as its closest liked course (paired with itself), penalized by at most 0.95.
+  Courses whose best pair cannot reach it are never recommended and need no pair scoring.
+  """
+  best_match_liked = np.max(similarity_liked, axis=1)
+  eligible = ~excluded & ~(best_match_liked > 0.94)
+  if similarity_disliked is not None and similarity_disliked.shape[1]:
+    eligible &= ~(np.max(similarity_disliked, axis=1) > 0.8)
+  lower = np.minimum(best_match_liked, best_match_liked * np.float32(0.95))[eligible]
+  if n <= 0 or len(lower) < n:
+    return -np.inf
+  return float(-np.partition(-lower, n - 1)[n - 1])
+
+def select_max_with_combinations(
+  best_match_target_score: npt.NDArray[np.float32],
+  best_match_target: npt.NDArray[np.intp],
+  target_embeds_index_to_pair: List[Tuple[int, int]],
+  similarity_liked: npt.NDArray[np.float32],
+  similarity_disliked: Optional[npt.NDArray[np.float32]],
+  liked_indices: List[int],
+  excluded: npt.NDArray[np.bool_],
+  store: EmbeddingStore,
+  n: int,
+  verbose: bool = True,
+  rows: Optional[npt.NDArray[np.intp]] = None,
+) -> list[Recommendation]:
+  """
+  Ranks courses by their best matching pair target, given the similarity of all courses to
+  their best pair target and to the liked and the disliked courses (one column each).
 
-  # 4) fetch the courses in the final order
-  recommendations: list[dict] = []
-  for idx in selected_idxs:
-    course = courseClient.get_course_by_id(idx)
-    if course:
-      # Store the cosine similarity directly
-      # course.SIMILARITY = float(sim_to_target[idx])
-      recommendations.append(course)
+  Args:
+    rows: Course IDs of the similarity rows when only candidates were scored, all courses when None.
+      `excluded` is then indexed like the similarity rows as well.
+  """
+  best_match_target_score, num_filtered_out_liked, num_filtered_out_disliked = combination_scores(
+    best_match_target_score, best_match_target, target_embeds_index_to_pair, similarity_liked, similarity_disliked,
+  )
+  if verbose:
+    print(f"Filtered out {num_filtered_out_liked} courses that are too similar to liked ones")
+    if num_filtered_out_disliked is not None:
+      print(f"Filtered out {num_filtered_out_disliked} courses that are too similar to disliked ones")
+
+  # 4. walk the courses in descending score order, skipping excluded ones
+  ranked_idxs = ranked(best_match_target_score, excluded, fetch=n)
+
+  # 5. take the top n and explain each by its best matching liked pair
+  recommendations: list[Recommendation] = []
+  for idx, _ in ranked_idxs:
+    if len(recommendations) >= n:
+      break
+    # Optionally, attach the similarity score as SIMILARITY=float(best_match_liked[idx])
+    course_idx = idx if rows is None else rows[idx]
+    recommendation = Recommendation(ID=int(course_idx), CODE=store.codes[course_idx])
+    best_match_target_idx = best_match_target[idx]
+    best_match_target1, best_match_target2 = target_embeds_index_to_pair[best_match_target_idx]
+    best_match_code1 = store.codes[liked_indices[best_match_target1]]
+    best_match_code2 = store.codes[liked_indices[best_match_target2]]
+    if best_match_code1 == best_match_code2:
+      recommendation.RECOMMENDED_FROM = [best_match_code1]
+    else:
+      recommendation.RECOMMENDED_FROM = [best_match_code1, best_match_code2]
+    recommendations.append(recommendation)
 
   return recommendations
 
@@ -416,200 +444,101 @@ def recommend_max_with_combinations(
   liked_codes: list[str],
   disliked_codes: list[str],
   skipped_codes: list[str],
-  all_embeds: np.ndarray,
+  store: EmbeddingStore,
   courseClient,
   n: int = 10,
-) -> list[dict]:
+  prune_liked: int = 0,
+) -> list[Recommendation]:
   """
   Most smimilar to any pair of liked based on cosine
-  """
-  excluded = set(liked_codes + disliked_codes + skipped_codes)
-
-  liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
-  disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
-  excluded_indices = courseClient.get_course_ids_by_codes(excluded)
-
-  liked_embeds = all_embeds[liked_indices]
-  disliked_embeds = all_embeds[disliked_indices]
-
-  # The average of each pair of liked embeddings
-  targed_embeds = np.array([
-    np.mean(liked_embeds[[i, j]], axis=0)
-    for i in range(len(liked_embeds))
-    for j in range(i, len(liked_embeds))
-  ])
-
-  target_embeds_index_to_pair = [
-    (i, j) for i in range(len(liked_embeds)) for j in range(i, len(liked_embeds))
-  ]
-
-  indices_of_non_combinations_candidates = [k for k, (i, j) in enumerate(target_embeds_index_to_pair) if i == j]
 
-  # 1. calculate overall similarity
-  candidate_embeds_norm = all_embeds / np.linalg.norm(all_embeds, axis=1, keepdims=True)
-  target_embeds_norm = targed_embeds / np.linalg.norm(targed_embeds, axis=1, keepdims=True)
-  # Shape: (len(candidate_idxs), len(targed_embeds))
-  similarity_target = np.dot(candidate_embeds_norm, target_embeds_norm.T)
+  The similarity to the mean of each pair of liked courses is derived from the similarities
+  to the liked courses themselves (see `PairScorer`), so the pair targets are never built.
 
-  # 2. select best match for each course and note to which target it matched best
-  best_match_target_score = np.max(similarity_target, axis=1)
-  best_match_target = np.argmax(similarity_target, axis=1)
-
-  # Penalize courses that are closest to non-combinations
-  closest_to_non_combinations_candidates = np.isin(best_match_target, indices_of_non_combinations_candidates)
-  best_match_target_score[closest_to_non_combinations_candidates] *= 0.95
-
-  # Calculate similarity to original liked courses for filtering
-  liked_embeds_norm = liked_embeds / np.linalg.norm(liked_embeds, axis=1, keepdims=True)
-  similarity_liked = np.dot(candidate_embeds_norm, liked_embeds_norm.T)
-  best_match_liked = np.max(similarity_liked, axis=1)
+  Args:
+    prune_liked: Score only the pairs among each course's `prune_liked` most similar liked
+      courses when more are liked, 0 scores all pairs.
+  """
+  excluded = set(liked_codes + disliked_codes + skipped_codes)
 
-  # Filter out courses that are too similar to liked ones
-  to_filter_idx = np.where(best_match_liked > 0.94)[0]
-  best_match_target_score[to_filter_idx] = -np.inf
-  num_filtered_out_liked = len(to_filter_idx)
-  print(f"Filtered out {num_filtered_out_liked} courses that are too similar to liked ones")
+  liked_indices = store.ids_for_codes(liked_codes)
+  disliked_indices = store.ids_for_codes(disliked_codes)
+  excluded_indices = store.ids_for_codes(excluded)
+  if not liked_indices:
+    return []
 
-  # 3. filter out courses that are too similar to disliked ones
-  if disliked_embeds.shape[0] > 0:
-    disliked_embeds_norm = disliked_embeds / np.linalg.norm(disliked_embeds, axis=1, keepdims=True)
-    similarity_disliked = np.dot(candidate_embeds_norm, disliked_embeds_norm.T)
-    best_match_disliked = np.max(similarity_disliked, axis=1)
+  # The average of each pair of liked embeddings, scored algebraically
+  scorer = PairScorer(store.embeds[liked_indices], store.norms[liked_indices], prune=prune_liked)
+  target_embeds_index_to_pair = scorer.pairs
 
-    to_filter_idx = np.where(best_match_disliked > 0.8)[0]
-    best_match_target_score[to_filter_idx] = -np.inf
-    num_filtered_out_disliked = len(to_filter_idx)
-    print(f"Filtered out {num_filtered_out_disliked} courses that are too similar to disliked ones")
+  excluded = exclusion_mask(len(store), excluded_indices) | courseClient.ineligible_mask(len(store))
 
-  # 4. get indices of top n courses
-  selected_idxs = np.argsort(-best_match_target_score)
-  
-  # 5. fetch the courses in the final order
-  recommendations: list[dict] = []
-  for idx in selected_idxs:
-    course = courseClient.get_course_by_id(idx)
-    if idx in excluded_indices:
-      continue
-    if courseClient.filter_courses(course):
-      continue
-    if course:
-      # Optionally, attach the similarity score
-      # course.SIMILARITY = float(best_match_liked[idx])
-      best_match_target_idx = best_match_target[idx]
-      best_match_target1, best_match_target2 = target_embeds_index_to_pair[best_match_target_idx]
-      best_match_course1 = courseClient.get_course_by_id(liked_indices[best_match_target1])
-      best_match_course2 = courseClient.get_course_by_id(liked_indices[best_match_target2])
-      if best_match_course1.CODE == best_match_course2.CODE:
-        course.RECOMMENDED_FROM = [best_match_course1.CODE]
-      else:
-         course.RECOMMENDED_FROM = [best_match_course1.CODE, best_match_course2.CODE]
-      recommendations.append(course)
-      if len(recommendations) >= n:
-        break
+  def score(similarities):
+    return combination_scores(
+      *scorer.best(similarities[0]), target_embeds_index_to_pair, similarities[0], similarities[1] if disliked_indices else None,
+    )[0]
 
-  return recommendations
+  # 1. calculate the similarity to the liked and disliked courses (a store with a first-pass matrix
+  # rescores its shortlist exactly, an index probes with the pair targets)
+  # Shape: (len(candidate_idxs), len(liked_indices))
+  targets = [store.embeds[liked_indices]] + ([store.embeds[disliked_indices]] if disliked_indices else [])
+  queries = pair_targets(store.vectors(liked_indices))[0] if store.index is not None else None
+  rows, similarities = store.rescored_similarity(targets, score, excluded, min_rows=n, queries=queries)
+  similarity_liked = similarities[0]
+  similarity_disliked = similarities[1] if disliked_indices else None
+
+  # Only courses that can reach the n-th best score get their pairs scored
+  floor = combination_floor(similarity_liked, similarity_disliked, excluded[rows], n)
+  return select_max_with_combinations(
+    *scorer.best(similarity_liked, floor), target_embeds_index_to_pair, similarity_liked, similarity_disliked,
+    liked_indices, excluded[rows], store, n, rows=rows,
+  )
 
 def recommend_max_with_combinations_with_mmr(
   liked_codes: list[str],
   disliked_codes: list[str],
   skipped_codes: list[str],
-  all_embeds: np.ndarray,
+  store: EmbeddingStore,
   courseClient,
   n: int = 10,
-  lambda_param: float = 0.7
-) -> list[dict]:
+  lambda_param: float = 0.7,
+  diversity: Diversity = "liked",
+) -> list[Recommendation]:
   """
   Most smimilar to any pair of liked based on cosine with MMR
   """
   excluded = set(liked_codes + disliked_codes + skipped_codes)
 
-  liked_indices = courseClient.get_course_ids_by_codes(liked_codes)
-  disliked_indices = courseClient.get_course_ids_by_codes(disliked_codes)
-  excluded_indices = courseClient.get_course_ids_by_codes(excluded)
+  liked_indices = store.ids_for_codes(liked_codes)
+  disliked_indices = store.ids_for_codes(disliked_codes)
+  excluded_indices = store.ids_for_codes(excluded)
   
-  liked_embeds = all_embeds[liked_indices]
-  orig_liked_embeds = all_embeds[liked_indices]
-  disliked_embeds = all_embeds[disliked_indices]
-
-  # The average of each pair of liked embeddings
-  liked_embeds = np.array([
-    np.mean(liked_embeds[[i, j]], axis=0)
-    for i in range(len(liked_embeds))
-    for j in range(i, len(liked_embeds))
-  ])
-
-  # 1. calculate overall similarity
-  candidate_embeds_norm = all_embeds / np.linalg.norm(all_embeds, axis=1, keepdims=True)
-  liked_embeds_norm = liked_embeds / np.linalg.norm(liked_embeds, axis=1, keepdims=True)
-  original_liked_embeds_norm = orig_liked_embeds / np.linalg.norm(orig_liked_embeds, axis=1, keepdims=True)
-  # Shape: (len(candidate_idxs), len(liked_indices))
-  similarity_liked = np.dot(candidate_embeds_norm, liked_embeds_norm.T)
+  original_liked_embeds_norm = store.embeds[liked_indices]
+  # 1. similarity to the mean of each pair of liked embeddings, from one product with the liked
+  # and disliked courses
+  similarity = store.similarity(store.embeds[liked_indices + disliked_indices])
+  scorer = PairScorer(original_liked_embeds_norm, store.norms[liked_indices])
 
   # 2. select best match for each course
-  best_match_liked = np.max(similarity_liked, axis=1)
+  best_match_liked = scorer.best(similarity[:, :len(liked_indices)])[0]
 
   # 3. filter out courses that are too similar
-  if disliked_embeds.shape[0] > 0:
-    disliked_embeds_norm = disliked_embeds / np.linalg.norm(disliked_embeds, axis=1, keepdims=True)
-    similarity_disliked = np.dot(candidate_embeds_norm, disliked_embeds_norm.T)
+  if disliked_indices:
+    similarity_disliked = similarity[:, len(liked_indices):]
     best_match_disliked = np.max(similarity_disliked, axis=1)
 
     to_filter_idx = np.where(best_match_disliked > 0.9)[0]
     best_match_liked[to_filter_idx] = -np.inf
 
   excluded = set(liked_codes + disliked_codes + skipped_codes)
-  excluded_idxs = courseClient.get_course_ids_by_codes(excluded)
-
-  candidate_idxs = [
-    i for i in np.argsort(-best_match_liked)
-  ][:(max(n, 500) + len(excluded))]
-
-  candidate_idxs = [
-    c for c in candidate_idxs
-    if c not in excluded_idxs
-  ]
-
-  # 3) MMR re‐ranking loop
-  selected_idxs: list[int] = []
-  while len(selected_idxs) < n and candidate_idxs:
-    current_candidate_embeds = all_embeds[candidate_idxs]
-
-    # 1) Relevance term (vectorized)
-    rel_vector = best_match_liked[candidate_idxs]
-
-    # 2) Diversity term (vectorized)
-    # Normalize for cosine similarity
-    current_candidate_embeds_norm = current_candidate_embeds / np.linalg.norm(current_candidate_embeds, axis=1, keepdims=True)
-    
-    # Calculate cosine similarities between each candidate and all liked embeddings
-    # Shape: (len(candidate_idxs), len(liked_indices))
-    similarities_cl = np.dot(current_candidate_embeds_norm, original_liked_embeds_norm.T)
-    
-    # Calculate diversity for each candidate (max similarity to any liked item)
-    # Shape: (len(candidate_idxs),)
-    div_vector = np.max(similarities_cl, axis=1)
-
-    # 3) Calculate MMR scores (vectorized)
-    mmr_scores_vector = lambda_param * rel_vector - (1 - lambda_param) * div_vector
-
-    # 4) Find the index *within candidate_idxs* corresponding to the max score
-    max_score_local_idx = np.argmax(mmr_scores_vector)
-
-    # 5) Get the actual course index (ID) with the highest score
-    next_idx = candidate_idxs[max_score_local_idx]
-
-    # 6) Add the best candidate to selected list and remove from candidates
-    selected_idxs.append(next_idx)
-    candidate_idxs.pop(max_score_local_idx) # More efficient than remove() when we have the index
+  excluded_idxs = store.ids_for_codes(excluded)
 
+  candidate_idxs = candidate_pool(best_match_liked, max(n, 500) + len(excluded), excluded_idxs)
 
-  # 4) fetch the courses in the final order
-  recommendations: list[dict] = []
-  for idx in selected_idxs:
-    course = courseClient.get_course_by_id(idx)
-    if course:
-      # Store the cosine similarity directly
-      # course.SIMILARITY = float(sim_to_target[idx])
-      recommendations.append(course)
+  # 3) MMR re‐ranking
+  reranker = MMRReranker(store.embeds[candidate_idxs], best_match_liked[candidate_idxs])
+  selected_idxs = [candidate_idxs[i] for i in reranker.select(n, lambda_param, original_liked_embeds_norm, diversity)]
 
-  return recommendations
\ No newline at end of file
+  # 4) return the courses in the final order
+  # The cosine similarity could be stored directly as SIMILARITY=float(sim_to_target[idx])
+  return [Recommendation(ID=int(idx), CODE=store.codes[idx]) for idx in selected_idxs]
\ No newline at end of file
@@ -1,82 +1,88 @@
+from itertools import islice
 import scipy.sparse as sp
 import numpy as np
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
+import numpy.typing as npt
 from app.courses import CourseClient
-from app.types import CourseWithId
+from app.recommend.knn import NeighbourGraph
+from app.recommend.topk import exclusion_mask, ranked
+from app.types import Recommendation
 
 
-def find_top_courses(idx_liked: List[int], idx_disliked: List[int], matrix: sp.csr_matrix) -> List[Tuple[int, float]]:
+def find_top_courses(idx_liked: List[int], idx_disliked: List[int], matrix: sp.csr_matrix, exclude: Optional[npt.NDArray[np.bool_]] = None, liked_scores: Optional[sp.csr_matrix] = None) -> Iterator[Tuple[int, float]]:
     # If we have no liked courses, we can't make recommendations
     if not idx_liked:
-        return []
-    
-    # Extract rows from the similarity matrix for liked courses
-    liked_scores = matrix[idx_liked]
+        return iter(())
     
+    # Extract rows from the similarity matrix for liked courses, unless the caller already did
+    if liked_scores is None:
+        liked_scores = matrix[idx_liked]
+
+    # Extract rows from the similarity matrix for disliked courses
+    disliked_scores = matrix[idx_disliked] if idx_disliked else None
+    arr = profile_scores(liked_scores, disliked_scores)
+
+    # Lazily yield (course_index, score) tuples in descending order (highest similarity first)
+    return ranked(arr, exclude)
+
+
+def profile_scores(liked_scores: sp.csr_matrix, disliked_scores: Optional[sp.csr_matrix]) -> npt.NDArray:
     # Calculate the base score by summing all liked course similarities
     summed = liked_scores.sum(axis=0)
     
     # Apply penalty for disliked courses if any exist
-    if idx_disliked:
-        # Extract rows from the similarity matrix for disliked courses
-        disliked_scores = matrix[idx_disliked]
-        
+    if disliked_scores is not None:
         # Instead of direct subtraction, apply a weighted penalty
         # This prevents disliked courses from having too much influence
         # We scale down the disliked penalty to avoid over-penalization
-        disliked_penalty = disliked_scores.sum(axis=0) * (0.5 / max(len(idx_disliked), 1))
+        disliked_penalty = disliked_scores.sum(axis=0) * (0.5 / max(disliked_scores.shape[0], 1))
         summed = summed - disliked_penalty
     
     # Convert sparse matrix to dense numpy array and flatten to 1D
-    arr = np.asarray(summed).ravel()
-    
-    # Create list of (course_index, score) tuples
-    course_scores = list(enumerate(arr))
-    
-    # Sort courses by score in descending order (highest similarity first)
-    course_scores.sort(key=lambda x: x[1], reverse=True)
+    return np.asarray(summed).ravel()
 
-    # Return sorted list of (course_index, score) tuples
-    return course_scores
 
+def calculate_recommended_from(recommended: List[int], idx_liked: List[int], liked_scores: sp.csr_matrix, courseClient: CourseClient) -> List[List[str]]:
+    # For every recommendation, the codes of up to 2 liked courses with the largest intersection
+    if not idx_liked or not recommended:
+        return [[] for _ in recommended]
 
-def calculate_recommended_from(recommended: int, idx_liked: List[int], idx_disliked: List[int], matrix: sp.csr_matrix, courseClient: CourseClient) -> List[str]:
-    # Return list of 2 liked courses' ids that have the largest intersection with the recommendation
-    if not idx_liked:
-        return []
-    
-    # Extract the similarity scores between the recommended course and all liked courses
-    similarities = []
-    for liked_idx in idx_liked:
-        # Get similarity score between recommended course and this liked course
-        score = matrix[liked_idx, recommended].item()
-        similarities.append((liked_idx, score))
-    
-    # Sort by similarity score in descending order
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    
-    # The IDs of up to 2 most similar liked courses
-    return [courseClient.get_course_by_id(idx).CODE for idx, _ in similarities[:2]]
+    # Intersections between the liked courses (rows) and the recommendations (columns)
+    # Negating the unsigned counts of the uint8 assets would wrap around, zero intersections first
+    similarities = liked_scores[:, recommended].toarray().astype(np.float64)
+
+    # Stable sort keeps the order of liked courses for equal intersections
+    best = np.argsort(-similarities, axis=0, kind="stable")[:2]
+    codes = courseClient.get_codes_by_ids(idx_liked)
+    return [[codes[i] for i in column] for column in best.T.tolist()]
 
 
-def recommend_courses_keywords(liked: List[str], disliked: List[str], skipped: List[str], courseClient: CourseClient, n: int, kwd_intersects: sp.csr_matrix) -> List[CourseWithId]:
+def recommend_courses_keywords(liked: List[str], disliked: List[str], skipped: List[str], courseClient: CourseClient, n: int, kwd_intersects: sp.csr_matrix, graph: Optional[NeighbourGraph] = None) -> List[Recommendation]:
     liked_ids = courseClient.get_course_ids_by_codes(liked)
     disliked_ids = courseClient.get_course_ids_by_codes(disliked)
     skipped_ids = courseClient.get_course_ids_by_codes(skipped)
 
-    top_courses = find_top_courses(liked_ids, disliked_ids, kwd_intersects)
+    # Rated and ineligible courses are never recommended
+    size = kwd_intersects.shape[0]
+    excluded = exclusion_mask(size, liked_ids + disliked_ids + skipped_ids)
+    excluded |= courseClient.ineligible_mask(size)
 
-    res = []
-    excluded_ids = set(liked_ids + disliked_ids + skipped_ids)
-    for idx, score in top_courses:
-        if idx in excluded_ids or courseClient.filter_courses(courseClient.get_course_by_id(idx)):
-            continue
-        course = courseClient.get_course_by_id(idx)
-        course.RECOMMENDED_FROM = calculate_recommended_from(idx, liked_ids, disliked_ids, kwd_intersects, courseClient)
-        # course.SIMILARITY = score
-        if course is not None:
-            res.append(course)
-        if len(res) == n:
-            break
+    liked_scores = kwd_intersects[liked_ids]
+    ids = None
+    if graph is not None and graph.serves(liked_ids):
+        # Small profiles: score only the union of the liked courses' neighbour lists, unless the lists run out
+        rows = graph.candidates(liked_ids)
+        disliked_scores = kwd_intersects[disliked_ids][:, rows] if disliked_ids else None
+        scores = profile_scores(liked_scores[:, rows], disliked_scores)
+        if graph.covers(liked_ids, scores[~excluded[rows]], n, combine=np.sum):
+            ids = [int(rows[idx]) for idx, _ in islice(ranked(scores, excluded[rows]), n)]
+    if ids is None:
+        top_courses = find_top_courses(liked_ids, disliked_ids, kwd_intersects, excluded, liked_scores)
+        ids = [idx for idx, _ in islice(top_courses, n)]
 
-    return res
+    codes = courseClient.get_codes_by_ids(ids)
+    recommended_from = calculate_recommended_from(ids, liked_ids, liked_scores, courseClient)
+    return [
+        Recommendation(ID=idx, CODE=code, RECOMMENDED_FROM=sources)
+        for idx, code, sources in zip(ids, codes, recommended_from)
+    ]
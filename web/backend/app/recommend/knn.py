@@ -0,0 +1,161 @@
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+# Neighbour graph assets written by scripts/build_knn.py
+KNN_EMBEDDINGS_ASSET = "knn_embeddings.npz"
+KNN_TFIDF_ASSET = "knn_tfidf.npz"
+
+
+def _top_neighbours(similarities: npt.NDArray, k: int) -> Tuple[npt.NDArray[np.intp], npt.NDArray]:
+    """
+    Column indices and values of the k largest entries of every row, best first and ties
+    broken by the lower index.
+    """
+    candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.lexsort((candidates, -values), axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+class NeighbourGraph:
+    """
+    The K most similar courses of every course, precomputed offline.
+
+    Row i of `neighbours` lists the neighbours of course i best first (the course itself
+    excluded) and `similarities` their similarity. The last column bounds the similarity
+    of every course missing from a list: rows with fewer than K positive entries are padded
+    with ID -1 and similarity 0, so a course that is not listed scores at most
+    `similarities[i, -1]`. This lets small profiles be ranked from the lists of their liked
+    courses in O(L·K) and tells when the lists do not hold the whole top n.
+    """
+
+    def __init__(self, neighbours: npt.NDArray[np.int32], similarities: npt.NDArray[np.float32], max_liked: int = 3) -> None:
+        """
+        :param neighbours: (courses x K) neighbour IDs, -1 for padding.
+        :param similarities: (courses x K) similarities to the neighbours, descending per row.
+        :param max_liked: Profiles with up to this many liked courses are served from the graph.
+        """
+        self.neighbours = neighbours
+        self.similarities = similarities
+        self.max_liked = max_liked
+        self._counters = {"served": 0, "fallbacks": 0}
+
+    @classmethod
+    def from_embeddings(cls, embeds: npt.NDArray[np.float32], k: int, block_bytes: int = 2**28) -> "NeighbourGraph":
+        """
+        Exact cosine neighbours of normalized embeddings, computed block by block.
+
+        :param embeds: L2-normalized embeddings, one row per course ID (may be memory-mapped).
+        :param k: Number of neighbours per course.
+        :param block_bytes: Size of the similarity block computed at once.
+        """
+        embeds = np.asarray(embeds, dtype=np.float32)
+        k = min(k, len(embeds) - 1)
+        neighbours = np.empty((len(embeds), k), dtype=np.int32)
+        similarities = np.empty((len(embeds), k), dtype=np.float32)
+        block_rows = max(1, block_bytes // (4 * len(embeds)))
+        for start in range(0, len(embeds), block_rows):
+            block = embeds[start:start + block_rows] @ embeds.T
+            block[np.arange(len(block)), np.arange(start, start + len(block))] = -np.inf
+            neighbours[start:start + block_rows], similarities[start:start + block_rows] = _top_neighbours(block, k)
+        return cls(neighbours, similarities)
+
+    @classmethod
+    def from_sparse(cls, matrix: sp.csr_matrix, k: int) -> "NeighbourGraph":
+        """
+        The largest positive entries of every row of a nonnegative course x course matrix,
+        e.g. the keyword intersections, ignoring the diagonal.
+
+        :param matrix: Square CSR matrix indexed by course ID.
+        :param k: Number of neighbours per course.
+        """
+        matrix = sp.csr_matrix(matrix)
+        neighbours = np.full((matrix.shape[0], k), -1, dtype=np.int32)
+        similarities = np.zeros((matrix.shape[0], k), dtype=np.float32)
+        for row in range(matrix.shape[0]):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            columns, values = matrix.indices[start:end], matrix.data[start:end]
+            keep = (columns != row) & (values > 0)
+            columns, values = columns[keep], values[keep]
+            order = np.lexsort((columns, -values))[:k]
+            neighbours[row, :len(order)] = columns[order]
+            similarities[row, :len(order)] = values[order]
+        return cls(neighbours, similarities)
+
+    def save(self, path: str) -> None:
+        np.savez(path, neighbours=self.neighbours, similarities=self.similarities)
+
+    @classmethod
+    def load(cls, path: str, courses: int, max_liked: int = 3) -> "NeighbourGraph":
+        """
+        :param courses: Number of courses the graph must cover.
+        :raises ValueError: If the graph was built for another number of courses.
+        """
+        with np.load(path) as asset:
+            graph = cls(asset["neighbours"], asset["similarities"], max_liked)
+        if len(graph.neighbours) != courses:
+            raise ValueError(f"Neighbour graph {path} covers {len(graph.neighbours)} courses, expected {courses}; rerun scripts.build_knn")
+        return graph
+
+    @property
+    def k(self) -> int:
+        return self.neighbours.shape[1]
+
+    def serves(self, liked: List[int]) -> bool:
+        """
+        Whether a profile with these liked courses is small enough to be ranked from the graph.
+        """
+        return 0 < len(liked) <= self.max_liked
+
+    def similar(self, course_id: int) -> Tuple[npt.NDArray[np.int32], npt.NDArray[np.float32]]:
+        """
+        The listed neighbours of a course and their similarities, best first.
+        """
+        listed = self.neighbours[course_id] >= 0
+        return self.neighbours[course_id][listed], self.similarities[course_id][listed]
+
+    def candidates(self, ids: List[int]) -> npt.NDArray[np.intp]:
+        """
+        Union of the neighbour lists of the given courses, sorted by ID.
+        """
+        rows = np.unique(self.neighbours[ids])
+        return rows[rows >= 0].astype(np.intp)
+
+    def bound(self, ids: List[int], combine: Callable[[npt.NDArray], float] = np.max) -> float:
+        """
+        Upper bound of the score of every course missing from all the lists of `ids`.
+
+        :param combine: How the model combines the similarities to the liked courses,
+            `np.max` or `np.sum` (scores that are then only lowered, e.g. by a disliked penalty).
+        """
+        return float(combine(self.similarities[ids, -1]))
+
+    def covers(self, liked: List[int], scores: npt.NDArray, n: int, combine: Callable[[npt.NDArray], float] = np.max, tolerance: float = 1e-5) -> bool:
+        """
+        Whether the top n of the candidates is the top n of all courses.
+
+        :param scores: Exact scores of the candidates that may be recommended (not excluded).
+        :param tolerance: Margin for the rounding of the similarities stored in the graph.
+        """
+        if n <= 0:
+            covered = True
+        elif len(scores) < n:
+            covered = False
+        else:
+            nth = -np.partition(-np.asarray(scores), n - 1)[n - 1]
+            covered = bool(nth > self.bound(liked, combine) + tolerance)
+        self._counters["served" if covered else "fallbacks"] += 1
+        return covered
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.neighbours.nbytes + self.similarities.nbytes)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        How many small profiles were answered from the graph and how many fell back to a full scan.
+        """
+        return {**self._counters, "k": self.k, "max_liked": self.max_liked}
+
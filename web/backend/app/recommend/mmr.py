@@ -0,0 +1,87 @@
+from typing import List, Literal, Optional, get_args
+import numpy as np
+import numpy.typing as npt
+
+# What the selected candidates must differ from: the liked courses, the candidates selected
+# before them (classic MMR), or both
+Diversity = Literal["liked", "selected", "both"]
+
+
+class MMRReranker:
+    """
+    Maximal marginal relevance selection over a fixed block of candidates.
+
+    Every step selects the candidate with the highest
+    λ · relevance − (1 − λ) · (max similarity to the liked courses and/or the selected ones).
+    The candidate block is gathered once, the running maximum similarity is updated with one
+    matrix-vector product per selected course and selected candidates are masked instead of
+    being removed from a list, so n selections cost O(C·L·D + n·C·D) instead of O(n·C·L·D).
+    """
+
+    def __init__(self, vectors: npt.NDArray, relevance: npt.NDArray, metric: Literal["cosine", "euclidean"] = "cosine") -> None:
+        """
+        :param vectors: (C x D) candidate vectors in ranking order, L2-normalized for `cosine`,
+            raw for `euclidean`.
+        :param relevance: Relevance of every candidate.
+        :param metric: `cosine`, or `euclidean` for the 1 / (1 + distance) similarity.
+        """
+        if metric not in ("cosine", "euclidean"):
+            raise ValueError(f"Unknown metric {metric}, expected cosine or euclidean")
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.relevance = np.asarray(relevance)
+        self.metric = metric
+        if metric == "euclidean":
+            self._squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def __len__(self) -> int:
+        return len(self.relevance)
+
+    def similarity(self, others: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Similarity of every candidate to other vectors given in the same convention.
+
+        :param others: Vectors with shape (k, D) or (D,).
+        :return: Similarities with shape (C, k).
+        """
+        others = np.asarray(others, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        dots = np.dot(self.vectors, others.T)
+        if self.metric == "cosine":
+            return dots
+        squared = self._squared_norms[:, None] + np.einsum("ij,ij->i", others, others)[None, :] - 2 * dots
+        return 1.0 / (1.0 + np.sqrt(np.maximum(squared, 0)))
+
+    def select(self, n: int, lambda_param: float, liked: Optional[npt.NDArray] = None, diversity: Diversity = "liked") -> List[int]:
+        """
+        Selects up to n candidates.
+
+        :param n: Number of candidates to select.
+        :param lambda_param: Weight of the relevance, 1 ignores the diversity.
+        :param liked: (L x D) liked vectors in the convention of the candidates.
+        :param diversity: Which similarities are penalized, see `Diversity`.
+        :return: Positions of the selected candidates in selection order.
+        """
+        if diversity not in get_args(Diversity):
+            raise ValueError(f"Unknown diversity {diversity}, expected one of {get_args(Diversity)}")
+        penalty = None
+        if diversity != "selected" and liked is not None and len(liked):
+            penalty = np.max(self.similarity(liked), axis=1)
+
+        available = np.ones(len(self), dtype=bool)
+        selected: List[int] = []
+        scores = self._scores(lambda_param, penalty)
+        while len(selected) < min(n, len(self)):
+            # Argmax over the remaining candidates, the first one wins ties
+            positions = np.flatnonzero(available)
+            best = int(positions[np.argmax(scores[positions])])
+            selected.append(best)
+            available[best] = False
+            if diversity != "liked":
+                similarity = self.similarity(self.vectors[best])[:, 0]
+                penalty = similarity if penalty is None else np.maximum(penalty, similarity)
+                scores = self._scores(lambda_param, penalty)
+        return selected
+
+    def _scores(self, lambda_param: float, penalty: Optional[npt.NDArray]) -> npt.NDArray:
+        if penalty is None:
+            return lambda_param * self.relevance
+        return lambda_param * self.relevance - (1 - lambda_param) * penalty
@@ -0,0 +1,135 @@
+from typing import List, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+class PairScorer:
+    """
+    Cosine similarity of courses to the normalized mean of every pair of liked courses
+    (a course paired with itself included), without materializing the pair targets.
+
+    With the raw liked embeddings r = |r| ê and s the similarities to the normalized ê,
+    cos(e, r_i + r_j) = (|r_i| s_i + |r_j| s_j) / |r_i + r_j|, where
+    |r_i + r_j|² = |r_i|² + |r_j|² + 2 |r_i| |r_j| ê_i · ê_j comes from the L x L Gram matrix.
+    A request then needs the N x L product with the liked courses instead of the
+    N x L(L+1)/2 product with the pair targets, and O(N · L²) element-wise work, which
+    `best` limits to the courses that can still reach a given score: with positive weights
+    a pair scores at most (w_i + w_j) · max(s_i, s_j).
+
+    Pairs are numbered like `pair_targets`: (0, 0), (0, 1), ..., (0, L-1), (1, 1), ...
+    """
+
+    def __init__(self, liked: npt.NDArray[np.float32], norms: npt.NDArray[np.float32], prune: int = 0, block_elements: int = 2**22) -> None:
+        """
+        :param liked: (L x D) L2-normalized liked embeddings.
+        :param norms: Norms of the raw liked embeddings.
+        :param prune: When positive and below L, only the pairs among the `prune` liked courses
+            most similar to a course are scored for it (approximate, O(N · prune²)).
+        :param block_elements: Size of the (courses x pairs) score block computed at once.
+        """
+        liked = np.asarray(liked, dtype=np.float32)
+        self.first, self.second = np.triu_indices(len(liked))
+        self.prune = prune if 0 < prune < len(liked) else 0
+        self.block_elements = block_elements
+
+        gram = liked @ liked.T
+        norms = np.asarray(norms, dtype=np.float64)
+        first_norms, second_norms = norms[self.first], norms[self.second]
+        pair_norms = np.sqrt(np.maximum(first_norms ** 2 + second_norms ** 2 + 2 * first_norms * second_norms * gram[self.first, self.second], 0))
+        # Zero pair means stay zero targets (similarity 0), as `EmbeddingStore.normalize` leaves them
+        nonzero = pair_norms > 0
+        self.first_weights = np.zeros(len(pair_norms), dtype=np.float32)
+        self.second_weights = np.zeros(len(pair_norms), dtype=np.float32)
+        self.first_weights[nonzero] = first_norms[nonzero] / pair_norms[nonzero]
+        self.second_weights[nonzero] = second_norms[nonzero] / pair_norms[nonzero]
+        # A course paired with itself is exactly its own normalized embedding
+        same = (self.first == self.second) & nonzero
+        self.first_weights[same] = self.second_weights[same] = 0.5
+        factors = self.first_weights + self.second_weights
+        self._max_factor = float(factors.max(initial=1.0))
+        self._min_factor = float(factors[nonzero].min(initial=1.0))
+        self._zero_pairs = not nonzero.all()
+
+        # Pair number of liked courses (i, j), i <= j, for the pruned scoring
+        self._pair_index = np.zeros((len(liked), len(liked)), dtype=np.intp)
+        self._pair_index[self.first, self.second] = np.arange(len(self.first))
+
+    @property
+    def pairs(self) -> List[Tuple[int, int]]:
+        return list(zip(self.first.tolist(), self.second.tolist()))
+
+    def upper_bound(self, similarity_liked: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        """
+        An upper bound of the best pair similarity of every course, O(N · L).
+        """
+        closest = np.max(similarity_liked, axis=1)
+        bound = np.where(closest >= 0, closest * self._max_factor, closest * self._min_factor)
+        if self._zero_pairs:
+            bound = np.maximum(bound, 0)
+        # Margin for the float32 rounding of the pair scores
+        return bound + 1e-5 * np.abs(bound) + 1e-6
+
+    def best(self, similarity_liked: npt.NDArray[np.float32], floor: float = -np.inf) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.intp]]:
+        """
+        The similarity of every course to its best matching pair target and that pair's number.
+
+        Ties go to the lower pair number, like an argmax over the pair target columns.
+
+        :param similarity_liked: (N x L) similarities to the normalized liked embeddings.
+        :param floor: Courses whose `upper_bound` is below it are not scored and get -inf.
+        :return: The best pair similarities and pair numbers.
+        """
+        similarity_liked = np.asarray(similarity_liked, dtype=np.float32)
+        if floor > -np.inf and len(similarity_liked):
+            keep = np.flatnonzero(self.upper_bound(similarity_liked) >= floor)
+            best_score = np.full(len(similarity_liked), -np.inf, dtype=np.float32)
+            best_pair = np.zeros(len(similarity_liked), dtype=np.intp)
+            best_score[keep], best_pair[keep] = self.best(similarity_liked[keep])
+            return best_score, best_pair
+
+        best_score = np.empty(len(similarity_liked), dtype=np.float32)
+        best_pair = np.empty(len(similarity_liked), dtype=np.intp)
+        width = self.prune * (self.prune + 1) // 2 if self.prune else similarity_liked.shape[1]
+        block_rows = max(1, self.block_elements // max(width, 1))
+        for start in range(0, len(similarity_liked), block_rows):
+            block = similarity_liked[start:start + block_rows]
+            end = start + len(block)
+            if self.prune:
+                best_score[start:end], best_pair[start:end] = self._best_pruned(block)
+            else:
+                best_score[start:end], best_pair[start:end] = self._best_exact(block)
+        return best_score, best_pair
+
+    def _best_exact(self, block: npt.NDArray[np.float32]) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.intp]]:
+        liked = block.shape[1]
+        best_score = np.full(len(block), -np.inf, dtype=np.float32)
+        best_pair = np.zeros(len(block), dtype=np.intp)
+        # Pairs (i, i), (i, i + 1), ..., (i, L - 1) are numbered consecutively and score from contiguous
+        # columns; the strict comparison keeps the lowest pair number on ties
+        offset = 0
+        for i in range(liked):
+            pairs = slice(offset, offset + liked - i)
+            scores = block[:, i, None] * self.first_weights[pairs] + block[:, i:] * self.second_weights[pairs]
+            local = np.argmax(scores, axis=1)
+            local_score = scores[np.arange(len(block)), local]
+            better = local_score > best_score
+            best_score[better] = local_score[better]
+            best_pair[better] = offset + local[better]
+            offset += liked - i
+        return best_score, best_pair
+
+    def _best_pruned(self, block: npt.NDArray[np.float32]) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.intp]]:
+        # The most similar liked courses of every row, ascending so that (i, j) pairs come out with i <= j
+        top = np.sort(np.argpartition(-block, self.prune - 1, axis=1)[:, :self.prune], axis=1)
+        top_similarity = np.take_along_axis(block, top, axis=1)
+        best_score = np.full(len(block), -np.inf, dtype=np.float32)
+        best_pair = np.zeros(len(block), dtype=np.intp)
+        # Pair numbers grow in this loop order, so the strict comparison keeps the lowest on ties
+        for a in range(self.prune):
+            for b in range(a, self.prune):
+                pair = self._pair_index[top[:, a], top[:, b]]
+                scores = top_similarity[:, a] * self.first_weights[pair] + top_similarity[:, b] * self.second_weights[pair]
+                better = scores > best_score
+                best_score[better] = scores[better]
+                best_pair[better] = pair[better]
+        return best_score, best_pair
@@ -0,0 +1,108 @@
+from typing import Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+
+# Asset with the PCA projection of the normalized embeddings, written by scripts/fit_projection.py
+PROJECTION_ASSET = "embeddings_pca.npz"
+
+
+def fit_projection(embeds: npt.NDArray[np.float32], dim: int, block_rows: int = 65536) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+    """
+    Fits a PCA projection of the normalized embeddings.
+
+    The covariance is accumulated over blocks of rows in float64, so the embeddings may be
+    memory-mapped and larger than memory.
+
+    :param embeds: L2-normalized embeddings, one row per course.
+    :param dim: Number of principal components to keep.
+    :return: The (dim x embedding dim) components, strongest first, and the mean embedding.
+    """
+    if not 0 < dim <= embeds.shape[1]:
+        raise ValueError(f"Projection dimension must be between 1 and {embeds.shape[1]}, got {dim}")
+    mean = np.zeros(embeds.shape[1], dtype=np.float64)
+    gram = np.zeros((embeds.shape[1], embeds.shape[1]), dtype=np.float64)
+    for start in range(0, len(embeds), block_rows):
+        block = np.asarray(embeds[start:start + block_rows], dtype=np.float64)
+        mean += block.sum(axis=0)
+        gram += block.T @ block
+    mean /= len(embeds)
+    covariance = gram / len(embeds) - np.outer(mean, mean)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1][:dim]
+    return eigenvectors[:, order].T.astype(np.float32), mean.astype(np.float32)
+
+
+def save_projection(path: str, components: npt.NDArray[np.float32], mean: npt.NDArray[np.float32], courses: int) -> None:
+    """
+    Stores a projection with the number of courses it was fitted on, checked when it is loaded.
+    """
+    np.savez(path, components=components, mean=mean, courses=np.int64(courses))
+
+
+def load_projection(path: str, embeds: npt.NDArray[np.float32], dim: Optional[int] = None) -> "ProjectedMatrix":
+    """
+    Loads a projection asset and projects the embeddings with it.
+
+    :param path: Path of the `.npz` asset.
+    :param embeds: The L2-normalized embeddings of the store.
+    :param dim: Use only the first `dim` components, all stored ones when None.
+    :raises ValueError: If the projection was fitted on embeddings of another shape, or `dim`
+        is not between 1 and the number of stored components.
+    """
+    with np.load(path) as asset:
+        components, mean, courses = asset["components"], asset["mean"], int(asset["courses"])
+    if components.shape[1] != embeds.shape[1] or courses != len(embeds):
+        raise ValueError(
+            f"Projection {path} was fitted on {courses} x {components.shape[1]} embeddings, "
+            f"the store has {embeds.shape[0]} x {embeds.shape[1]}; rerun scripts.fit_projection"
+        )
+    if dim is not None:
+        if not 1 <= dim <= len(components):
+            raise ValueError(f"Projection dimension {dim} is out of range, {path} stores 1 to {len(components)} components")
+        components = components[:dim]
+    return ProjectedMatrix(embeds, components, mean)
+
+
+class ProjectedMatrix:
+    """
+    The embeddings projected onto their principal components, for approximate first-pass scoring.
+
+    With the mean m and the orthonormal components P, e ≈ m + Pᵀ P (e - m), so
+    e · t ≈ m · t + (P (e - m)) · (P t): the catalogue is scanned at the reduced dimension
+    and the candidates are rescored with the full embeddings (see `EmbeddingStore.rescored_similarity`).
+    """
+
+    mode = "pca"
+
+    def __init__(self, embeds: npt.NDArray[np.float32], components: npt.NDArray[np.float32], mean: npt.NDArray[np.float32], block_rows: int = 65536) -> None:
+        """
+        :param embeds: L2-normalized embeddings, one row per course.
+        :param components: Orthonormal (dim x embedding dim) projection.
+        :param mean: Mean embedding the projection was centered on.
+        """
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.reduced = np.empty((len(embeds), len(self.components)), dtype=np.float32)
+        for start in range(0, len(embeds), block_rows):
+            block = np.asarray(embeds[start:start + block_rows], dtype=np.float32)
+            self.reduced[start:start + block_rows] = (block - self.mean) @ self.components.T
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    def similarity(self, targets: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Approximate cosine similarity between all courses and normalized targets.
+
+        :param targets: Targets with shape (k, dim) or (dim,).
+        :return: Similarities with shape (courses, k) or (courses,).
+        """
+        targets = np.asarray(targets, dtype=np.float32)
+        result = self.reduced @ (targets @ self.components.T).T
+        result += targets @ self.mean
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.reduced.nbytes + self.components.nbytes)
@@ -0,0 +1,110 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Type
+import numpy as np
+import numpy.typing as npt
+
+
+class QuantizedMatrix(ABC):
+    """
+    Compressed copy of the normalized embedding matrix for approximate first-pass scoring.
+
+    The compressed rows are widened to float32 one cache-sized block at a time and
+    multiplied with the targets, so a full pass reads 2x (float16) or 4x (int8) fewer
+    bytes from memory than the float32 matrix. Scores are approximate; the embedding
+    models rescore a shortlist exactly (see `EmbeddingStore.rescored_similarity`).
+    """
+
+    mode = ""
+
+    def __init__(self, embeds: npt.NDArray[np.float32], block_bytes: int = 2**18) -> None:
+        """
+        :param embeds: The L2-normalized float32 embeddings.
+        :param block_bytes: Size of the float32 buffer a block of rows is widened into.
+        """
+        self.shape = embeds.shape
+        self.block_rows = max(1, block_bytes // (4 * max(embeds.shape[1], 1)))
+
+    @property
+    @abstractmethod
+    def matrix(self) -> npt.NDArray:
+        """The compressed rows, widened block by block by `similarity`."""
+
+    def similarity(self, targets: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Approximate cosine similarity between all courses and normalized targets.
+
+        :param targets: Targets with shape (k, dim) or (dim,).
+        :return: Similarities with shape (courses, k) or (courses,).
+        """
+        targets = np.asarray(targets, dtype=np.float32)
+        vector = targets.ndim == 1
+        targets_t = np.ascontiguousarray(targets.reshape(-1, self.shape[1]).T)
+        result = np.empty((self.shape[0], targets_t.shape[1]), dtype=np.float32)
+        buffer = np.empty((self.block_rows, self.shape[1]), dtype=np.float32)
+        for start in range(0, self.shape[0], self.block_rows):
+            end = min(start + self.block_rows, self.shape[0])
+            block = buffer[:end - start]
+            block[...] = self.matrix[start:end]
+            np.matmul(block, targets_t, out=result[start:end])
+        self._rescale(result)
+        return result[:, 0] if vector else result
+
+    def _rescale(self, result: npt.NDArray[np.float32]) -> None:
+        pass
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes)
+
+
+class Float16Matrix(QuantizedMatrix):
+    """The embeddings rounded to float16."""
+
+    mode = "float16"
+
+    def __init__(self, embeds: npt.NDArray[np.float32], block_bytes: int = 2**18) -> None:
+        super().__init__(embeds, block_bytes)
+        self._matrix = np.asarray(embeds).astype(np.float16)
+
+    @property
+    def matrix(self) -> npt.NDArray[np.float16]:
+        return self._matrix
+
+
+class Int8Matrix(QuantizedMatrix):
+    """
+    The embeddings as int8 with one float32 scale per row, row ≈ scale * int8 row.
+
+    The scale maps the largest absolute component of a row to 127, and is applied to
+    the (courses x k) products instead of the rows.
+    """
+
+    mode = "int8"
+
+    def __init__(self, embeds: npt.NDArray[np.float32], block_bytes: int = 2**18) -> None:
+        super().__init__(embeds, block_bytes)
+        embeds = np.asarray(embeds, dtype=np.float32)
+        peaks = np.max(np.abs(embeds), axis=1) if embeds.shape[1] else np.zeros(len(embeds), dtype=np.float32)
+        self.scales: npt.NDArray[np.float32] = np.where(peaks > 0, peaks / 127, 1).astype(np.float32)
+        self._matrix = np.empty(embeds.shape, dtype=np.int8)
+        for start in range(0, len(embeds), self.block_rows):
+            end = start + self.block_rows
+            self._matrix[start:end] = np.rint(embeds[start:end] / self.scales[start:end, None])
+
+    @property
+    def matrix(self) -> npt.NDArray[np.int8]:
+        return self._matrix
+
+    def _rescale(self, result: npt.NDArray[np.float32]) -> None:
+        result *= self.scales[:, None]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._matrix.nbytes + self.scales.nbytes)
+
+
+# Quantized matrix class of every supported `EMBEDDING_QUANTIZATION` mode
+QUANTIZATIONS: Dict[str, Type[QuantizedMatrix]] = {
+    "float16": Float16Matrix,
+    "int8": Int8Matrix,
+}
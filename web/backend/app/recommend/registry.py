@@ -0,0 +1,260 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+import scipy.sparse as sp
+
+from app.courses import CourseClient
+from app.logger import logger
+from app.recommend.baseline import recommend_courses_baseline
+from app.recommend.embeddings import (
+    recommend_average,
+    recommend_courses,
+    recommend_max,
+    recommend_max_with_combinations,
+    recommend_mmr_cos,
+)
+from app.recommend.keywords import recommend_courses_keywords
+from app.recommend.knn import KNN_EMBEDDINGS_ASSET, KNN_TFIDF_ASSET, NeighbourGraph
+from app.recommend.mmr import Diversity
+from app.recommend.store import EmbeddingStore
+from app.types import RatingProfile, Recommendation
+
+# Asset files the models are computed from, relative to the assets directory
+EMBEDDINGS_ASSET = "embeddings_tomas_03.npy"
+GEMINI_INTERSECTS_ASSET = "intersects_sparse.npz"
+TFIDF_INTERSECTS_ASSET = "intersects_tfidf.npz"
+COURSES_ASSET = "courses"
+
+ModelState = Literal["pending", "ready", "failed"]
+
+
+@dataclass
+class ModelParams:
+    """Request parameters of `Recommender.recommend`, models ignore the ones they do not use."""
+    relevance: float = 0.8
+    diversity: Diversity = "liked"
+
+
+class Recommender(ABC):
+    """
+    A recommendation model bound to the loaded assets.
+
+    `prepare` builds what the model reads on every request once per asset load (exclusion
+    masks, canonical sparse matrices, ...), `recommend` ranks courses for one profile from it.
+    """
+
+    def __init__(self, name: str, courseClient: CourseClient) -> None:
+        self.name = name
+        self.courseClient = courseClient
+        self.state: ModelState = "pending"
+        self.error: Optional[str] = None
+        self.prepare_seconds: Optional[float] = None
+
+    @property
+    def assets(self) -> List[str]:
+        """Asset files the model is computed from."""
+        return [COURSES_ASSET]
+
+    def prepare(self) -> None:
+        pass
+
+    @abstractmethod
+    def recommend(self, profile: RatingProfile, n: int, params: ModelParams) -> List[Recommendation]:
+        """
+        The top n courses for a profile, by descending relevance.
+        """
+
+    def memory_usage(self) -> int:
+        """Bytes of the arrays the model reads, including the ones shared with other models."""
+        return 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "error": self.error,
+            "prepare_seconds": self.prepare_seconds,
+            "memory_bytes": self.memory_usage(),
+            "assets": self.assets,
+        }
+
+
+class EmbeddingModel(Recommender):
+    """
+    The models of `app.recommend.embeddings`, all reading the shared `EmbeddingStore`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        store: EmbeddingStore,
+        courseClient: CourseClient,
+        function: Callable[..., List[Recommendation]],
+        mmr: bool = False,
+        **options: Any,
+    ) -> None:
+        """
+        :param function: Recommender called as function(liked, disliked, skipped, store, courseClient, n, **options).
+        :param mmr: Whether the function takes the `lambda_param` and `diversity` of MMR.
+        :param options: Fixed keyword arguments of the function.
+        """
+        super().__init__(name, courseClient)
+        self.store = store
+        self.function = function
+        self.mmr = mmr
+        self.options = options
+
+    @property
+    def assets(self) -> List[str]:
+        assets = [COURSES_ASSET, EMBEDDINGS_ASSET]
+        if self.function is recommend_max and self.store.graph is not None:
+            assets.append(KNN_EMBEDDINGS_ASSET)
+        return assets
+
+    def prepare(self) -> None:
+        # Every request ORs the ineligible courses into its exclusion mask
+        self.courseClient.ineligible_mask(len(self.store))
+
+    def recommend(self, profile: RatingProfile, n: int, params: ModelParams) -> List[Recommendation]:
+        options = dict(self.options)
+        if self.mmr:
+            options.update(lambda_param=params.relevance, diversity=params.diversity)
+        return self.function(profile.liked, profile.disliked, profile.skipped, self.store, self.courseClient, n, **options)
+
+    def memory_usage(self) -> int:
+        return self.store.nbytes
+
+
+class KeywordModel(Recommender):
+    """
+    `recommend_courses_keywords` over one keyword intersection matrix.
+    """
+
+    def __init__(self, name: str, asset: str, matrix: sp.csr_matrix, courseClient: CourseClient, graph: Optional[NeighbourGraph] = None) -> None:
+        super().__init__(name, courseClient)
+        self.asset = asset
+        self.matrix = matrix
+        self.graph = graph
+
+    @property
+    def assets(self) -> List[str]:
+        assets = [COURSES_ASSET, self.asset]
+        if self.graph is not None:
+            assets.append(KNN_TFIDF_ASSET)
+        return assets
+
+    def prepare(self) -> None:
+        # Row slicing and column sums expect a canonical CSR matrix; mapped matrices are
+        # read-only and written canonical by scripts.convert_assets
+        if not sp.isspmatrix_csr(self.matrix):
+            self.matrix = self.matrix.tocsr()
+        if not self.matrix.has_canonical_format:
+            self.matrix = self.matrix.copy()
+            self.matrix.sum_duplicates()
+        self.courseClient.ineligible_mask(self.matrix.shape[0])
+
+    def recommend(self, profile: RatingProfile, n: int, params: ModelParams) -> List[Recommendation]:
+        return recommend_courses_keywords(
+            profile.liked, profile.disliked, profile.skipped, self.courseClient, n, self.matrix, self.graph
+        )
+
+    def memory_usage(self) -> int:
+        usage = self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+        if self.graph is not None:
+            usage += self.graph.nbytes
+        return int(usage)
+
+
+class BaselineModel(Recommender):
+    """
+    `recommend_courses_baseline` over the posting lists of the catalogue.
+    """
+
+    def recommend(self, profile: RatingProfile, n: int, params: ModelParams) -> List[Recommendation]:
+        return recommend_courses_baseline(profile.liked, profile.disliked, profile.skipped, self.courseClient, n)
+
+
+class ModelRegistry:
+    """
+    The models served by the API, prepared once per asset load.
+
+    A model whose `prepare` fails is kept as `failed` and rejected by `get`, the others are served.
+    """
+
+    def __init__(self, models: List[Recommender], listed: Tuple[str, ...] = ()) -> None:
+        """
+        :param models: The models, by their unique names.
+        :param listed: Names of the models offered to the frontend by `names`.
+        """
+        self.models: Dict[str, Recommender] = {model.name: model for model in models}
+        if len(self.models) != len(models):
+            raise ValueError("Model names must be unique")
+        unknown = set(listed) - set(self.models)
+        if unknown:
+            raise ValueError(f"Unknown listed models: {', '.join(sorted(unknown))}")
+        self.listed = listed
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.models
+
+    def names(self) -> List[str]:
+        """The listed models that are ready."""
+        return [name for name in self.listed if self.models[name].state == "ready"]
+
+    def get(self, name: str) -> Recommender:
+        model = self.models.get(name)
+        if model is None:
+            raise ValueError("Model not found")
+        if model.state != "ready":
+            raise ValueError(f"Model {name} is {model.state}" + (f": {model.error}" if model.error else ""))
+        return model
+
+    def prepare(self) -> None:
+        """
+        Prepares every model in turn and records how long it took or why it failed.
+        """
+        for model in self.models.values():
+            start = time.perf_counter()
+            try:
+                model.prepare()
+            except Exception as error:
+                model.state, model.error = "failed", f"{type(error).__name__}: {error}"
+                logger.error(f"Model {model.name} failed to prepare: {model.error}")
+            else:
+                model.state = "ready"
+            model.prepare_seconds = time.perf_counter() - start
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [dict(model.status(), listed=model.name in self.listed) for model in self.models.values()]
+
+
+def build_registry(
+    courseClient: CourseClient,
+    store: EmbeddingStore,
+    gemini: sp.csr_matrix,
+    tfidf: sp.csr_matrix,
+    tfidf_graph: Optional[NeighbourGraph] = None,
+    combinations_prune_liked: int = 0,
+) -> ModelRegistry:
+    """
+    The models of the API over the loaded assets.
+
+    :param combinations_prune_liked: `prune_liked` of max_with_combinations.
+    """
+    return ModelRegistry(
+        [
+            EmbeddingModel("embeddings_v1", store, courseClient, recommend_courses),
+            EmbeddingModel("embeddings_mmr", store, courseClient, recommend_mmr_cos, mmr=True),
+            EmbeddingModel("embeddings_max", store, courseClient, recommend_max),
+            BaselineModel("baseline", courseClient),
+            KeywordModel("keywords_gemini", GEMINI_INTERSECTS_ASSET, gemini, courseClient),
+            KeywordModel("keywords_tfidf", TFIDF_INTERSECTS_ASSET, tfidf, courseClient, tfidf_graph),
+            EmbeddingModel("average", store, courseClient, recommend_average),
+            EmbeddingModel(
+                "max_with_combinations", store, courseClient, recommend_max_with_combinations, prune_liked=combinations_prune_liked
+            ),
+        ],
+        listed=("max_with_combinations", "keywords_tfidf"),
+    )
@@ -0,0 +1,296 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Set, Type
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+from app.courses import CourseClient
+from app.recommend.embeddings import euclidean_distances
+from app.recommend.keywords import calculate_recommended_from
+from app.recommend.store import EmbeddingStore
+from app.recommend.topk import top_k
+from app.types import Recommendation
+
+
+class SessionState(ABC):
+    """
+    Incremental scoring state of a recommendation session.
+
+    Rating a course updates running per-course vectors, so a like or dislike costs a
+    single pass over the catalogue instead of rescoring every rated course. Each model
+    keeps the accumulators its stateless counterpart would compute from the full lists
+    and produces the same ranking; exact ties are broken by the order of the events.
+    """
+
+    def __init__(self, size: int, courseClient: CourseClient) -> None:
+        """
+        :param size: Number of course IDs covered by the score vectors.
+        :param courseClient: Client used to map codes to IDs.
+        """
+        self.courseClient = courseClient
+        self.size = size
+        self.liked: List[int] = []
+        self.disliked: List[int] = []
+        self.rated: Set[str] = set()
+        self.excluded: npt.NDArray[np.bool_] = np.zeros(size, dtype=bool)
+
+    def rate(self, code: str, action: str) -> bool:
+        """
+        Applies a rating, every ID of a duplicated code is rated.
+
+        :param code: The course code.
+        :param action: One of `liked`, `disliked` or `skipped`.
+        :return: False if the code is unknown or was already rated, in which case nothing changes.
+        """
+        if action not in ("liked", "disliked", "skipped"):
+            raise ValueError(f"Unknown action {action}")
+        ids = [course_id for course_id in self.courseClient.ids_for_codes([code]).tolist() if 0 <= course_id < self.size]
+        if code in self.rated or not ids:
+            return False
+        self.rated.add(code)
+        self.excluded[ids] = True
+        for course_id in ids:
+            if action == "liked":
+                self._add_liked(course_id)
+                self.liked.append(course_id)
+            elif action == "disliked":
+                self._add_disliked(course_id)
+                self.disliked.append(course_id)
+        return True
+
+    def _add_liked(self, course_id: int) -> None:
+        pass
+
+    def _add_disliked(self, course_id: int) -> None:
+        pass
+
+    @abstractmethod
+    def recommend(self, n: int) -> List[Recommendation]:
+        """
+        The top n courses of the ratings so far, none before a course is liked.
+        """
+
+    def memory_usage(self) -> int:
+        """
+        Bytes held by the NumPy state of the session.
+        """
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+
+class EmbeddingSessionState(SessionState):
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        super().__init__(len(store), courseClient)
+        self.store = store
+        self.disliked_max = np.full(len(store), -np.inf, dtype=np.float32)
+
+    def _add_disliked(self, course_id: int) -> None:
+        np.maximum(self.disliked_max, self.store.similarity(self.store.embeds[course_id]), out=self.disliked_max)
+
+
+class MaxSessionState(EmbeddingSessionState):
+    """
+    Session counterpart of `recommend_max`: running max similarity to the liked courses.
+    """
+
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        super().__init__(store, courseClient)
+        self.liked_max = np.full(len(store), -np.inf, dtype=np.float32)
+        self.liked_argmax = np.zeros(len(store), dtype=np.int32)
+
+    def _add_liked(self, course_id: int) -> None:
+        similarity = self.store.similarity(self.store.embeds[course_id])
+        better = similarity > self.liked_max
+        self.liked_max[better] = similarity[better]
+        self.liked_argmax[better] = len(self.liked)
+
+    def recommend(self, n: int) -> List[Recommendation]:
+        if not self.liked:
+            return []
+        scores = np.where(self.disliked_max > 0.9, -np.inf, self.liked_max)
+        selected_idxs, _ = top_k(scores, n, self.excluded)
+        return [
+            Recommendation(
+                ID=int(idx),
+                CODE=self.store.codes[idx],
+                RECOMMENDED_FROM=[self.store.codes[self.liked[self.liked_argmax[idx]]]],
+            )
+            for idx in selected_idxs
+        ]
+
+
+class SquaredSumSessionState(EmbeddingSessionState):
+    """
+    Session counterpart of `recommend_courses`: running sum of squared similarities to the liked courses.
+    """
+
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        super().__init__(store, courseClient)
+        self.liked_sum = np.zeros(len(store), dtype=np.float32)
+
+    def _add_liked(self, course_id: int) -> None:
+        similarity = self.store.similarity(self.store.normalize(self.store.embeds[course_id]))
+        self.liked_sum += similarity * similarity
+
+    def _add_disliked(self, course_id: int) -> None:
+        similarity = self.store.similarity(self.store.normalize(self.store.embeds[course_id]))
+        np.maximum(self.disliked_max, similarity, out=self.disliked_max)
+
+    def recommend(self, n: int) -> List[Recommendation]:
+        if not self.liked:
+            return []
+        scores = np.where(self.disliked_max >= 0.9, np.float32(0), self.liked_sum)
+        top_idxs, top_scores = top_k(scores, n, self.excluded)
+        return [
+            Recommendation(ID=int(idx), CODE=self.store.codes[idx], SIMILARITY=float(score))
+            for idx, score in zip(top_idxs, top_scores)
+        ]
+
+
+class AverageSessionState(EmbeddingSessionState):
+    """
+    Session counterpart of `recommend_average`: running sums of the raw liked and disliked embeddings.
+    """
+
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        super().__init__(store, courseClient)
+        self.liked_total = np.zeros(store.dim, dtype=np.float64)
+        self.disliked_total = np.zeros(store.dim, dtype=np.float64)
+
+    def _add_liked(self, course_id: int) -> None:
+        self.liked_total += self.store.vectors([course_id])[0]
+
+    def _add_disliked(self, course_id: int) -> None:
+        self.disliked_total += self.store.vectors([course_id])[0]
+
+    def recommend(self, n: int) -> List[Recommendation]:
+        if not self.liked:
+            return []
+        target = self.liked_total / len(self.liked)
+        if self.disliked:
+            target = target - self.disliked_total / len(self.disliked) * 0.5
+        distances = euclidean_distances(self.store, target.astype(np.float32))
+        top_idxs, top_distances = top_k(-distances, n, self.excluded)
+        return [
+            Recommendation(ID=int(idx), CODE=self.store.codes[idx], SIMILARITY=float(1.0 / (1.0 + distance)))
+            for idx, distance in zip(top_idxs, -top_distances)
+        ]
+
+
+class PairSessionState(EmbeddingSessionState):
+    """
+    Session counterpart of `recommend_max_with_combinations`: running best score over every
+    pair of liked courses (including a course paired with itself).
+
+    The cosine similarity to the mean of a pair is (|r_i| s_i + |r_j| s_j) / |r_i + r_j|,
+    where s are the similarities to the normalized liked embeddings, so a new like needs one
+    matrix-vector product and the pair scores are combined from the stored columns.
+    """
+
+    # Initial number of stored liked similarity columns, doubled when full
+    INITIAL_CAPACITY = 8
+
+    def __init__(self, store: EmbeddingStore, courseClient: CourseClient) -> None:
+        super().__init__(store, courseClient)
+        self.liked_similarity = np.empty((len(store), self.INITIAL_CAPACITY), dtype=np.float32)
+        self.liked_max = np.full(len(store), -np.inf, dtype=np.float32)
+        self.best_score = np.full(len(store), -np.inf, dtype=np.float32)
+        self.best_pair = np.zeros((len(store), 2), dtype=np.int32)
+
+    def _add_liked(self, course_id: int) -> None:
+        k = len(self.liked)
+        if k == self.liked_similarity.shape[1]:
+            grown = np.empty((len(self.store), 2 * k), dtype=np.float32)
+            grown[:, :k] = self.liked_similarity[:, :k]
+            self.liked_similarity = grown
+
+        similarity = self.store.similarity(self.store.embeds[course_id])
+        self.liked_similarity[:, k] = similarity
+        np.maximum(self.liked_max, similarity, out=self.liked_max)
+
+        # The course paired with itself, then with every earlier liked course
+        self._update_best(similarity, k, k)
+        norms = self.store.norms[self.liked]
+        norm = self.store.norms[course_id]
+        for i, other_norm in enumerate(norms.tolist()):
+            pair_norm = np.sqrt(max(other_norm ** 2 + norm ** 2 + 2 * other_norm * norm * float(similarity[self.liked[i]]), 0.0))
+            if pair_norm == 0:
+                continue
+            pair_similarity = (other_norm * self.liked_similarity[:, i] + norm * similarity) / np.float32(pair_norm)
+            self._update_best(pair_similarity, i, k)
+
+    def _update_best(self, similarity: npt.NDArray[np.float32], i: int, j: int) -> None:
+        better = similarity > self.best_score
+        self.best_score[better] = similarity[better]
+        self.best_pair[better] = (i, j)
+
+    def recommend(self, n: int) -> List[Recommendation]:
+        if not self.liked:
+            return []
+        # Courses closest to a single liked course are penalized, as are courses
+        # too similar to a liked or disliked one filtered out
+        scores = np.where(self.best_pair[:, 0] == self.best_pair[:, 1], self.best_score * np.float32(0.95), self.best_score)
+        scores[self.liked_max > 0.94] = -np.inf
+        scores[self.disliked_max > 0.8] = -np.inf
+
+        excluded = self.excluded | self.courseClient.ineligible_mask(self.size)
+        selected_idxs, _ = top_k(scores, n, excluded)
+        recommendations = []
+        for idx in selected_idxs:
+            i, j = self.best_pair[idx]
+            code1, code2 = self.store.codes[self.liked[i]], self.store.codes[self.liked[j]]
+            recommendations.append(Recommendation(
+                ID=int(idx),
+                CODE=self.store.codes[idx],
+                RECOMMENDED_FROM=[code1] if code1 == code2 else [code1, code2],
+            ))
+        return recommendations
+
+
+class KeywordSessionState(SessionState):
+    """
+    Session counterpart of `recommend_courses_keywords`: running sums of the liked and disliked rows.
+    """
+
+    def __init__(self, matrix: sp.csr_matrix, courseClient: CourseClient) -> None:
+        super().__init__(matrix.shape[0], courseClient)
+        self.matrix = matrix
+        # float64 like the column sums of the stateless model; the uint8 rows of the tfidf asset would wrap around
+        self.liked_total = np.zeros(matrix.shape[1], dtype=np.float64)
+        self.disliked_total = np.zeros(matrix.shape[1], dtype=np.float64)
+
+    def _add_row(self, total: npt.NDArray, course_id: int) -> None:
+        start, end = self.matrix.indptr[course_id], self.matrix.indptr[course_id + 1]
+        total[self.matrix.indices[start:end]] += self.matrix.data[start:end]
+
+    def _add_liked(self, course_id: int) -> None:
+        self._add_row(self.liked_total, course_id)
+
+    def _add_disliked(self, course_id: int) -> None:
+        self._add_row(self.disliked_total, course_id)
+
+    def recommend(self, n: int) -> List[Recommendation]:
+        if not self.liked:
+            return []
+        scores = self.liked_total
+        if self.disliked:
+            scores = scores - self.disliked_total * (0.5 / len(self.disliked))
+        excluded = self.excluded | self.courseClient.ineligible_mask(self.size)
+        ids = top_k(scores, n, excluded)[0].tolist()
+
+        codes = self.courseClient.get_codes_by_ids(ids)
+        recommended_from = calculate_recommended_from(ids, self.liked, self.matrix[self.liked], self.courseClient)
+        return [
+            Recommendation(ID=idx, CODE=code, RECOMMENDED_FROM=sources)
+            for idx, code, sources in zip(ids, codes, recommended_from)
+        ]
+
+
+# Session state class of every model that supports sessions
+SESSION_STATES: Dict[str, Type[SessionState]] = {
+    "embeddings_v1": SquaredSumSessionState,
+    "embeddings_max": MaxSessionState,
+    "average": AverageSessionState,
+    "max_with_combinations": PairSessionState,
+    "keywords_gemini": KeywordSessionState,
+    "keywords_tfidf": KeywordSessionState,
+}
@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+
+from app.courses import CourseClient
+from app.recommend.topk import top_k
+
+
+class EmbeddingStore:
+    """
+    Course embeddings prepared once at startup for all embedding recommenders.
+
+    Holds a contiguous float32 matrix of L2-normalized embeddings (row = course ID),
+    the original row norms and the code <-> ID mapping, so a request only has to
+    multiply the normalized matrix with its liked/disliked vectors.
+    """
+
+    def __init__(self, all_embeds: npt.NDArray, courseClient: CourseClient, norms: Optional[npt.NDArray] = None) -> None:
+        """
+        :param all_embeds: Raw course embeddings, one row per course ID (may be memory-mapped).
+        :param courseClient: Client used to build the code/ID mapping.
+        :param norms: Row norms of already normalized `all_embeds`, which are then used as is
+            (e.g. a memory map shared by all workers) instead of being normalized into a private copy.
+        """
+        if norms is None:
+            embeds, norms = self.prepare(all_embeds)
+        else:
+            embeds = all_embeds
+            if embeds.dtype != np.float32 or not embeds.flags.c_contiguous:
+                raise ValueError("Normalized embeddings must be a C-contiguous float32 matrix")
+
+        self.embeds: npt.NDArray[np.float32] = embeds
+        self.norms: npt.NDArray[np.float32] = np.asarray(norms, dtype=np.float32)
+
+        # Optional SimilarityBatcher coalescing concurrent full-matrix products
+        self.batcher = None
+        # Optional approximate matrix (QuantizedMatrix, ProjectedMatrix) for the first pass of
+        # `rescored_similarity`, and the number of courses it shortlists for exact rescoring
+        self.first_pass = None
+        self.rescore_size = 400
+        # Optional IVFIndex generating the candidates of `rescored_similarity` instead
+        self.index = None
+        # Optional NeighbourGraph ranking small profiles of `recommend_max` from precomputed neighbours
+        self.graph = None
+
+        self.codes: npt.NDArray[np.object_] = np.full(len(embeds), None, dtype=object)
+        self._code_to_ids: Dict[str, List[int]] = {}
+        for course_id, code in zip(courseClient.df["ID"].to_numpy(), courseClient.df["CODE"].to_numpy()):
+            if 0 <= course_id < len(embeds):
+                self.codes[course_id] = code
+            self._code_to_ids.setdefault(code, []).append(int(course_id))
+
+    def __len__(self) -> int:
+        return self.embeds.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.embeds.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the matrices and of the optional first pass, index and neighbour graph."""
+        optional = [self.first_pass, self.index, self.graph]
+        return int(self.embeds.nbytes + self.norms.nbytes + sum(part.nbytes for part in optional if part is not None))
+
+    def ids_for_codes(self, codes: Iterable[str]) -> List[int]:
+        """
+        Maps course codes to IDs, keeping every ID of duplicated codes.
+
+        :param codes: Course codes, unknown codes are ignored.
+        :return: List of course IDs.
+        """
+        result: List[int] = []
+        for code in codes:
+            result.extend(self._code_to_ids.get(code, ()))
+        return result
+
+    def vectors(self, ids: List[int]) -> npt.NDArray[np.float32]:
+        """
+        Reconstructs the raw (unnormalized) embeddings of the given courses.
+        """
+        return self.embeds[ids] * self.norms[ids, None]
+
+    def similarity(self, targets: npt.NDArray, rows: Optional[npt.NDArray] = None) -> npt.NDArray[np.float32]:
+        """
+        Cosine similarity between courses and L2-normalized target vectors.
+
+        :param targets: Normalized targets with shape (k, dim) or (dim,).
+        :param rows: Optional course IDs to score, all courses when None.
+        :return: Similarities with shape (len(rows), k) or (len(rows),).
+        """
+        if rows is None and self.batcher is not None:
+            return self.batcher.similarity(targets)
+        matrix = self.embeds if rows is None else self.embeds[rows]
+        return matrix @ np.asarray(targets, dtype=np.float32).T
+
+    def rescored_similarity(
+        self,
+        targets: List[npt.NDArray],
+        score: Callable[[List[npt.NDArray[np.float32]]], npt.NDArray],
+        exclude: Optional[npt.NDArray[np.bool_]] = None,
+        min_rows: int = 0,
+        queries: Optional[npt.NDArray] = None,
+    ) -> Tuple[npt.NDArray[np.intp], List[npt.NDArray[np.float32]]]:
+        """
+        Similarities of the candidate courses to several blocks of targets, in two stages when
+        the store has a first-pass matrix or an index.
+
+        Without either, every course is a candidate and this is `similarity` of every block.
+        With a first-pass matrix all courses are scored approximately, ranked with `score`, and
+        the best `max(rescore_size, min_rows)` courses that are not excluded are the candidates.
+        With an index the candidates are the courses near the targets of the first block (the
+        model's query vectors; further blocks, e.g. disliked courses, are only rescored).
+        Candidates are always scored exactly in float32.
+
+        :param targets: Blocks of normalized targets, each with shape (k, dim), the query vectors first.
+        :param score: Maps the similarity blocks to one score per course, as the model ranks them.
+        :param exclude: Optional mask of courses that are never recommended and need no rescoring.
+        :param min_rows: Minimum number of candidates, e.g. the candidate pool of a reranking model.
+        :param queries: Normalized vectors the index probes with instead of the first block.
+        :return: The candidate course IDs in ascending order and one (candidates x k) similarity
+            matrix per block, row i belonging to candidate i.
+        """
+        if self.first_pass is None and self.index is None:
+            return np.arange(len(self)), [self.similarity(block) for block in targets]
+        blocks = [np.asarray(block, dtype=np.float32).reshape(-1, self.dim) for block in targets]
+        if self.index is not None:
+            rows = self.index.candidates(blocks[0] if queries is None else queries, exclude, min_rows)
+        else:
+            approximate = [self.first_pass.similarity(block) for block in blocks]
+            rows = np.sort(top_k(score(approximate), max(self.rescore_size, min_rows), exclude)[0])
+
+        return rows, self.candidate_similarity(blocks, rows)
+
+    def candidate_similarity(self, targets: List[npt.NDArray], rows: npt.NDArray[np.intp]) -> List[npt.NDArray[np.float32]]:
+        """
+        Exact similarities of the given courses to several blocks of targets, in one product.
+
+        :param targets: Blocks of normalized targets, each with shape (k, dim).
+        :param rows: Course IDs to score.
+        :return: One (len(rows) x k) similarity matrix per block.
+        """
+        blocks = [np.asarray(block, dtype=np.float32).reshape(-1, self.dim) for block in targets]
+        exact = self.similarity(np.vstack(blocks), rows=rows)
+        similarities = []
+        offset = 0
+        for block in blocks:
+            similarities.append(exact[:, offset:offset + len(block)])
+            offset += len(block)
+        return similarities
+
+    @staticmethod
+    def prepare(all_embeds: npt.NDArray) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """
+        Normalizes raw embeddings the way the constructor does.
+
+        :return: The normalized float32 matrix and the original row norms.
+        """
+        embeds = np.array(all_embeds, dtype=np.float32, order="C", copy=True)
+        norms = np.linalg.norm(embeds, axis=1)
+        nonzero = norms > 0
+        embeds[nonzero] /= norms[nonzero, None]
+        return embeds, norms.astype(np.float32)
+
+    @staticmethod
+    def normalize(vectors: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        L2-normalizes vectors along the last axis, leaving zero vectors untouched.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
@@ -0,0 +1,111 @@
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+def exclusion_mask(size: int, ids: Iterable[int]) -> npt.NDArray[np.bool_]:
+    """
+    Builds a boolean mask of length `size` with True at the given course IDs.
+
+    :param size: Number of courses.
+    :param ids: Course IDs to mark, out of range IDs are ignored.
+    :return: The boolean mask.
+    """
+    mask = np.zeros(size, dtype=bool)
+    ids = np.fromiter(ids, dtype=np.intp)
+    mask[ids[(ids >= 0) & (ids < size)]] = True
+    return mask
+
+
+def top_k_indices(scores: npt.NDArray, k: int) -> npt.NDArray[np.intp]:
+    """
+    Indices of the k highest scores in descending order.
+
+    Uses a partition instead of a full sort; ties are broken by the lower index,
+    which matches a stable descending sort of the whole vector.
+
+    :param scores: 1-D score vector.
+    :param k: Number of indices to return.
+    :return: Indices of the top k scores.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if scores.dtype.kind == "u":
+        # Negating unsigned scores (sums of the uint8 intersection assets) wraps around
+        scores = scores.astype(np.int64)
+    if k == scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(above)]
+    selected = np.concatenate([above, ties])
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def ranked(
+    scores: npt.NDArray,
+    exclude: Optional[npt.NDArray[np.bool_]] = None,
+    fetch: int = 16,
+) -> Iterator[Tuple[int, float]]:
+    """
+    Lazily yields (course ID, score) pairs in descending score order, skipping excluded IDs.
+
+    Candidates are selected in batches with `top_k_indices`; the first batch is over-fetched
+    by the number of excluded IDs and every further batch doubles in size, so a caller that
+    stops after k accepted candidates pays O(N + k log k) instead of a full sort.
+
+    :param scores: 1-D score vector indexed by course ID.
+    :param exclude: Optional boolean mask of IDs that must never be returned.
+    :param fetch: Size of the first batch before over-fetching.
+    :return: Iterator of (course ID, score) pairs.
+    """
+    scores = np.asarray(scores)
+    ids: Optional[npt.NDArray[np.intp]] = None
+    if exclude is not None:
+        excluded = int(np.count_nonzero(exclude))
+        if excluded * 2 > scores.shape[0]:
+            # Mostly excluded, rank only the eligible subset
+            ids = np.flatnonzero(~exclude)
+            scores = scores[ids]
+            exclude = None
+        else:
+            fetch += excluded
+
+    yielded = 0
+    while yielded < scores.shape[0]:
+        top = top_k_indices(scores, fetch)
+        for local in top[yielded:]:
+            idx = int(local if ids is None else ids[local])
+            if exclude is None or not exclude[idx]:
+                yield idx, scores[local]
+        yielded = len(top)
+        fetch *= 2
+
+
+def top_k(
+    scores: npt.NDArray,
+    k: int,
+    exclude: Optional[npt.NDArray[np.bool_]] = None,
+    accept: Optional[Callable[[int], bool]] = None,
+) -> Tuple[npt.NDArray[np.intp], npt.NDArray]:
+    """
+    Selects the k best scoring course IDs that are not excluded.
+
+    :param scores: 1-D score vector indexed by course ID.
+    :param k: Number of courses to select.
+    :param exclude: Optional boolean mask of IDs that must never be returned.
+    :param accept: Optional predicate for checks that cannot be expressed as a mask.
+    :return: Tuple of selected IDs and their scores, best first.
+    """
+    selected_ids = []
+    selected_scores = []
+    if k > 0:
+        for idx, score in ranked(scores, exclude, fetch=k):
+            if accept is not None and not accept(idx):
+                continue
+            selected_ids.append(idx)
+            selected_scores.append(score)
+            if len(selected_ids) == k:
+                break
+    return np.array(selected_ids, dtype=np.intp), np.array(selected_scores, dtype=np.asarray(scores).dtype)
@@ -0,0 +1,147 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.recommend.sessions import SessionState
+
+
+class Session:
+    """
+    A recommendation session: the model it was created for and its incremental state.
+    """
+
+    def __init__(self, session_id: str, model: str, state: SessionState) -> None:
+        self.id = session_id
+        self.model = model
+        self.state = state
+        # Events of one session are applied one at a time
+        self.lock = threading.Lock()
+        self.memory = state.memory_usage()
+
+
+class SessionStore:
+    """
+    Bounded in-process session storage with LRU eviction, an idle TTL and a memory cap.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl: float = 1800.0,
+        max_bytes: int = 512 * 2**20,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param max_sessions: Maximum number of live sessions.
+        :param ttl: Seconds a session is kept without any activity.
+        :param max_bytes: Cap on the summed NumPy state of all sessions.
+        :param clock: Monotonic time source.
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # Session ID -> (last use, session), least recently used first
+        self._sessions: "OrderedDict[str, tuple[float, Session]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"created": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, model: str, state: SessionState) -> Session:
+        """
+        Stores a new session, evicting the least recently used ones if over a limit.
+        """
+        session = Session(secrets.token_urlsafe(16), model, state)
+        with self._lock:
+            self._sessions[session.id] = (self._clock(), session)
+            self._bytes += session.memory
+            self._counters["created"] += 1
+            self._evict(keep=session.id)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """
+        Returns a live session and marks it as used, None if unknown or expired.
+        """
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            session = entry[1]
+            self._sessions[session_id] = (self._clock(), session)
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def update(self, session: Session) -> None:
+        """
+        Re-accounts the memory of a session after its state changed.
+        """
+        with self._lock:
+            if session.id not in self._sessions:
+                return
+            memory = session.state.memory_usage()
+            self._bytes += memory - session.memory
+            session.memory = memory
+            self._evict(keep=session.id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            self._counters["deleted"] += 1
+            return True
+
+    def clear(self) -> None:
+        """
+        Drops every session, e.g. when the assets their state was computed from are reloaded.
+        """
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+    def _remove(self, session_id: str) -> None:
+        _, session = self._sessions.pop(session_id)
+        self._bytes -= session.memory
+
+    def _expire(self) -> None:
+        deadline = self._clock() - self.ttl
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if last_used > deadline:
+                break
+            self._remove(session_id)
+            self._counters["expired"] += 1
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        self._expire()
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                # The active session alone may exceed the cap, evict the next oldest instead
+                if len(self._sessions) == 1:
+                    break
+                self._sessions.move_to_end(session_id)
+                continue
+            self._remove(session_id)
+            self._counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Session counters and current usage.
+        """
+        with self._lock:
+            return {
+                **self._counters,
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
 
 @dataclass
 class Ratings:
@@ -51,6 +51,31 @@ class CourseWithId(Course):
     SIMILARITY: float = 0.0
     RECOMMENDED_FROM: List[str] = None
 
+@dataclass
+class CourseSummary:
+    CODE: str
+    FACULTY: str
+    NAME: str
+    NAME_EN: str
+    LANGUAGE: str
+    SEMESTER: str
+    CREDITS: str
+    DEPARTMENT: str
+    TEACHERS: str
+    COMPLETION: str
+    KEYWORDS: List[str]
+    DESCRIPTION: str
+    ID: Optional[int] = 0
+    SIMILARITY: float = 0.0
+    RECOMMENDED_FROM: List[str] = None
+
+@dataclass
+class Recommendation:
+    ID: int
+    CODE: str
+    SIMILARITY: float = 0.0
+    RECOMMENDED_FROM: List[str] = None
+
 @dataclass
 class RecommendationFeedbackLog():
     liked: List[str]
@@ -76,4 +101,32 @@ class UserFeedbackLog():
 
 @dataclass
 class RecommendationResponse:
-    recommended_courses: List[CourseWithId]
\ No newline at end of file
+    recommended_courses: List[CourseWithId]
+
+@dataclass
+class SummaryRecommendationResponse:
+    recommended_courses: List[CourseSummary]
+
+
+@dataclass
+class RatingProfile:
+    liked: List[str] = field(default_factory=list)
+    disliked: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+@dataclass
+class SessionEvent:
+    course: str
+    action: Literal["liked", "disliked", "skipped"]
+
+@dataclass
+class SessionResponse:
+    session_id: str
+    model: str
+    liked: int
+    disliked: int
+    rated: int
+
+@dataclass
+class BatchRecommendationResponse:
+    results: List[RecommendationResponse]
@@ -2,36 +2,90 @@ from dotenv import load_dotenv
 load_dotenv()
 import os
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import JSONResponse, Response
+from typing import List, Literal, Optional
 
 import numpy as np
 import scipy.sparse as sp
 from datetime import datetime
 
-from app.recommend.embeddings import recommend_courses, recommend_average, recommend_max, recommend_mmr_cos, recommend_max_with_combinations
-from app.recommend.keywords import recommend_courses_keywords
-from app.recommend.baseline import recommend_courses_baseline
+from app.recommend.registry import (
+    EMBEDDINGS_ASSET,
+    GEMINI_INTERSECTS_ASSET,
+    TFIDF_INTERSECTS_ASSET,
+    KeywordModel,
+    ModelParams,
+    ModelRegistry,
+    Recommender,
+    build_registry,
+)
+from app.recommend.store import EmbeddingStore
+from app.recommend.batcher import SimilarityBatcher
+from app.recommend.quantized import QUANTIZATIONS
+from app.recommend.projection import PROJECTION_ASSET, load_projection
+from app.recommend.ann import IVF_ASSET, IVFIndex
+from app.recommend.knn import KNN_EMBEDDINGS_ASSET, KNN_TFIDF_ASSET, NeighbourGraph
+from app.recommend.mmr import Diversity
 from app.courses import CourseClient
+from app.course_json import CourseJSONCache, REQUEST_FIELDS, SUMMARY_FIELDS, encode_json
+from app.cache import ResultCache
+from app.executor import ExecutorSaturated, ModelExecutor
+from app.recommend.sessions import SESSION_STATES, SessionState
+from app.recommend.batch import EMBEDDING_BATCH_MODELS, KEYWORD_BATCH_MODELS, recommend_keywords_batch, resolve_profiles
+from app.session_store import Session, SessionStore
 from app.types import (
     CourseWithId,
+    Recommendation,
     RecommendationFeedbackLog,
     UserFeedbackLog,
     RecommendationResponse,
+    BatchRecommendationResponse,
+    SessionEvent,
+    RatingProfile,
+    SessionResponse,
 )
 from app.db.mongo import MongoDBLogger
 from app.logger import logger
+from app.memory import resident_memory, memory_breakdown, mapped_file_memory
+from app.assets import MappedAssets, open_mapped_assets
 
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 # Resource placeholders
 courseClient = None
-all_embeds = None
-kwd_intersects_gemini = None
-kwd_intersects_tfidf = None
+course_json = None
+embedding_store = None
+# The served models over the loaded assets, see `build_registry`
+model_registry = None
+# Uncompressed memory-mapped copies of the assets, shared by all workers, None when not converted
+mapped_assets = None
 db = None
+catalogue_memory = {}
+
+# Bumped on every asset (re)load, part of the result cache key
+asset_version = 0
+result_cache = ResultCache(
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "300")),
+)
+# Recommenders run on a bounded pool, requests beyond its queue are rejected with 503
+model_executor = ModelExecutor(
+    max_workers=int(os.getenv("RECOMMEND_WORKERS", str(os.cpu_count() or 4))),
+    max_queue=int(os.getenv("RECOMMEND_QUEUE_SIZE", "64")),
+)
+# Models with random tie-breaking, their results are never cached
+UNCACHED_MODELS = {"baseline"}
+session_store = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+    ttl=float(os.getenv("SESSION_TTL", "1800")),
+    max_bytes=int(os.getenv("SESSION_MAX_MEMORY_MB", "512")) * 2**20,
+)
+# max_with_combinations only scores the pairs among this many most similar liked courses of
+# every course (approximate), 0 scores all pairs
+COMBINATIONS_PRUNE_LIKED = int(os.getenv("COMBINATIONS_PRUNE_LIKED", "0"))
 
 logger.info("Starting Muni Courses API")
 server_start_time = datetime.now()
@@ -45,10 +99,19 @@ app.add_middleware(
         "https://muni.courses",
     ],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated) -> JSONResponse:
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Middleware to log all incoming HTTP requests."""
@@ -71,52 +134,263 @@ async def log_requests(request: Request, call_next):
 
 assets = "assets"
 def load_course_client():
-    logger.info("Loading course data...")
-    cc = CourseClient(os.path.join(assets, "courses"))
-    logger.info(f"Course data loaded successfully with {len(cc.df)} courses")
+    mode = os.getenv("COURSE_CATALOGUE_MODE", "full")
+    logger.info(f"Loading course data in {mode} mode...")
+    rss_before = resident_memory()
+    cc = CourseClient(
+        os.path.join(assets, "courses"),
+        lazy_text=mode == "lean",
+        text_cache_size=int(os.getenv("COURSE_TEXT_CACHE_SIZE", "1024")),
+    )
+    rss_after = resident_memory()
+    catalogue_memory.update(rss_before=rss_before, rss_after=rss_after)
+    logger.info(
+        f"Course data loaded successfully with {len(cc.df)} courses, "
+        f"resident memory {rss_before / 2**20:.1f} MiB -> {rss_after / 2**20:.1f} MiB"
+    )
     return cc
 
-def load_embeddings():
+def load_mapped_assets():
+    mapped = open_mapped_assets(assets)
+    if mapped is None:
+        logger.info("No mapped assets found, loading the compressed files")
+        return None
+    stale = mapped.stale_sources(assets)
+    if stale:
+        logger.warning(f"Mapped assets are stale ({', '.join(stale)} changed), loading the compressed files; run scripts.convert_assets")
+        return None
+    logger.info(f"Using mapped assets from {mapped.directory}")
+    return mapped
+
+def load_embeddings(mapped: MappedAssets = None):
     logger.info("Loading embeddings...")
-    emb = np.load(os.path.join(assets, "embeddings_tomas_03.npy"), allow_pickle=True, mmap_mode="r")
+    if mapped is not None:
+        emb, norms = mapped.array("embeddings"), mapped.array("embedding_norms")
+    else:
+        emb = np.load(os.path.join(assets, EMBEDDINGS_ASSET), allow_pickle=True, mmap_mode="r")
+        norms = None
     logger.info(f"Embeddings loaded successfully with shape {emb.shape}")
-    return emb
+    return emb, norms
+
+def load_course_json(cc: CourseClient) -> CourseJSONCache:
+    logger.info("Encoding course JSON fragments...")
+    # In lean mode the full records are encoded on demand to keep the text columns off-heap
+    full_cache_size = int(os.getenv("COURSE_JSON_CACHE_SIZE", "4096")) if cc.lazy_text else None
+    cache = CourseJSONCache(cc, full_cache_size=full_cache_size)
+    usage = cache.memory_usage()
+    logger.info(
+        f"Course JSON fragments encoded: summary {usage['summary_bytes'] / 2**20:.1f} MiB, "
+        f"full {usage['full_bytes'] / 2**20:.1f} MiB"
+    )
+    return cache
+
+def load_embedding_store(emb: np.ndarray, norms: np.ndarray, cc: CourseClient) -> EmbeddingStore:
+    # Mapped embeddings come with their norms and are already normalized
+    logger.info("Normalizing embeddings..." if norms is None else "Using mapped normalized embeddings...")
+    store = EmbeddingStore(emb, cc, norms=norms)
+    logger.info(f"Embedding store ready with {len(store)} normalized {store.embeds.dtype} vectors")
+    quantization = os.getenv("EMBEDDING_QUANTIZATION", "none")
+    projection = os.getenv("EMBEDDING_PROJECTION", "none")
+    if quantization != "none" and projection != "none":
+        raise ValueError("EMBEDDING_QUANTIZATION and EMBEDDING_PROJECTION cannot be combined")
+    if quantization != "none":
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown EMBEDDING_QUANTIZATION {quantization}, expected none or one of {list(QUANTIZATIONS)}")
+        store.first_pass = QUANTIZATIONS[quantization](store.embeds)
+    elif projection != "none":
+        if projection != "pca":
+            raise ValueError(f"Unknown EMBEDDING_PROJECTION {projection}, expected none or pca")
+        dim = os.getenv("EMBEDDING_PROJECTION_DIM")
+        store.first_pass = load_projection(os.path.join(assets, PROJECTION_ASSET), store.embeds, int(dim) if dim else None)
+    index = os.getenv("EMBEDDING_INDEX", "none")
+    if index != "none":
+        if index != "ivf":
+            raise ValueError(f"Unknown EMBEDDING_INDEX {index}, expected none or ivf")
+        if store.first_pass is not None:
+            raise ValueError("EMBEDDING_INDEX cannot be combined with a first-pass matrix")
+        store.index = IVFIndex.load(os.path.join(assets, IVF_ASSET), len(store), nprobe=int(os.getenv("EMBEDDING_INDEX_NPROBE", "8")))
+        logger.info(f"Candidates from an IVF index with {store.index.cells} cells, {store.index.nprobe} probed per target")
+    store.graph = load_neighbour_graph(KNN_EMBEDDINGS_ASSET, len(store))
+    if store.first_pass is not None:
+        store.rescore_size = int(os.getenv("EMBEDDING_RESCORE_SIZE", "400"))
+        logger.info(
+            f"First-pass scoring on {store.first_pass.mode} embeddings ({store.first_pass.nbytes / 2**20:.1f} MiB), "
+            f"top {store.rescore_size} rescored in float32"
+        )
+    window = float(os.getenv("SIMILARITY_BATCH_WINDOW_MS", "0"))
+    if window > 0:
+        store.batcher = SimilarityBatcher(
+            store.embeds,
+            window=window / 1000,
+            max_requests=int(os.getenv("SIMILARITY_BATCH_MAX_REQUESTS", "32")),
+            max_targets=int(os.getenv("SIMILARITY_BATCH_MAX_TARGETS", "1024")),
+        )
+        logger.info(f"Similarity micro-batching enabled with a {window} ms window")
+    return store
+
+def load_neighbour_graph(asset: str, courses: int) -> Optional[NeighbourGraph]:
+    max_liked = int(os.getenv("KNN_MAX_LIKED", "0"))
+    if max_liked <= 0:
+        return None
+    graph = NeighbourGraph.load(os.path.join(assets, asset), courses, max_liked)
+    logger.info(f"Neighbour graph {asset} loaded with {graph.k} neighbours per course, serving up to {max_liked} liked courses")
+    return graph
 
-def load_gemini_intersects():
+def load_gemini_intersects(mapped: MappedAssets = None):
     logger.info("Loading Gemini keyword intersections...")
-    gi = sp.load_npz(os.path.join(assets, "intersects_sparse.npz"))
+    if mapped is not None:
+        gi = mapped.csr("intersects_sparse")
+    else:
+        gi = sp.load_npz(os.path.join(assets, GEMINI_INTERSECTS_ASSET))
     logger.info(f"Gemini keyword intersections loaded successfully with shape {gi.shape}")
     return gi
 
-def load_tfidf_intersects():
+def load_tfidf_intersects(mapped: MappedAssets = None):
     logger.info("Loading TF-IDF keyword intersections...")
-    ti = sp.load_npz(os.path.join(assets, "intersects_tfidf.npz"))
+    if mapped is not None:
+        ti = mapped.csr("intersects_tfidf")
+    else:
+        ti = sp.load_npz(os.path.join(assets, TFIDF_INTERSECTS_ASSET))
     logger.info(f"TF-IDF keyword intersections loaded successfully with shape {ti.shape}")
     return ti
 
+def prepare_models(cc: CourseClient, store: EmbeddingStore, gemini: sp.csr_matrix, tfidf: sp.csr_matrix, tfidf_graph: Optional[NeighbourGraph]) -> ModelRegistry:
+    registry = build_registry(cc, store, gemini, tfidf, tfidf_graph, combinations_prune_liked=COMBINATIONS_PRUNE_LIKED)
+    registry.prepare()
+    for status in registry.status():
+        logger.info(
+            f"Model {status['name']} {status['state']} in {status['prepare_seconds']:.3f}s, "
+            f"reads {status['memory_bytes'] / 2**20:.1f} MiB"
+        )
+    return registry
+
 def init_db_logger():
     logger.info("Initializing MongoDB logger...")
     d = MongoDBLogger()
     logger.info("MongoDB logger initialized successfully")
     return d
 
-@app.on_event("startup")
-async def startup_event(assets_path: str = assets):
-    global assets
+async def load_assets(assets_path: str = assets) -> None:
+    """
+    Loads (or reloads) all recommendation assets and invalidates results computed from the previous ones.
+    """
+    global assets, asset_version
+    global courseClient, course_json, embedding_store, model_registry, mapped_assets
     assets = assets_path
     loop = asyncio.get_event_loop()
+    mapped = load_mapped_assets()
     with ThreadPoolExecutor() as executor:
-        results = await asyncio.gather(
-            loop.run_in_executor(executor, load_course_client),
-            loop.run_in_executor(executor, load_embeddings),
-            loop.run_in_executor(executor, load_gemini_intersects),
-            loop.run_in_executor(executor, load_tfidf_intersects),
-            loop.run_in_executor(executor, init_db_logger),
+        # The catalogue loads on its own, so the resident memory it reports does not include the other assets
+        cc = await loop.run_in_executor(executor, load_course_client)
+        (all_embeds, norms), gemini, tfidf = await asyncio.gather(
+            loop.run_in_executor(executor, load_embeddings, mapped),
+            loop.run_in_executor(executor, load_gemini_intersects, mapped),
+            loop.run_in_executor(executor, load_tfidf_intersects, mapped),
         )
-    global courseClient, all_embeds, kwd_intersects_gemini, kwd_intersects_tfidf, db
-    courseClient, all_embeds, kwd_intersects_gemini, kwd_intersects_tfidf, db = results
+    cj, store, tfidf_graph = await asyncio.gather(
+        loop.run_in_executor(None, load_course_json, cc),
+        loop.run_in_executor(None, load_embedding_store, all_embeds, norms, cc),
+        loop.run_in_executor(None, load_neighbour_graph, KNN_TFIDF_ASSET, tfidf.shape[0]),
+    )
+    registry = await loop.run_in_executor(None, prepare_models, cc, store, gemini, tfidf, tfidf_graph)
+    previous_store = embedding_store
+    courseClient, course_json, embedding_store, model_registry = cc, cj, store, registry
+    mapped_assets = mapped
+    if previous_store is not None and previous_store.batcher is not None:
+        previous_store.batcher.close()
+    asset_version += 1
+    result_cache.invalidate()
+    session_store.clear()
+    logger.info(f"Assets version {asset_version} loaded from {assets}")
+
+@app.on_event("startup")
+async def startup_event(assets_path: str = assets):
+    global db
+    loop = asyncio.get_event_loop()
+    _, db = await asyncio.gather(
+        load_assets(assets_path),
+        loop.run_in_executor(None, init_db_logger),
+    )
     logger.info(f"API started successfully in {datetime.now() - server_start_time}")
 
+View = Literal["summary", "full"]
+
+def projected_fields(view: View, fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Resolves the course columns to return, None means the full record.
+
+    :param view: Predefined projection, `summary` or `full`.
+    :param fields: Comma-separated column names, takes precedence over `view`.
+    """
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(requested) - set(courseClient.course_fields()) - set(REQUEST_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return [field for field in requested if field not in REQUEST_FIELDS]
+    if view == "summary":
+        return SUMMARY_FIELDS
+    return None
+
+def encode_recommendations(recommended: List[Recommendation], columns: Optional[List[str]], summary: bool) -> bytes:
+    """
+    Encodes recommendations with the requested projection as a `RecommendationResponse` body.
+
+    The full and summary views are assembled from the pre-encoded course fragments,
+    custom field lists only build the requested columns. Both skip response validation.
+
+    :param columns: Course columns from `projected_fields`, None for the full record.
+    :param summary: Whether the columns are the predefined summary view.
+    """
+    if columns is None or summary:
+        return course_json.encode_recommendations(recommended, summary)
+
+    records = []
+    for r, record in zip(recommended, courseClient.project_courses([r.ID for r in recommended], columns)):
+        if record is not None:
+            record.update(ID=r.ID, SIMILARITY=r.SIMILARITY, RECOMMENDED_FROM=r.RECOMMENDED_FROM)
+            records.append(record)
+    return encode_json({"recommended_courses": records})
+
+def recommendation_response(recommended: List[Recommendation], columns: Optional[List[str]], summary: bool) -> Response:
+    return Response(encode_recommendations(recommended, columns, summary), media_type="application/json")
+
+def canonical_codes(codes: List[str]) -> List[str]:
+    """
+    Known course codes without duplicates, ordered by course ID.
+
+    Recommenders receive the canonical lists, so every request mapping to the same
+    cache key computes exactly the same result.
+    """
+    known = {code for code in codes if len(courseClient.ids_for_codes([code]))}
+    return sorted(known, key=lambda code: int(courseClient.ids_for_codes([code])[0]))
+
+def served_model(model: str) -> Recommender:
+    """
+    Resolves a requested model before any work is submitted for it, so unknown names never
+    reach the executor and its per-model statistics.
+
+    :raises HTTPException: 404 for an unknown model, 503 for a model that failed to prepare.
+    """
+    if model not in model_registry:
+        raise HTTPException(status_code=404, detail=f"Model {model} not found")
+    try:
+        return model_registry.get(model)
+    except ValueError as error:
+        raise HTTPException(status_code=503, detail=str(error))
+
+def run_model(
+    model: str,
+    liked: List[str],
+    disliked: List[str],
+    skipped: List[str],
+    n: int,
+    relevance: float,
+    diversity: Diversity = "liked",
+) -> List[Recommendation]:
+    profile = RatingProfile(liked=liked, disliked=disliked, skipped=skipped)
+    return model_registry.get(model).recommend(profile, n, ModelParams(relevance=relevance, diversity=diversity))
+
 @app.post("/recommendations", response_model=RecommendationResponse)
 async def recommendations(
     liked: List[str],
@@ -125,51 +399,224 @@ async def recommendations(
     n: int,
     model: str = "average",
     relevance: float = 0.8,
+    diversity: Diversity = "liked",
+    view: View = "full",
+    fields: Optional[str] = None,
 ) -> RecommendationResponse:
-    recommended_courses = None
-    if model == "embeddings_v1":
-        recommended_courses = recommend_courses(liked, disliked, skipped, all_embeds, courseClient, n)
-    elif model == "embeddings_mmr":
-        recommended_courses = recommend_mmr_cos(liked, disliked, skipped, all_embeds, courseClient, n, lambda_param=relevance)
-    elif model == "embeddings_max":
-        recommended_courses = recommend_max(liked, disliked, skipped, all_embeds, courseClient, n)
-    elif model == "baseline":
-        recommended_courses = recommend_courses_baseline(
-            liked, disliked, skipped, courseClient, n
-        )
-    elif model == "keywords_gemini":
-        recommended_courses = recommend_courses_keywords(
-            liked, disliked, skipped, courseClient, n, kwd_intersects_gemini
-        )
-    elif model == "keywords_tfidf":
-        recommended_courses = recommend_courses_keywords(
-            liked, disliked, skipped, courseClient, n, kwd_intersects_tfidf
-        )
-    elif model == "average":
-        recommended_courses = recommend_average(
-            liked, disliked, skipped, all_embeds, courseClient, n
-        )
-    elif model == "max_with_combinations":
-        recommended_courses = recommend_max_with_combinations(
-            liked, disliked, skipped, all_embeds, courseClient, n
+    """
+    Recommendations for one rating profile.
+
+    `relevance` is the MMR weight of the relevance of embeddings_mmr and `diversity` what its
+    recommendations must differ from: the liked courses, the ones recommended before them or both.
+    """
+    columns = projected_fields(view, fields)
+    served_model(model)
+    liked, disliked, skipped = canonical_codes(liked), canonical_codes(disliked), canonical_codes(skipped)
+
+    compute = lambda: model_executor.run(model, run_model, model, liked, disliked, skipped, n, relevance, diversity)
+    if model in UNCACHED_MODELS:
+        recommended_courses = await compute()
+    else:
+        key = (
+            model,
+            tuple(sorted(courseClient.ids_for_codes(liked).tolist())),
+            tuple(sorted(courseClient.ids_for_codes(disliked).tolist())),
+            tuple(sorted(courseClient.ids_for_codes(skipped).tolist())),
+            n,
+            relevance,
+            diversity,
+            asset_version,
         )
+        recommended_courses = await result_cache.get_or_compute(key, compute)
+    return recommendation_response(recommended_courses, columns, summary=columns is SUMMARY_FIELDS)
+
+
+def run_batch(model: str, profiles: List[RatingProfile], n: int, relevance: float, diversity: Diversity) -> List[List[Recommendation]]:
+    """
+    Recommends for many profiles at once, with blocked matrix products where the model supports it.
+    """
+    profiles = [
+        (canonical_codes(profile.liked), canonical_codes(profile.disliked), canonical_codes(profile.skipped))
+        for profile in profiles
+    ]
+    # Failed models are rejected here too, not only by the models without a batch implementation
+    recommender = model_registry.get(model)
+    if model in EMBEDDING_BATCH_MODELS:
+        batch_model = EMBEDDING_BATCH_MODELS[model](recommender.store, courseClient)
+        return batch_model.recommend(resolve_profiles(profiles, recommender.store.ids_for_codes), n)
+    if model in KEYWORD_BATCH_MODELS:
+        matrix = recommender.matrix
+        return recommend_keywords_batch(resolve_profiles(profiles, courseClient.get_course_ids_by_codes), matrix, courseClient, n)
+    return [run_model(model, liked, disliked, skipped, n, relevance, diversity) for liked, disliked, skipped in profiles]
+
+@app.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def recommendations_batch(
+    profiles: List[RatingProfile],
+    n: int,
+    model: str = "average",
+    relevance: float = 0.8,
+    diversity: Diversity = "liked",
+    view: View = "full",
+    fields: Optional[str] = None,
+) -> BatchRecommendationResponse:
+    """
+    Recommendations for a list of profiles, in the same order. Meant for offline evaluation
+    and precomputation; results are not cached.
+    """
+    columns = projected_fields(view, fields)
+    served_model(model)
+    results = await model_executor.run(f"{model} (batch)", run_batch, model, profiles, n, relevance, diversity)
+    summary = columns is SUMMARY_FIELDS
+    body = b",".join(encode_recommendations(recommended, columns, summary) for recommended in results)
+    return Response(b'{"results":[' + body + b"]}", media_type="application/json")
+
+def session_state(model: str) -> SessionState:
+    state_class = SESSION_STATES.get(model)
+    if state_class is None:
+        raise HTTPException(status_code=400, detail=f"Model {model} does not support sessions")
+    recommender = served_model(model)
+    if isinstance(recommender, KeywordModel):
+        return state_class(recommender.matrix, courseClient)
+    return state_class(embedding_store, courseClient)
+
+def session_response(session: Session) -> SessionResponse:
+    state = session.state
+    return SessionResponse(
+        session_id=session.id,
+        model=session.model,
+        liked=len(state.liked),
+        disliked=len(state.disliked),
+        rated=len(state.rated),
+    )
+
+def apply_events(session: Session, events: List[SessionEvent], n: int) -> List[Recommendation]:
+    with session.lock:
+        for event in events:
+            session.state.rate(event.course, event.action)
+        return session.state.recommend(n) if n > 0 else []
 
-    if recommended_courses is None:
-        raise ValueError("Model not found")
-    return RecommendationResponse(recommended_courses=recommended_courses)
+@app.post("/sessions", response_model=SessionResponse)
+async def create_session(ratings: Optional[RatingProfile] = None, model: str = "average") -> SessionResponse:
+    """
+    Starts a session that keeps the ratings and the running scores of a model server-side.
+    """
+    session = session_store.create(model, session_state(model))
+    if ratings is not None:
+        events = [SessionEvent(course=code, action=action) for action in ("liked", "disliked", "skipped") for code in getattr(ratings, action)]
+        await model_executor.run(f"{model} (session)", apply_events, session, events, 0)
+        session_store.update(session)
+    return session_response(session)
+
+@app.post("/sessions/{session_id}/events", response_model=RecommendationResponse)
+async def session_events(
+    session_id: str,
+    events: List[SessionEvent],
+    n: int,
+    view: View = "full",
+    fields: Optional[str] = None,
+) -> RecommendationResponse:
+    """
+    Applies ratings to a session and returns its recommendations, each like or dislike
+    updates the running scores instead of recomputing them from all ratings.
+    """
+    columns = projected_fields(view, fields)
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    recommended_courses = await model_executor.run(f"{session.model} (session)", apply_events, session, events, n)
+    session_store.update(session)
+    return recommendation_response(recommended_courses, columns, summary=columns is SUMMARY_FIELDS)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str) -> None:
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
 
 
 @app.get("/course/{course_id}", response_model=CourseWithId)
-async def course(course_id: str) -> CourseWithId:
-    found = courseClient.get_course_by_code(course_id)
-    if found is None:
+async def course(course_id: str, view: View = "full", fields: Optional[str] = None) -> CourseWithId:
+    columns = projected_fields(view, fields)
+    ids = courseClient.ids_for_codes([course_id])
+    if not len(ids):
         raise ValueError("Course not found")
-    return found
+    if columns is None or columns is SUMMARY_FIELDS:
+        body = course_json.encode_course(ids[0], summary=columns is not None)
+        return Response(body, media_type="application/json")
+    return JSONResponse(courseClient.project_courses(ids[:1], columns + ["ID"])[0])
+
+
+@app.get("/course/{course_id}/similar", response_model=RecommendationResponse)
+async def similar_courses(
+    course_id: str,
+    n: int = 10,
+    model: Literal["embeddings_max", "keywords_tfidf"] = "embeddings_max",
+    view: View = "full",
+    fields: Optional[str] = None,
+) -> RecommendationResponse:
+    """
+    Courses most similar to one course by embedding cosine or TF-IDF keyword intersection,
+    read from the precomputed neighbour graphs when they are loaded (`KNN_MAX_LIKED`).
+    """
+    if not len(courseClient.ids_for_codes([course_id])):
+        raise HTTPException(status_code=404, detail="Course not found")
+    return await recommendations([course_id], [], [], n, model=model, view=view, fields=fields)
 
 
 @app.get("/models", response_model=List[str])
 async def models() -> List[str]:
-    return ["max_with_combinations", "keywords_tfidf"]
+    """
+    The models offered to the frontend that are ready.
+    """
+    return model_registry.names()
+
+
+@app.get("/models/status")
+async def models_status() -> List[dict]:
+    """
+    Every served model with its state, preparation time, memory footprint (arrays shared
+    with other models included) and asset files.
+    """
+    return model_registry.status()
+
+
+@app.get("/memory")
+async def memory() -> dict:
+    return {
+        "rss": resident_memory(),
+        # Shared pages (mapped assets, page cache) versus this worker's private memory
+        "process": memory_breakdown(),
+        "mapped_assets": mapped_memory(),
+        "catalogue_load": catalogue_memory,
+        "catalogue": courseClient.memory_usage(),
+        "sessions": session_store.stats(),
+    }
+
+
+def mapped_memory() -> dict:
+    files = mapped_assets.files() if mapped_assets is not None else []
+    arrow_path = os.path.join(assets, "courses", "courses_text.arrow")
+    if courseClient.lazy_text and os.path.exists(arrow_path):
+        files.append(arrow_path)
+    return {os.path.basename(path): usage for path, usage in mapped_file_memory(files).items()}
+
+
+@app.get("/cache")
+async def cache() -> dict:
+    return {"asset_version": asset_version, "results": result_cache.stats()}
+
+
+@app.get("/metrics")
+async def metrics() -> dict:
+    batcher = embedding_store.batcher
+    tfidf_graph = model_registry.models["keywords_tfidf"].graph
+    return {
+        "executor": model_executor.stats(),
+        "similarity_batcher": batcher.stats() if batcher is not None else None,
+        "neighbour_graphs": {
+            "embeddings": embedding_store.graph.stats() if embedding_store.graph is not None else None,
+            "tfidf": tfidf_graph.stats() if tfidf_graph is not None else None,
+        },
+    }
 
 
 @app.get("/health")
@@ -0,0 +1,82 @@
+"""
+Throughput of `POST /recommendations/batch` versus one request per profile.
+
+Scores the same random profiles with the single-profile models in a loop and with the
+blocked batch implementation, checks that both return the same courses and reports
+profiles/second. Run from `web/backend`:
+
+    python -m scripts.bench_batch --courses 10000 --dim 768 --profiles 1000
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from app.courses import CourseClient
+from app.recommend.batch import EMBEDDING_BATCH_MODELS, recommend_keywords_batch, resolve_profiles
+from app.recommend.embeddings import recommend_average, recommend_courses, recommend_max, recommend_max_with_combinations
+from app.recommend.keywords import recommend_courses_keywords
+from app.recommend.store import EmbeddingStore
+from scripts.synthetic import synthetic_embeddings, synthetic_intersects, write_catalogue
+
+SINGLE_MODELS = {
+    "embeddings_v1": recommend_courses,
+    "embeddings_max": recommend_max,
+    "average": recommend_average,
+    "max_with_combinations": recommend_max_with_combinations,
+}
+
+
+def random_profiles(codes, count: int, max_liked: int, seed: int):
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        picked = rng.sample(codes, rng.randint(1, max_liked) + 3)
+        liked = picked[:-3]
+        profiles.append((liked, picked[-3:-1][:rng.randrange(3)], picked[-1:]))
+    return profiles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--max-liked", type=int, default=8)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--block-targets", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, args.courses, text_length=64)
+        courseClient = CourseClient(f"{tmp}/courses")
+    store = EmbeddingStore(synthetic_embeddings(args.courses, args.dim), courseClient)
+    intersects = synthetic_intersects(args.courses)
+    profiles = random_profiles(courseClient.df["CODE"].tolist(), args.profiles, args.max_liked, seed=0)
+
+    print(f"{args.profiles} profiles, {args.courses} courses, dim {args.dim}")
+    print(f"{'model':>22} {'loop profiles/s':>16} {'batch profiles/s':>17} {'speedup':>8}")
+    runs = [(name, lambda l, d, s, fn=fn: fn(l, d, s, store, courseClient, args.n)) for name, fn in SINGLE_MODELS.items()]
+    runs.append(("keywords", lambda l, d, s: recommend_courses_keywords(l, d, s, courseClient, args.n, intersects)))
+    for name, single in runs:
+        start = time.perf_counter()
+        expected = [single(*profile) for profile in profiles]
+        loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if name == "keywords":
+            got = recommend_keywords_batch(resolve_profiles(profiles, courseClient.get_course_ids_by_codes), intersects, courseClient, args.n)
+        else:
+            batch_model = EMBEDDING_BATCH_MODELS[name](store, courseClient)
+            got = batch_model.recommend(resolve_profiles(profiles, store.ids_for_codes), args.n, block_targets=args.block_targets)
+        batch = time.perf_counter() - start
+
+        mismatches = sum([r.ID for r in a] != [r.ID for r in b] for a, b in zip(expected, got))
+        print(
+            f"{name:>22} {len(profiles) / loop:>16.1f} {len(profiles) / batch:>17.1f} {loop / batch:>7.1f}x"
+            + (f"  ({mismatches} profiles differ)" if mismatches else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Recall and latency benchmark of the IVF candidate index (`EMBEDDING_INDEX=ivf`).
+
+For every catalogue size, builds the index (4 * sqrt(courses) cells, 64 training
+courses per cell) and reports per model the mean latency of the exact path and of the
+IVF path for every `nprobe`, with the recall@n of the IVF results against the exact
+ones. Run from `web/backend`:
+
+    python -m scripts.bench_ivf --sizes 10000 100000 1000000 --dim 128 --nprobe 1 4 16 64
+
+A million courses at 768 dimensions need about 6 GB of memory; 128 dimensions keep the
+million-course run at about 2 GB.
+"""
+import argparse
+import math
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.ann import IVFIndex
+from app.recommend.store import EmbeddingStore
+from scripts.bench_quantized import MODELS, run
+from scripts.synthetic import synthetic_embeddings, write_minimal_catalogue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--decay", type=float, default=0.5, help="Spectral decay of the synthetic embeddings")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--liked", type=int, default=5)
+    parser.add_argument("--n", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'courses':>8} {'nprobe':>7} {'model':>22} {'ms/request':>11} {f'recall@{args.n}':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_minimal_catalogue(tmp, size)
+            courseClient = CourseClient(f"{tmp}/courses")
+            store = EmbeddingStore(synthetic_embeddings(size, args.dim, decay=args.decay), courseClient)
+
+            start = time.perf_counter()
+            cells = int(4 * math.sqrt(size))
+            index = IVFIndex.build(store.embeds, cells, sample=64 * cells)
+            print(f"{size:>8} built {cells} cells in {time.perf_counter() - start:.1f}s, {index.nbytes / 2**20:.1f} MiB")
+
+            rng = random.Random(0)
+            codes = [code for code in store.codes if code is not None]
+            profiles = [(rng.sample(codes, args.liked), rng.sample(codes, 2)) for _ in range(args.profiles)]
+
+            exact = {}
+            for name, model in MODELS.items():
+                latency, exact[name] = run(model, store, courseClient, profiles, args.n)
+                print(f"{size:>8} {'exact':>7} {name:>22} {latency:>11.2f} {1.0:>10.3f}")
+
+            store.index = index
+            for nprobe in args.nprobe:
+                index.nprobe = nprobe
+                for name, model in MODELS.items():
+                    latency, results = run(model, store, courseClient, profiles, args.n)
+                    recall = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(exact[name], results)])
+                    print(f"{size:>8} {nprobe:>7} {name:>22} {latency:>11.2f} {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
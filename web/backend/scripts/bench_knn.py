@@ -0,0 +1,82 @@
+"""
+Benchmark of the neighbour graphs (`KNN_MAX_LIKED`) for small profiles.
+
+For every graph size K and number of liked courses, reports the mean latency of
+embeddings_max and keywords_tfidf with and without the graph, the share of requests
+the graph answered without falling back to the full scan, and the share of results
+identical to the full scan (1.0, the graph is only used when it provably holds the
+top n). Run from `web/backend`:
+
+    python -m scripts.bench_knn --courses 50000 --dim 256 --k 50 200
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.embeddings import recommend_max
+from app.recommend.keywords import recommend_courses_keywords
+from app.recommend.knn import NeighbourGraph
+from app.recommend.store import EmbeddingStore
+from scripts.bench_quantized import run
+from scripts.synthetic import synthetic_embeddings, synthetic_intersects, write_minimal_catalogue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--decay", type=float, default=0.5, help="Spectral decay of the synthetic embeddings")
+    parser.add_argument("--k", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--liked", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--n", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_minimal_catalogue(tmp, args.courses)
+        courseClient = CourseClient(f"{tmp}/courses")
+        store = EmbeddingStore(synthetic_embeddings(args.courses, args.dim, decay=args.decay), courseClient)
+        intersects = synthetic_intersects(args.courses)
+        codes = [code for code in store.codes if code is not None]
+
+        print(f"{'K':>5} {'liked':>6} {'model':>15} {'full ms':>8} {'graph ms':>9} {'served':>7} {'identical':>10}")
+        for k in args.k:
+            start = time.perf_counter()
+            graphs = {
+                "embeddings_max": NeighbourGraph.from_embeddings(store.embeds, k),
+                "keywords_tfidf": NeighbourGraph.from_sparse(intersects, k),
+            }
+            nbytes = sum(graph.nbytes for graph in graphs.values())
+            print(f"{k:>5} built in {time.perf_counter() - start:.1f}s, {nbytes / 2**20:.1f} MiB")
+            models = {
+                "embeddings_max": lambda liked, disliked, skipped, store, courseClient, n, graph: recommend_max(
+                    liked, disliked, skipped, store, courseClient, n
+                ),
+                "keywords_tfidf": lambda liked, disliked, skipped, store, courseClient, n, graph: recommend_courses_keywords(
+                    liked, disliked, skipped, courseClient, n, intersects, graph
+                ),
+            }
+
+            rng = random.Random(0)
+            for liked in args.liked:
+                profiles = [(rng.sample(codes, liked), rng.sample(codes, rng.randrange(3))) for _ in range(args.profiles)]
+                for name, model in models.items():
+                    graph = graphs[name]
+                    graph.max_liked = liked
+                    store.graph = None
+                    full_latency, exact = run(lambda *a: model(*a, None), store, courseClient, profiles, args.n)
+                    store.graph = graph
+                    before = graph.stats()["served"]
+                    graph_latency, results = run(lambda *a: model(*a, graph), store, courseClient, profiles, args.n)
+                    served = (graph.stats()["served"] - before) / len(profiles)
+                    identical = np.mean([a == b for a, b in zip(exact, results)])
+                    print(f"{k:>5} {liked:>6} {name:>15} {full_latency:>8.2f} {graph_latency:>9.2f} {served:>7.2f} {identical:>10.3f}")
+            store.graph = None
+
+
+if __name__ == "__main__":
+    main()
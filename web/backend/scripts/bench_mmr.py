@@ -0,0 +1,41 @@
+"""
+Latency of the MMR reranker (`app.recommend.mmr`) per candidate pool size, number of
+selections and diversity mode, on random normalized vectors. Run from `web/backend`:
+
+    python -m scripts.bench_mmr --candidates 100 500 2000 --n 10 50 --dim 768
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.recommend.mmr import MMRReranker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--n", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--liked", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'candidates':>11} {'n':>4} {'diversity':>10} {'ms':>8}")
+    for candidates in args.candidates:
+        vectors = rng.standard_normal((candidates, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        liked = vectors[rng.choice(candidates, args.liked, replace=False)]
+        relevance = np.sort(rng.random(candidates).astype(np.float32))[::-1]
+        for n in args.n:
+            for diversity in ("liked", "selected", "both"):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    MMRReranker(vectors, relevance).select(n, 0.7, liked, diversity)
+                latency = (time.perf_counter() - start) / args.repeat * 1000
+                print(f"{candidates:>11} {n:>4} {diversity:>10} {latency:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the algebraic pair scoring of max_with_combinations (`PairScorer`).
+
+For every number of liked courses L, compares the mean latency of scoring the
+L(L+1)/2 materialized pair targets with the algebraic scoring from the L liked columns
+(exact, only for the courses that can reach the top n, and with the approximate top-liked
+pruning of `COMBINATIONS_PRUNE_LIKED`), and reports the share of profiles whose ranking and
+RECOMMENDED_FROM explanations are identical to the materialized targets. Run from
+`web/backend`:
+
+    python -m scripts.bench_pairs --courses 20000 --dim 768 --liked 1 5 10 20 50 100 --prune 8 16
+"""
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.embeddings import pair_targets, recommend_max_with_combinations, select_max_with_combinations
+from app.recommend.store import EmbeddingStore
+from app.recommend.topk import exclusion_mask
+from scripts.synthetic import synthetic_embeddings, write_minimal_catalogue
+
+
+def materialized(liked_codes, disliked_codes, store: EmbeddingStore, courseClient: CourseClient, n: int):
+    """max_with_combinations with explicit pair targets, as it was implemented before `PairScorer`."""
+    liked = store.ids_for_codes(liked_codes)
+    disliked = store.ids_for_codes(disliked_codes)
+    excluded = exclusion_mask(len(store), store.ids_for_codes(liked_codes + disliked_codes)) | courseClient.ineligible_mask(len(store))
+    targets, pairs = pair_targets(store.vectors(liked))
+    similarity = store.similarity(np.vstack([targets, store.embeds[liked + disliked]]))
+    similarity_target = similarity[:, :len(pairs)]
+    return select_max_with_combinations(
+        np.max(similarity_target, axis=1), np.argmax(similarity_target, axis=1), pairs,
+        similarity[:, len(pairs):len(pairs) + len(liked)],
+        similarity[:, len(pairs) + len(liked):] if disliked else None,
+        liked, excluded, store, n, verbose=False,
+    )
+
+
+def timed(model, profiles):
+    results = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for liked, disliked in profiles:
+            results.append([(r.ID, r.RECOMMENDED_FROM) for r in model(liked, disliked)])
+    return (time.perf_counter() - start) / len(profiles) * 1000, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--decay", type=float, default=0.5, help="Spectral decay of the synthetic embeddings")
+    parser.add_argument("--liked", type=int, nargs="+", default=[1, 2, 5, 10, 20, 30, 50, 75, 100])
+    parser.add_argument("--prune", type=int, nargs="+", default=[8, 16])
+    parser.add_argument("--profiles", type=int, default=5)
+    parser.add_argument("--n", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_minimal_catalogue(tmp, args.courses)
+        courseClient = CourseClient(f"{tmp}/courses")
+        store = EmbeddingStore(synthetic_embeddings(args.courses, args.dim, decay=args.decay), courseClient)
+        codes = [code for code in store.codes if code is not None]
+        rng = random.Random(0)
+
+        print(f"{'liked':>6} {'pairs':>6} {'scoring':>13} {'ms/request':>11} {'identical':>10}")
+        for liked in args.liked:
+            profiles = [(rng.sample(codes, liked), rng.sample(codes, rng.randrange(3))) for _ in range(args.profiles)]
+            pairs = liked * (liked + 1) // 2
+            latency, reference = timed(lambda l, d: materialized(l, d, store, courseClient, args.n), profiles)
+            print(f"{liked:>6} {pairs:>6} {'materialized':>13} {latency:>11.2f} {1.0:>10.3f}")
+            for prune in [0] + [prune for prune in args.prune if prune < liked]:
+                latency, results = timed(
+                    lambda l, d: recommend_max_with_combinations(l, d, [], store, courseClient, args.n, prune_liked=prune), profiles,
+                )
+                identical = np.mean([a == b for a, b in zip(reference, results)])
+                name = "algebraic" if not prune else f"pruned top {prune}"
+                print(f"{liked:>6} {pairs:>6} {name:>13} {latency:>11.2f} {identical:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
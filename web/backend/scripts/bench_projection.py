@@ -0,0 +1,73 @@
+"""
+Recall and latency report of the PCA two-stage retrieval (`EMBEDDING_PROJECTION=pca`).
+
+Fits the projection once at the largest dimension, then for every projection dimension
+and candidate set size (`EMBEDDING_RESCORE_SIZE`) reports the mean latency of each
+two-stage model and its recall@n, the share of the exact float32 top n it returns.
+Recall depends on how much of the variance the leading components hold: isotropic
+synthetic clusters (`--decay 0`) are the worst case. Run from `web/backend`, on
+synthetic or real embeddings:
+
+    python -m scripts.bench_projection --courses 50000 --dim 768 --dims 32 64 128 --candidates 200 400 1000
+    python -m scripts.bench_projection --embeddings assets/embeddings_tomas_03.npy
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.projection import ProjectedMatrix, fit_projection
+from app.recommend.store import EmbeddingStore
+from scripts.bench_quantized import MODELS, run
+from scripts.synthetic import synthetic_embeddings, write_catalogue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help="A .npy embedding asset, synthetic embeddings when omitted")
+    parser.add_argument("--courses", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--decay", type=float, default=0.5, help="Spectral decay of the synthetic embeddings, 0 is isotropic")
+    parser.add_argument("--dims", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[200, 400, 1000])
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--liked", type=int, default=5)
+    parser.add_argument("--n", type=int, default=20)
+    args = parser.parse_args()
+
+    embeds = np.load(args.embeddings, mmap_mode="r") if args.embeddings else synthetic_embeddings(args.courses, args.dim, decay=args.decay)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, len(embeds), text_length=10)
+        courseClient = CourseClient(f"{tmp}/courses")
+        store = EmbeddingStore(embeds, courseClient)
+
+        start = time.perf_counter()
+        components, mean = fit_projection(store.embeds, max(args.dims))
+        print(f"Fitted {max(args.dims)} components on {store.embeds.shape} in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(0)
+        codes = [code for code in store.codes if code is not None]
+        profiles = [(rng.sample(codes, args.liked), rng.sample(codes, 2)) for _ in range(args.profiles)]
+
+        exact = {}
+        print(f"{'dim':>5} {'candidates':>11} {'matrix MiB':>11} {'model':>22} {'ms/request':>11} {f'recall@{args.n}':>10}")
+        for name, model in MODELS.items():
+            latency, exact[name] = run(model, store, courseClient, profiles, args.n)
+            print(f"{store.dim:>5} {'all':>11} {store.embeds.nbytes / 2**20:>11.1f} {name:>22} {latency:>11.2f} {1.0:>10.3f}")
+
+        for dim in args.dims:
+            store.first_pass = ProjectedMatrix(store.embeds, components[:dim], mean)
+            for candidates in args.candidates:
+                store.rescore_size = candidates
+                for name, model in MODELS.items():
+                    latency, results = run(model, store, courseClient, profiles, args.n)
+                    recall = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(exact[name], results)])
+                    print(f"{dim:>5} {candidates:>11} {store.first_pass.nbytes / 2**20:>11.1f} {name:>22} {latency:>11.2f} {recall:>10.3f}")
+            store.first_pass = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark of the quantized embedding modes (`EMBEDDING_QUANTIZATION`).
+
+For float32 (exact), float16 and int8 first passes with several rescoring shortlist
+sizes, reports the memory of the matrix scanned per request, the mean latency of the
+models that use the two-stage scoring and the overlap of their top n with the float32
+results. Run from `web/backend`:
+
+    python -m scripts.bench_quantized --courses 50000 --dim 768 --rescore 100 400
+"""
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.embeddings import recommend_max, recommend_max_with_combinations, recommend_mmr_cos
+from app.recommend.quantized import QUANTIZATIONS
+from app.recommend.store import EmbeddingStore
+from scripts.synthetic import synthetic_embeddings, write_catalogue
+
+MODELS = {
+    "embeddings_max": recommend_max,
+    "embeddings_mmr": recommend_mmr_cos,
+    "max_with_combinations": recommend_max_with_combinations,
+}
+
+
+def run(model, store, courseClient, profiles, n: int):
+    results = []
+    start = time.perf_counter()
+    # The models print how many courses they filtered out
+    with contextlib.redirect_stdout(io.StringIO()):
+        for liked, disliked in profiles:
+            results.append([r.ID for r in model(liked, disliked, [], store, courseClient, n)])
+    return (time.perf_counter() - start) / len(profiles) * 1000, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--liked", type=int, default=5)
+    parser.add_argument("--n", type=int, default=20)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[100, 400])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, args.courses, text_length=10)
+        courseClient = CourseClient(f"{tmp}/courses")
+        store = EmbeddingStore(synthetic_embeddings(args.courses, args.dim), courseClient)
+
+        rng = random.Random(0)
+        codes = [code for code in store.codes if code is not None]
+        profiles = [(rng.sample(codes, args.liked), rng.sample(codes, 2)) for _ in range(args.profiles)]
+
+        baseline = {}
+        print(f"{'mode':>8} {'rescore':>8} {'matrix MiB':>11} {'model':>22} {'ms/request':>11} {'top-n overlap':>14} {'same order':>11}")
+        for name, model in MODELS.items():
+            latency, baseline[name] = run(model, store, courseClient, profiles, args.n)
+            print(f"{'float32':>8} {'-':>8} {store.embeds.nbytes / 2**20:>11.1f} {name:>22} {latency:>11.2f} {1.0:>14.3f} {1.0:>11.3f}")
+
+        for mode, matrix_class in QUANTIZATIONS.items():
+            store.first_pass = matrix_class(store.embeds)
+            for rescore in args.rescore:
+                store.rescore_size = rescore
+                for name, model in MODELS.items():
+                    latency, results = run(model, store, courseClient, profiles, args.n)
+                    overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(baseline[name], results)])
+                    same = np.mean([a == b for a, b in zip(baseline[name], results)])
+                    print(f"{mode:>8} {rescore:>8} {store.first_pass.nbytes / 2**20:>11.1f} {name:>22} {latency:>11.2f} {overlap:>14.3f} {same:>11.3f}")
+            store.first_pass = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of response encoding: hydrated dataclasses validated by FastAPI versus
+pre-encoded course JSON fragments. Run from `web/backend`:
+
+    python -m scripts.bench_response_encoding --courses 5000
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.course_json import CourseJSONCache
+from app.courses import CourseClient
+from app.types import Recommendation, RecommendationResponse
+from scripts.synthetic import write_catalogue
+
+
+async def encode_dataclasses(courseClient: CourseClient, field, recommended) -> bytes:
+    """The previous path: hydrate CourseWithId objects, validate and encode them with FastAPI."""
+    courses = courseClient.get_courses_by_ids([r.ID for r in recommended])
+    for r, course in zip(recommended, courses):
+        course.SIMILARITY = r.SIMILARITY
+        course.RECOMMENDED_FROM = r.RECOMMENDED_FROM
+    content = await serialize_response(field=field, response_content=RecommendationResponse(recommended_courses=courses))
+    return JSONResponse(content).body
+
+
+def measure(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, args.courses)
+        courseClient = CourseClient(f"{tmp}/courses")
+
+        start = time.perf_counter()
+        cache = CourseJSONCache(courseClient)
+        print(f"Encoded {args.courses} courses in {time.perf_counter() - start:.2f}s, {cache.memory_usage()}")
+
+        field = create_model_field(name="Response", type_=RecommendationResponse, mode="serialization")
+        rng = random.Random(0)
+        print(f"{'n':>5} {'dataclass+validate':>20} {'cached full':>12} {'cached summary':>15} {'speedup':>8}")
+        for n in args.n:
+            recommended = [
+                Recommendation(ID=i, CODE=f"SYN{i:06d}", SIMILARITY=rng.random(), RECOMMENDED_FROM=["SYN000001"])
+                for i in rng.sample(range(args.courses), n)
+            ]
+            assert await encode_dataclasses(courseClient, field, recommended) == cache.encode_recommendations(recommended, summary=False)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                await encode_dataclasses(courseClient, field, recommended)
+            baseline = (time.perf_counter() - start) / args.repeat * 1000
+            full = measure(lambda: cache.encode_recommendations(recommended, summary=False), args.repeat)
+            summary = measure(lambda: cache.encode_recommendations(recommended, summary=True), args.repeat)
+            print(f"{n:>5} {baseline:>18.3f}ms {full:>10.3f}ms {summary:>13.3f}ms {baseline / full:>7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--n", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
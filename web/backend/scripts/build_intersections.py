@@ -0,0 +1,255 @@
+"""
+Builds a keyword intersection asset: the number of keywords every pair of courses shares,
+as the sparse course x course CSR matrix read by `load_gemini_intersects` and
+`load_tfidf_intersects` (row and column = course ID). Run from `web/backend`:
+
+    # intersects_sparse.npz from the stemmed KEYWORDS of the catalogue
+    python -m scripts.build_intersections assets
+    # intersects_tfidf.npz from the top TF-IDF terms of every course, {code: [{"term": ...}, ...]}
+    python -m scripts.build_intersections assets --keywords course_top_keywords.json --no-stem --output intersects_tfidf.npz
+
+Keywords are normalized (lowercased, Porter-stemmed unless `--no-stem`) once per distinct
+keyword and interned to columns of a binary course x keyword incidence matrix X, so the
+intersections are X·Xᵀ, computed in blocks of rows by a pool of processes. `--top-k` keeps
+only the largest intersections of every row (the diagonal, a course's own keyword count,
+is the largest), which bounds the asset size; the pruned matrix is no longer symmetric.
+The counts keep the dtype of the asset being replaced (float64 for intersects_sparse.npz,
+uint8 for intersects_tfidf.npz) unless `--dtype` is given.
+"""
+import argparse
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+DTYPES = ("uint8", "uint16", "int32", "float32", "float64")
+# Dtypes of the shipped assets, used when there is no asset to take the dtype from
+ASSET_DTYPES = {"intersects_sparse.npz": "float64", "intersects_tfidf.npz": "uint8"}
+
+# Incidence matrix and its transpose of a pool worker, set once by `_init_worker`
+_incidence: Optional[sp.csr_matrix] = None
+_transposed: Optional[sp.csr_matrix] = None
+
+
+def keyword_normalizer(stem: bool) -> Callable[[str], str]:
+    """
+    Lowercases keywords and, like `stem_keywords` of the notebooks, Porter-stems them.
+    """
+    if not stem:
+        return lambda keyword: keyword.strip().lower()
+    try:
+        from nltk.stem import PorterStemmer
+    except ImportError:
+        raise SystemExit("Stemming needs nltk (pip install nltk), or pass --no-stem")
+    stemmer = PorterStemmer()
+    return lambda keyword: stemmer.stem(keyword.strip().lower())
+
+
+def catalogue_keywords(assets: str) -> Tuple[int, List[Tuple[int, Iterable[str]]]]:
+    """
+    The KEYWORDS of every course of the catalogue.
+
+    :return: The number of course IDs and the (course ID, keywords) of every catalogue row.
+    """
+    df = pd.read_parquet(os.path.join(assets, "courses", "courses.parquet"), engine="pyarrow", columns=["ID", "KEYWORDS"])
+    ids = df["ID"].to_numpy().astype(np.int64)
+    keywords = [list(value) if value is not None else [] for value in df["KEYWORDS"]]
+    return course_count(assets, ids), list(zip(ids.tolist(), keywords))
+
+
+def json_keywords(assets: str, path: str) -> Tuple[int, List[Tuple[int, Iterable[str]]]]:
+    """
+    Keywords of a JSON file keyed by course code, as written by the TF-IDF notebook: lists of
+    {"term": ..., "score": ...} or plain strings. Codes with a suffix ("CODE xyz") fall back to
+    the bare code, courses missing from the file get no keywords.
+
+    :return: The number of course IDs and the (course ID, keywords) of every catalogue row.
+    """
+    with open(path, encoding="utf-8") as f:
+        by_code = json.load(f)
+    df = pd.read_parquet(os.path.join(assets, "courses", "courses.parquet"), engine="pyarrow", columns=["ID", "CODE"])
+    ids = df["ID"].to_numpy().astype(np.int64)
+    rows = []
+    for course_id, code in zip(ids.tolist(), df["CODE"]):
+        terms = by_code.get(code)
+        if terms is None and code:
+            terms = by_code.get(code.split(" ")[0])
+        rows.append((course_id, [term["term"] if isinstance(term, dict) else term for term in terms or []]))
+    return course_count(assets, ids), rows
+
+
+def course_count(assets: str, ids: np.ndarray) -> int:
+    """Rows of the assets: one past the largest course ID of the catalogue and the ID lookup."""
+    lookup = pd.read_parquet(os.path.join(assets, "courses", "id_lookup.parquet"), engine="pyarrow", columns=["ID"])
+    return int(max(ids.max(initial=-1), lookup["ID"].max() if len(lookup) else -1)) + 1
+
+
+def incidence_matrix(courses: int, keywords: Iterable[Tuple[int, Iterable[str]]], normalize: Callable[[str], str]) -> Tuple[sp.csr_matrix, List[str]]:
+    """
+    Binary course x keyword matrix: 1 where a course has a keyword after normalization.
+
+    Every distinct raw keyword is normalized once. Repeated keywords of a course, and catalogue
+    rows sharing an ID, are merged like the keyword sets of the notebooks.
+
+    :param courses: Number of rows (course IDs).
+    :param keywords: (course ID, keywords) pairs.
+    :param normalize: Maps a raw keyword to its term, see `keyword_normalizer`.
+    :return: The matrix and the term of every column.
+    """
+    vocabulary: Dict[str, int] = {}
+    interned: Dict[str, int] = {}
+    rows: List[int] = []
+    columns: List[int] = []
+    for course_id, course_keywords in keywords:
+        for keyword in course_keywords:
+            column = interned.get(keyword)
+            if column is None:
+                column = interned[keyword] = vocabulary.setdefault(normalize(keyword), len(vocabulary))
+            rows.append(course_id)
+            columns.append(column)
+    matrix = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+        shape=(courses, len(vocabulary)),
+    )
+    matrix.data[:] = 1
+    return matrix, list(vocabulary)
+
+
+def top_k_rows(matrix: sp.csr_matrix, k: int) -> sp.csr_matrix:
+    """
+    Keeps the k largest entries of every row, the lower column first on ties.
+    """
+    matrix.sort_indices()
+    counts = np.diff(matrix.indptr)
+    if counts.max(initial=0) <= k:
+        return matrix
+    rows = np.repeat(np.arange(matrix.shape[0]), counts)
+    if np.issubdtype(matrix.dtype, np.integer) and matrix.data.min() >= 0 and matrix.shape[0] * (int(matrix.data.max()) + 1) <= 2**26:
+        keep = _top_k_counts(matrix, rows, k)
+    else:
+        # By row, then by decreasing value, then by column
+        order = np.lexsort((matrix.indices, -matrix.data.astype(np.float64), rows))
+        rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+        keep = np.zeros(matrix.nnz, dtype=bool)
+        keep[order[rank < k]] = True
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[keep], minlength=matrix.shape[0]))])
+    return sp.csr_matrix((matrix.data[keep], matrix.indices[keep], indptr), shape=matrix.shape)
+
+
+def _top_k_counts(matrix: sp.csr_matrix, rows: np.ndarray, k: int) -> np.ndarray:
+    """
+    `top_k_rows` of small non-negative counts in linear time: a per-row histogram of the values
+    gives the k-th largest value of every row, entries above it are kept and entries equal to it
+    in column order until the row holds k.
+    """
+    values = matrix.data.astype(np.int64)
+    levels = int(values.max()) + 1
+    everything = np.arange(matrix.shape[0])
+    # Entries of every row per value, the largest value first
+    histogram = np.bincount(rows * levels + (levels - 1 - values), minlength=matrix.shape[0] * levels).reshape(-1, levels)
+    at_least = np.cumsum(histogram, axis=1)
+    position = np.argmax(at_least >= k, axis=1)
+    threshold = levels - 1 - position
+    quota = k - (at_least[everything, position] - histogram[everything, position])
+    equal = values == threshold[rows]
+    equal_before = np.concatenate([[0], np.cumsum(equal)])
+    rank = equal_before[:-1] - equal_before[matrix.indptr[:-1]][rows]
+    keep = (values > threshold[rows]) | (equal & (rank < quota[rows]))
+    # Rows with at most k entries never reach k above
+    return keep | (np.diff(matrix.indptr) <= k)[rows]
+
+
+def _init_worker(incidence: sp.csr_matrix) -> None:
+    global _incidence, _transposed
+    _incidence = incidence
+    _transposed = incidence.T.tocsr()
+
+
+def _intersect_rows(start: int, end: int, top_k: int, dtype: str) -> sp.csr_matrix:
+    block = (_incidence[start:end] @ _transposed).tocsr()
+    block.eliminate_zeros()
+    if top_k:
+        block = top_k_rows(block, top_k)
+    if np.issubdtype(np.dtype(dtype), np.integer) and block.nnz and block.data.max() > np.iinfo(dtype).max:
+        raise ValueError(f"Rows {start}-{end} share up to {block.data.max()} keywords, more than {dtype} holds")
+    return block.astype(dtype)
+
+
+def intersections(incidence: sp.csr_matrix, workers: int = 1, block_rows: int = 2048, top_k: int = 0, dtype: str = "uint8") -> sp.csr_matrix:
+    """
+    The course x course keyword intersection counts X·Xᵀ, in blocks of `block_rows` rows.
+
+    :param incidence: Binary course x keyword matrix from `incidence_matrix`.
+    :param workers: Processes computing the blocks, 1 computes them in this process.
+    :param top_k: Keep only the largest k intersections of every row, 0 keeps all.
+    :param dtype: Type of the stored counts.
+    """
+    starts = list(range(0, incidence.shape[0], block_rows))
+    ends = [min(start + block_rows, incidence.shape[0]) for start in starts]
+    if workers <= 1 or len(starts) <= 1:
+        _init_worker(incidence)
+        blocks = [_intersect_rows(start, end, top_k, dtype) for start, end in zip(starts, ends)]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(incidence,)) as pool:
+            blocks = list(pool.map(_intersect_rows, starts, ends, repeat(top_k), repeat(dtype)))
+    if not blocks:
+        return sp.csr_matrix((0, 0), dtype=dtype)
+    return sp.vstack(blocks, format="csr")
+
+
+def asset_dtype(path: str) -> str:
+    """
+    Dtype to store an asset in: the dtype of the existing file, read from the header of its
+    data array, else the dtype of the shipped asset of that name, else uint8.
+    """
+    if os.path.exists(path):
+        with zipfile.ZipFile(path) as archive, archive.open("data.npy") as f:
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            return read_header(f)[2].name
+    return ASSET_DTYPES.get(os.path.basename(path), "uint8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets")
+    parser.add_argument("--keywords", help="JSON keywords by course code instead of the catalogue KEYWORDS")
+    parser.add_argument("--stem", action=argparse.BooleanOptionalAction, default=True, help="Porter-stem the keywords (needs nltk)")
+    parser.add_argument("--output", default="intersects_sparse.npz", help="Asset file name")
+    parser.add_argument("--top-k", type=int, default=0, help="Intersections kept per course, 0 keeps all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-rows", type=int, default=2048)
+    parser.add_argument("--dtype", choices=DTYPES, help="Type of the stored counts, by default the type of the existing asset")
+    args = parser.parse_args()
+    path = os.path.join(args.assets, args.output)
+    dtype = args.dtype or asset_dtype(path)
+
+    start = time.perf_counter()
+    courses, keywords = json_keywords(args.assets, args.keywords) if args.keywords else catalogue_keywords(args.assets)
+    print(f"read keywords of {len(keywords)} catalogue rows ({courses} course IDs) in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    incidence, terms = incidence_matrix(courses, keywords, keyword_normalizer(args.stem))
+    print(f"incidence: {courses} courses x {len(terms)} terms, {incidence.nnz} entries in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    matrix = intersections(incidence, args.workers, args.block_rows, args.top_k, dtype)
+    print(
+        f"intersections: {matrix.nnz} {dtype} nonzeros ({matrix.nnz / max(courses, 1):.0f} per course) "
+        f"in {time.perf_counter() - start:.1f}s with {args.workers} workers"
+    )
+
+    start = time.perf_counter()
+    sp.save_npz(path, matrix)
+    print(f"saved {path} ({os.path.getsize(path) / 2**20:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Builds the IVF index used by `EMBEDDING_INDEX=ivf` and stores it as `embeddings_ivf.npz`
+next to the embeddings. Rerun whenever the embeddings change. Run from `web/backend`:
+
+    python -m scripts.build_ivf assets --cells 256
+
+`scripts.bench_ivf` reports recall and latency per number of probed cells.
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from app.recommend.ann import IVF_ASSET, IVFIndex
+from app.recommend.store import EmbeddingStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets")
+    parser.add_argument("--cells", type=int, help="Number of cells, 4 * sqrt(courses) by default")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--sample", type=int, help="Courses the quantizer is trained on, 64 per cell by default")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    embeds, _ = EmbeddingStore.prepare(np.load(os.path.join(args.assets, "embeddings_tomas_03.npy"), mmap_mode="r"))
+    cells = args.cells or max(1, int(4 * math.sqrt(len(embeds))))
+    index = IVFIndex.build(embeds, cells, args.iterations, sample=args.sample or 64 * cells)
+    index.save(os.path.join(args.assets, IVF_ASSET))
+    sizes = np.diff(index.offsets)
+    print(
+        f"Built {index.cells} cells over {len(embeds)} courses in {time.perf_counter() - start:.1f}s, "
+        f"cell sizes median {int(np.median(sizes))}, max {sizes.max()}"
+    )
+
+
+if __name__ == "__main__":
+    main()
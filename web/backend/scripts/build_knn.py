@@ -0,0 +1,50 @@
+"""
+Builds the neighbour graphs used by `KNN_MAX_LIKED` and `/course/{course_id}/similar`:
+the top K most similar courses of every course by embedding cosine (`knn_embeddings.npz`)
+and by TF-IDF keyword intersection (`knn_tfidf.npz`), stored next to the assets. Rerun
+whenever the embeddings or the intersections change. Run from `web/backend`:
+
+    python -m scripts.build_knn assets --k 100
+
+A larger K lets more profiles be served from the graph before the models fall back to
+scanning all courses; the graphs take 8 bytes per course and neighbour.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.recommend.knn import KNN_EMBEDDINGS_ASSET, KNN_TFIDF_ASSET, NeighbourGraph
+from app.recommend.store import EmbeddingStore
+
+
+def report(name: str, graph: NeighbourGraph, start: float) -> None:
+    listed = np.count_nonzero(graph.neighbours >= 0, axis=1)
+    print(
+        f"{name}: {len(graph.neighbours)} courses x {graph.k} neighbours in {time.perf_counter() - start:.1f}s, "
+        f"{graph.nbytes / 2**20:.1f} MiB, full lists {np.mean(listed == graph.k):.1%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets")
+    parser.add_argument("--k", type=int, default=100, help="Neighbours per course")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    embeds, _ = EmbeddingStore.prepare(np.load(os.path.join(args.assets, "embeddings_tomas_03.npy"), mmap_mode="r"))
+    graph = NeighbourGraph.from_embeddings(embeds, args.k)
+    graph.save(os.path.join(args.assets, KNN_EMBEDDINGS_ASSET))
+    report("embeddings", graph, start)
+
+    start = time.perf_counter()
+    graph = NeighbourGraph.from_sparse(sp.load_npz(os.path.join(args.assets, "intersects_tfidf.npz")).tocsr(), args.k)
+    graph.save(os.path.join(args.assets, KNN_TFIDF_ASSET))
+    report("tfidf", graph, start)
+
+
+if __name__ == "__main__":
+    main()
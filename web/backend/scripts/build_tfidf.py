@@ -0,0 +1,224 @@
+"""
+Builds the assets of the keywords_tfidf model, replacing `notebooks/tf_idf.ipynb`:
+
+- `intersects_tfidf.npz`: the number of top TF-IDF terms every pair of courses shares (uint8 CSR,
+  row and column = course ID, the diagonal is a course's own number of top terms);
+- `course_indices_tfidf.pkl`: {course ID: code};
+- `course_top_keywords.json`: {code: [{"term": ..., "score": ...}]}, the top terms by decreasing score;
+- `tfidf_manifest.json`: pipeline version, parameters, digests of the catalogue and of the outputs.
+
+Run from `web/backend` (needs scikit-learn, like the notebook):
+
+    python -m scripts.build_tfidf assets --top-terms 15 --workers 4
+
+Stages:
+1. corpus: the documents are streamed from `courses/courses.parquet` in record batches, one per
+   catalogue row: the text of every field and the keywords once more (the notebook JSON-encoded
+   every course into a list first; field names, which every document shared, are left out);
+2. vectorize: `TfidfVectorizer` with the notebook's parameters, fitted in one pass;
+3. top terms: the `--top-terms` largest scores of every row, taken on the CSR matrix at once;
+4. intersections: X·Xᵀ of the binary course x top-term matrix, in row blocks across processes.
+
+The outputs only depend on the catalogue and the parameters; the manifest digests the array
+contents (the .npz archives carry file timestamps), so two runs can be compared by their manifests.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+
+from scripts.build_intersections import intersections, top_k_rows
+
+# Bumped whenever a change of the pipeline changes its outputs
+PIPELINE_VERSION = 1
+INTERSECTS_ASSET = "intersects_tfidf.npz"
+INDICES_ASSET = "course_indices_tfidf.pkl"
+KEYWORDS_FILE = "course_top_keywords.json"
+MANIFEST_FILE = "tfidf_manifest.json"
+
+
+def field_text(value: Any) -> Iterator[str]:
+    """The strings of a catalogue field, nested lists and structs included."""
+    if value is None:
+        return
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from field_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from field_text(item)
+    else:
+        yield str(value)
+
+
+class Corpus:
+    """
+    The documents of the catalogue rows, streamed from the parquet file; the course IDs and codes
+    are collected while the documents are read.
+    """
+
+    def __init__(self, courses_path: str, batch_size: int = 1024) -> None:
+        self.courses_path = courses_path
+        self.batch_size = batch_size
+        self.ids: List[int] = []
+        self.codes: List[str] = []
+
+    def __iter__(self) -> Iterator[str]:
+        self.ids, self.codes = [], []
+        parquet = pq.ParquetFile(self.courses_path)
+        for batch in parquet.iter_batches(batch_size=self.batch_size):
+            for course in batch.to_pylist():
+                self.ids.append(int(course.pop("ID")))
+                self.codes.append(course["CODE"])
+                # Keywords once more, like the notebook appended them to the JSON document
+                yield " ".join([*field_text(course), *field_text(course.get("KEYWORDS"))])
+
+
+def vectorize(corpus: Corpus, max_features: int) -> Tuple[sp.csr_matrix, np.ndarray]:
+    """
+    TF-IDF of every catalogue row with the notebook's `TfidfVectorizer` parameters.
+
+    :return: The (rows x terms) float32 matrix and the terms.
+    """
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+    except ImportError:
+        raise SystemExit("The TF-IDF pipeline needs scikit-learn (pip install scikit-learn)")
+    vectorizer = TfidfVectorizer(
+        max_features=max_features,
+        stop_words="english",
+        lowercase=True,
+        norm="l2",
+        use_idf=True,
+        smooth_idf=True,
+        sublinear_tf=True,
+        dtype=np.float32,
+    )
+    matrix = vectorizer.fit_transform(corpus).tocsr()
+    return matrix, vectorizer.get_feature_names_out()
+
+
+def top_terms(matrix: sp.csr_matrix, k: int) -> sp.csr_matrix:
+    """
+    The k largest scores of every row, the term first in vocabulary order on ties.
+    """
+    matrix = matrix.copy()
+    matrix.eliminate_zeros()
+    return top_k_rows(matrix, k)
+
+
+def course_incidence(terms: sp.csr_matrix, ids: np.ndarray, courses: int) -> sp.csr_matrix:
+    """
+    Binary course x term matrix of the top terms, rows moved from catalogue rows to course IDs;
+    catalogue rows sharing an ID merge their terms.
+    """
+    coo = terms.tocoo()
+    incidence = sp.csr_matrix(
+        (np.ones(coo.nnz, dtype=np.int32), (ids[coo.row], coo.col)), shape=(courses, terms.shape[1])
+    )
+    incidence.data[:] = 1
+    return incidence
+
+
+def top_keywords(terms: sp.csr_matrix, features: np.ndarray, codes: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {code: [{"term": ..., "score": ...}]} by decreasing score, the first catalogue row of a code wins.
+    """
+    rows = np.repeat(np.arange(terms.shape[0]), np.diff(terms.indptr))
+    order = np.lexsort((terms.indices, -terms.data, rows))
+    keywords: Dict[str, List[Dict[str, Any]]] = {}
+    for row, start, end in zip(range(terms.shape[0]), terms.indptr[:-1], terms.indptr[1:]):
+        if codes[row] in keywords:
+            continue
+        keywords[codes[row]] = [
+            {"term": str(features[terms.indices[i]]), "score": round(float(terms.data[i]), 6)} for i in order[start:end]
+        ]
+    return keywords
+
+
+def digest(*arrays: np.ndarray) -> str:
+    sha = hashlib.sha256()
+    for array in arrays:
+        sha.update(str(array.dtype).encode())
+        sha.update(np.ascontiguousarray(array).tobytes())
+    return sha.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets")
+    parser.add_argument("--output", help="Output directory, the assets directory by default")
+    parser.add_argument("--max-features", type=int, default=5000)
+    parser.add_argument("--top-terms", type=int, default=15, help="Terms per course")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-rows", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=1024, help="Catalogue rows read at a time")
+    args = parser.parse_args()
+    output = args.output or args.assets
+    os.makedirs(output, exist_ok=True)
+    courses_path = os.path.join(args.assets, "courses", "courses.parquet")
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    corpus = Corpus(courses_path, args.batch_size)
+    matrix, features = vectorize(corpus, args.max_features)
+    ids = np.array(corpus.ids, dtype=np.int64)
+    lookup = pq.read_table(os.path.join(args.assets, "courses", "id_lookup.parquet"), columns=["ID"]).column("ID").to_numpy()
+    courses = int(max(ids.max(initial=-1), lookup.max(initial=-1))) + 1
+    timings["corpus and vectorize"] = time.perf_counter() - start
+    print(f"vectorized {matrix.shape[0]} catalogue rows into {matrix.shape[1]} terms, {matrix.nnz} entries")
+
+    start = time.perf_counter()
+    terms = top_terms(matrix, args.top_terms)
+    timings["top terms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    intersects = intersections(course_incidence(terms, ids, courses), args.workers, args.block_rows, dtype="uint8")
+    timings["intersections"] = time.perf_counter() - start
+    print(f"intersections of {courses} course IDs: {intersects.nnz} nonzeros")
+
+    start = time.perf_counter()
+    sp.save_npz(os.path.join(output, INTERSECTS_ASSET), intersects)
+    indices = {}
+    for course_id, code in zip(corpus.ids, corpus.codes):
+        indices.setdefault(course_id, code)
+    with open(os.path.join(output, INDICES_ASSET), "wb") as f:
+        pickle.dump(dict(sorted(indices.items())), f, protocol=4)
+    with open(os.path.join(output, KEYWORDS_FILE), "w", encoding="utf-8") as f:
+        json.dump(top_keywords(terms, features, corpus.codes), f, indent=2, ensure_ascii=False)
+    manifest = {
+        "version": PIPELINE_VERSION,
+        "catalogue": file_digest(courses_path),
+        "parameters": {"max_features": args.max_features, "top_terms": args.top_terms},
+        "courses": courses,
+        "outputs": {
+            INTERSECTS_ASSET: digest(intersects.indptr, intersects.indices, intersects.data),
+            INDICES_ASSET: file_digest(os.path.join(output, INDICES_ASSET)),
+            KEYWORDS_FILE: file_digest(os.path.join(output, KEYWORDS_FILE)),
+        },
+    }
+    with open(os.path.join(output, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    timings["write"] = time.perf_counter() - start
+
+    for stage, seconds in timings.items():
+        print(f"{stage:>22}: {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
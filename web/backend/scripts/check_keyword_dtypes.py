@@ -0,0 +1,83 @@
+"""
+Regression check of the keyword models on unsigned intersection assets.
+
+`intersects_tfidf.npz` stores uint8 counts (see `scripts.build_tfidf`), `intersects_sparse.npz`
+float64. Negating or accumulating unsigned counts wraps around, so the keyword paths must return
+the same courses and RECOMMENDED_FROM for the uint8 and the float64 copy of the same matrix.
+Run from `web/backend`:
+
+    python -m scripts.check_keyword_dtypes --courses 2000 --profiles 200
+"""
+import argparse
+import sys
+import tempfile
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.batch import recommend_keywords_batch, resolve_profiles
+from app.recommend.keywords import recommend_courses_keywords
+from app.recommend.sessions import KeywordSessionState
+from scripts.bench_batch import random_profiles
+from scripts.synthetic import synthetic_intersects, write_catalogue
+
+
+def integer_intersects(courses: int, seed: int):
+    """Synthetic intersections as counts up to 240, so sums of a few rows overflow uint8."""
+    matrix = synthetic_intersects(courses, per_row=40, seed=seed)
+    matrix.data = np.minimum(np.rint(matrix.data * 120), 240)
+    matrix.eliminate_zeros()
+    return matrix.astype(np.float64), matrix.astype(np.uint8)
+
+
+def summary(recommendations):
+    return [(r.ID, r.RECOMMENDED_FROM) for r in recommendations]
+
+
+def session_recommend(profile, matrix, courseClient: CourseClient, n: int):
+    """Rates the courses of a profile one by one in a `KeywordSessionState`."""
+    liked, disliked, skipped = profile
+    session = KeywordSessionState(matrix, courseClient)
+    for codes, action in ((liked, "liked"), (disliked, "disliked"), (skipped, "skipped")):
+        for code in codes:
+            session.rate(code, action)
+    return session.recommend(n)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=2000)
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--max-liked", type=int, default=8)
+    parser.add_argument("--n", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, args.courses, text_length=64)
+        courseClient = CourseClient(f"{tmp}/courses")
+    reference, unsigned = integer_intersects(args.courses, seed=0)
+    profiles = random_profiles(courseClient.df["CODE"].tolist(), args.profiles, args.max_liked, seed=0)
+    resolved = resolve_profiles(profiles, courseClient.get_course_ids_by_codes)
+
+    checks = {
+        "single": lambda matrix: [
+            summary(recommend_courses_keywords(*profile, courseClient, args.n, matrix)) for profile in profiles
+        ],
+        "batch": lambda matrix: [
+            summary(recommendations) for recommendations in recommend_keywords_batch(resolved, matrix, courseClient, args.n)
+        ],
+        "session": lambda matrix: [
+            summary(session_recommend(profile, matrix, courseClient, args.n)) for profile in profiles
+        ],
+    }
+    failed = False
+    for name, run in checks.items():
+        expected, got = run(reference), run(unsigned)
+        mismatches = sum(a != b for a, b in zip(expected, got))
+        print(f"{name:>8}: {mismatches} of {len(profiles)} profiles differ between float64 and uint8")
+        failed |= bool(mismatches)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
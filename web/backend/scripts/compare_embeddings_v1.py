@@ -0,0 +1,95 @@
+"""
+Regression check for the vectorized `sort_by_similarity` (model `embeddings_v1`).
+
+Compares the batched implementation against the original per-candidate loop on
+synthetic catalogues and reports the speedup. Run from `web/backend`:
+
+    python -m scripts.compare_embeddings_v1 --courses 20000 --dim 768
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.recommend.embeddings import sort_by_similarity
+from app.recommend.store import EmbeddingStore
+
+
+def legacy_sort_by_similarity(liked_embeds, disliked_embeds, candidate_embeds):
+    """The original per-candidate implementation, kept as the reference."""
+    liked_norms = np.linalg.norm(liked_embeds, axis=1)
+    disliked_norms = np.linalg.norm(disliked_embeds, axis=1)
+
+    scores = []
+    for i, candidate in enumerate(candidate_embeds):
+        candidate_norm = np.linalg.norm(candidate)
+        disliked_similarities = np.dot(disliked_embeds, candidate) / (disliked_norms * candidate_norm)
+        if np.any(disliked_similarities >= 0.9):
+            scores.append((i, candidate, 0))
+            continue
+        liked_similarities = np.dot(liked_embeds, candidate) / (liked_norms * candidate_norm)
+        scores.append((i, candidate, float(np.sum(liked_similarities ** 2))))
+
+    scores.sort(key=lambda x: x[2], reverse=True)
+    return scores
+
+
+def synthetic_embeddings(courses: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Clustered data with varying norms, so near-duplicates and dislike hits occur
+    centers = rng.standard_normal((max(courses // 50, 1), dim))
+    embeds = centers[rng.integers(len(centers), size=courses)] + 0.3 * rng.standard_normal((courses, dim))
+    return (embeds * rng.uniform(0.5, 2.0, size=(courses, 1))).astype(np.float32)
+
+
+def compare(courses: int, dim: int, liked: int, disliked: int, top: int, seed: int) -> bool:
+    rng = np.random.default_rng(seed)
+    embeds = synthetic_embeddings(courses, dim, seed)
+    normalized = EmbeddingStore.normalize(embeds)
+    liked_ids = rng.choice(courses, size=liked, replace=False)
+    disliked_ids = rng.choice(courses, size=disliked, replace=False)
+
+    start = time.perf_counter()
+    legacy = legacy_sort_by_similarity(embeds[liked_ids], embeds[disliked_ids], embeds)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    idxs, scores = sort_by_similarity(normalized[liked_ids], normalized[disliked_ids], normalized, k=top)
+    new_time = time.perf_counter() - start
+
+    legacy_idxs = np.array([i for i, _, _ in legacy[:top]])
+    legacy_scores = np.array([s for _, _, s in legacy[:top]], dtype=np.float32)
+
+    # Candidates whose scores differ only by float rounding may swap places
+    same_scores = np.allclose(scores, legacy_scores, rtol=1e-5, atol=1e-6)
+    near_tie = np.isclose(legacy_scores[:-1], legacy_scores[1:], rtol=1e-5, atol=1e-6)
+    tied = np.zeros(len(legacy_scores), dtype=bool)
+    tied[:-1] |= near_tie
+    tied[1:] |= near_tie
+    ok = bool(same_scores and np.array_equal(idxs[~tied], legacy_idxs[~tied]))
+    print(
+        f"courses={courses:>7} dim={dim:>4} liked={liked:>3} disliked={disliked:>2} "
+        f"legacy={legacy_time * 1000:9.1f}ms vectorized={new_time * 1000:7.2f}ms "
+        f"speedup={legacy_time / new_time:7.1f}x {'OK' if ok else 'MISMATCH'}"
+    )
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = True
+    for courses in args.courses:
+        for liked, disliked in [(1, 0), (3, 2), (15, 5)]:
+            ok &= compare(courses, args.dim, liked, disliked, args.top, args.seed)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
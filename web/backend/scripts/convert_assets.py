@@ -0,0 +1,78 @@
+"""
+Converts an asset directory to the mapped layout (`app/assets.py`) shared by all workers:
+
+- `mapped/embeddings.bin`, `mapped/embedding_norms.bin`: the normalized float32 embeddings
+  the embedding store would otherwise compute privately in every worker, and their norms;
+- `mapped/intersects_*.{data,indices,indptr}.bin`: the keyword intersection CSR arrays,
+  uncompressed instead of zipped in `.npz`;
+- `courses/courses_text.arrow`: the catalogue text columns as an uncompressed Arrow IPC
+  file, memory-mapped by `COURSE_CATALOGUE_MODE=lean` while `courses.parquet` is unchanged.
+
+Run from `web/backend` after every asset update (the server falls back to the original
+files while the layout is stale):
+
+    python -m scripts.convert_assets assets
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+
+from app.assets import MAPPED_DIR, MappedAssetWriter
+from app.courses import TEXT_COLUMNS, text_source_metadata
+from app.recommend.store import EmbeddingStore
+
+EMBEDDINGS = "embeddings_tomas_03.npy"
+INTERSECTS = {"intersects_sparse": "intersects_sparse.npz", "intersects_tfidf": "intersects_tfidf.npz"}
+COURSES = os.path.join("courses", "courses.parquet")
+
+
+def convert(assets_dir: str) -> None:
+    writer = MappedAssetWriter(os.path.join(assets_dir, MAPPED_DIR))
+
+    start = time.perf_counter()
+    embeds, norms = EmbeddingStore.prepare(np.load(os.path.join(assets_dir, EMBEDDINGS), mmap_mode="r"))
+    writer.add_array("embeddings", embeds)
+    writer.add_array("embedding_norms", norms)
+    writer.add_source(assets_dir, EMBEDDINGS)
+    print(f"embeddings: {embeds.shape} {embeds.dtype}, {embeds.nbytes / 2**20:.1f} MiB ({time.perf_counter() - start:.1f}s)")
+
+    for name, source in INTERSECTS.items():
+        start = time.perf_counter()
+        matrix = sp.load_npz(os.path.join(assets_dir, source))
+        writer.add_csr(name, matrix)
+        writer.add_source(assets_dir, source)
+        size = sum(array.nbytes for array in (matrix.data, matrix.indices, matrix.indptr))
+        print(f"{name}: {matrix.shape}, {matrix.nnz} nonzeros, {size / 2**20:.1f} MiB ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    courses_path = os.path.join(assets_dir, COURSES)
+    columns = [column for column in TEXT_COLUMNS if column in pq.read_schema(courses_path).names]
+    table = pq.read_table(courses_path, columns=columns)
+    # Lets the catalogue detect an Arrow file written from an older courses.parquet
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **text_source_metadata(courses_path)})
+    arrow_path = os.path.join(assets_dir, "courses", "courses_text.arrow")
+    # Uncompressed, so the columns are used zero-copy straight from the mapping
+    with pa.OSFile(arrow_path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as ipc:
+            ipc.write_table(table)
+    os.replace(arrow_path + ".tmp", arrow_path)
+    writer.add_source(assets_dir, COURSES)
+    print(f"courses_text.arrow: {table.num_rows} rows, {len(columns)} columns, {os.path.getsize(arrow_path) / 2**20:.1f} MiB ({time.perf_counter() - start:.1f}s)")
+
+    writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets", help="Asset directory to convert in place")
+    args = parser.parse_args()
+    convert(args.assets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Fits the PCA projection used by `EMBEDDING_PROJECTION=pca` and stores it as
+`embeddings_pca.npz` next to the embeddings. Rerun whenever the embeddings change.
+Run from `web/backend`:
+
+    python -m scripts.fit_projection assets --dim 128
+
+The server can use fewer components than stored (`EMBEDDING_PROJECTION_DIM`), so fit
+the largest dimension you want to try; `scripts.bench_projection` reports recall and
+latency per dimension.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.recommend.projection import PROJECTION_ASSET, fit_projection, save_projection
+from app.recommend.store import EmbeddingStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("assets", nargs="?", default="assets")
+    parser.add_argument("--dim", type=int, default=128)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    embeds, _ = EmbeddingStore.prepare(np.load(os.path.join(args.assets, "embeddings_tomas_03.npy"), mmap_mode="r"))
+    components, mean = fit_projection(embeds, args.dim)
+
+    # Share of the variance around the mean kept by the components
+    centered = embeds - mean
+    kept = np.square(centered @ components.T).sum() / np.square(centered).sum()
+    save_projection(os.path.join(args.assets, PROJECTION_ASSET), components, mean, len(embeds))
+    print(f"Fitted {args.dim} of {embeds.shape[1]} dimensions on {len(embeds)} courses in {time.perf_counter() - start:.1f}s, {kept:.1%} of the variance kept")
+
+
+if __name__ == "__main__":
+    main()
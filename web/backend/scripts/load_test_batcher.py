@@ -0,0 +1,88 @@
+"""
+Load test of the similarity micro-batcher (`SIMILARITY_BATCH_WINDOW_MS`).
+
+Runs an embedding model from many threads at once, like the executor serving
+concurrent `/recommendations` requests, with and without the batcher, and reports
+throughput, latency percentiles and the achieved batch sizes. Run from `web/backend`:
+
+    python -m scripts.load_test_batcher --courses 20000 --dim 768 --concurrency 1 8 32 64
+"""
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.courses import CourseClient
+from app.recommend.batcher import SimilarityBatcher
+from app.recommend.embeddings import recommend_average, recommend_max, recommend_max_with_combinations
+from app.recommend.store import EmbeddingStore
+from scripts.synthetic import synthetic_embeddings, write_catalogue
+
+MODELS = {
+    "embeddings_max": recommend_max,
+    "average": recommend_average,
+    "max_with_combinations": recommend_max_with_combinations,
+}
+
+
+def run(store, courseClient, model, profiles, concurrency: int, n: int):
+    def request(profile):
+        start = time.perf_counter()
+        result = model(*profile, store, courseClient, n)
+        return time.perf_counter() - start, [r.ID for r in result]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(request, profiles))
+        elapsed = time.perf_counter() - start
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    return len(profiles) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99), [ids for _, ids in results]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--model", choices=MODELS, default="embeddings_max")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-requests", type=int, default=32)
+    parser.add_argument("--n", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalogue(tmp, args.courses, text_length=64)
+        courseClient = CourseClient(f"{tmp}/courses")
+    store = EmbeddingStore(synthetic_embeddings(args.courses, args.dim), courseClient)
+    model = MODELS[args.model]
+
+    rng = random.Random(0)
+    codes = courseClient.df["CODE"].tolist()
+    profiles = [(rng.sample(codes, rng.randint(1, 6)), rng.sample(codes, rng.randrange(3)), []) for _ in range(args.requests)]
+
+    print(f"{args.model}, {args.requests} requests, {args.courses} courses, dim {args.dim}, window {args.window_ms} ms")
+    print(f"{'threads':>7} {'direct req/s':>13} {'p50/p99 ms':>14} {'batched req/s':>14} {'p50/p99 ms':>14} {'mean batch':>11} {'speedup':>8}")
+    for concurrency in args.concurrency:
+        store.batcher = None
+        direct, direct_p50, direct_p99, expected = run(store, courseClient, model, profiles, concurrency, args.n)
+
+        store.batcher = SimilarityBatcher(store.embeds, window=args.window_ms / 1000, max_requests=args.max_requests)
+        batched, batched_p50, batched_p99, got = run(store, courseClient, model, profiles, concurrency, args.n)
+        stats = store.batcher.stats()
+        store.batcher.close()
+        store.batcher = None
+
+        differ = sum(a != b for a, b in zip(expected, got))
+        print(
+            f"{concurrency:>7} {direct:>13.1f} {direct_p50:>6.1f}/{direct_p99:<7.1f} {batched:>14.1f} "
+            f"{batched_p50:>6.1f}/{batched_p99:<7.1f} {stats['mean_batch_requests']:>11.1f} {batched / direct:>7.2f}x"
+            + (f"  ({differ} results differ)" if differ else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
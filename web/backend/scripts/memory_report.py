@@ -0,0 +1,151 @@
+"""
+Memory report of several server workers loading the same assets, like `uvicorn --workers N`.
+
+Starts N worker processes per asset layout. Each one loads the assets through
+`main.load_assets`, serves a few recommendations of every model and then reads the
+whole embedding matrix, both intersection matrices and a sample of the full course
+records, so every page it would eventually use is resident. While all workers are
+alive the report reads their /proc/<pid>/smaps_rollup:
+
+- RSS counts every resident page of the worker, shared or not;
+- PSS splits shared pages evenly between the workers mapping them, so the sum of the
+  PSS of all workers is what they really use together;
+- shared / private are the pages also mapped by another process / only by this one.
+
+With the compressed assets every worker decompresses its own copy of the intersection
+matrices and normalizes its own copy of the embeddings (private pages). With the mapped
+layout (`scripts.convert_assets`) and `COURSE_CATALOGUE_MODE=lean` those pages come from
+the page cache and are counted once. Linux only. Run from `web/backend`:
+
+    python -m scripts.memory_report --courses 10000 --dim 768 --workers 4
+    python -m scripts.memory_report --assets assets --workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+from typing import Dict, List
+
+from app.assets import MAPPED_DIR
+from app.memory import mapped_file_memory, memory_breakdown
+from scripts.convert_assets import convert
+from scripts.synthetic import write_catalogue
+
+MODELS = ["embeddings_v1", "embeddings_max", "average", "max_with_combinations", "keywords_gemini", "keywords_tfidf"]
+
+
+def worker(assets_dir: str, catalogue_mode: str, ready, done) -> None:
+    os.environ["COURSE_CATALOGUE_MODE"] = catalogue_mode
+    import main
+
+    asyncio.run(main.load_assets(assets_dir))
+    rng = random.Random(os.getpid())
+    codes = sorted(set(code for code in main.embedding_store.codes if code is not None))
+    for model in MODELS:
+        for _ in range(5):
+            liked = rng.sample(codes, 5)
+            recommended = main.run_model(model, liked, rng.sample(codes, 2), [], 20, 0.5)
+            main.encode_recommendations(recommended, None, summary=False)
+
+    # Touch everything a long-running worker ends up reading
+    main.embedding_store.similarity(main.embedding_store.embeds[0])
+    for matrix in (main.kwd_intersects_gemini, main.kwd_intersects_tfidf):
+        float(matrix.data.sum()), int(matrix.indices.sum())
+    for course_id in rng.sample(range(len(main.embedding_store)), min(2000, len(main.embedding_store))):
+        main.course_json.fragment(course_id, summary=False)
+
+    ready.set()
+    done.wait()
+
+
+def measure(assets_dir: str, catalogue_mode: str, workers: int) -> List[Dict[str, int]]:
+    context = multiprocessing.get_context("spawn")
+    done = context.Event()
+    processes = []
+    for _ in range(workers):
+        ready = context.Event()
+        process = context.Process(target=worker, args=(assets_dir, catalogue_mode, ready, done))
+        process.start()
+        processes.append((process, ready))
+
+    try:
+        for process, ready in processes:
+            while not ready.wait(1):
+                if not process.is_alive():
+                    raise RuntimeError(f"Worker {process.pid} exited with code {process.exitcode}")
+
+        mapped_dir = os.path.join(assets_dir, MAPPED_DIR)
+        asset_files = [os.path.join(mapped_dir, name) for name in os.listdir(mapped_dir)] if os.path.isdir(mapped_dir) else []
+        asset_files.append(os.path.join(assets_dir, "courses", "courses_text.arrow"))
+        reports = []
+        for process, _ in processes:
+            usage = memory_breakdown(str(process.pid))
+            files = mapped_file_memory(asset_files, str(process.pid))
+            usage["mapped_assets_rss"] = sum(file.get("rss", 0) for file in files.values())
+            usage["mapped_assets_pss"] = sum(file.get("pss", 0) for file in files.values())
+            reports.append(usage)
+        return reports
+    finally:
+        done.set()
+        for process, _ in processes:
+            process.join()
+
+
+def print_reports(title: str, reports: List[Dict[str, int]]) -> None:
+    mib = 2**20
+    print(f"\n{title}")
+    print(f"{'worker':>6} {'RSS':>9} {'PSS':>9} {'shared':>9} {'private':>9} {'mapped RSS':>11} {'mapped PSS':>11}  (MiB)")
+    for i, usage in enumerate(reports):
+        shared = usage.get("shared_clean", 0) + usage.get("shared_dirty", 0)
+        private = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+        print(
+            f"{i:>6} {usage.get('rss', 0) / mib:>9.1f} {usage.get('pss', 0) / mib:>9.1f} {shared / mib:>9.1f} "
+            f"{private / mib:>9.1f} {usage['mapped_assets_rss'] / mib:>11.1f} {usage['mapped_assets_pss'] / mib:>11.1f}"
+        )
+    print(
+        f"{'total':>6} {sum(u.get('rss', 0) for u in reports) / mib:>9.1f} {sum(u.get('pss', 0) for u in reports) / mib:>9.1f}"
+        "   <- summed RSS counts shared pages once per worker, summed PSS once in total"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", help="Existing asset directory, a synthetic one is generated when omitted")
+    parser.add_argument("--courses", type=int, default=10000)
+    parser.add_argument("--text-length", type=int, default=500, help="Characters per synthetic text field")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--intersects-per-row", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.assets is None:
+            print(f"Writing {args.courses} synthetic courses...")
+            assets_dir = write_catalogue(tmp, args.courses, args.dim, text_length=args.text_length, intersects_per_row=args.intersects_per_row)
+        else:
+            assets_dir = args.assets
+
+        mapped_dir = os.path.join(assets_dir, MAPPED_DIR)
+        arrow_path = os.path.join(assets_dir, "courses", "courses_text.arrow")
+        if os.path.exists(mapped_dir) or os.path.exists(arrow_path):
+            if args.assets is not None:
+                raise SystemExit(f"{assets_dir} is already converted, pass a copy of the original assets")
+
+        print_reports(f"Compressed assets, full catalogue, {args.workers} workers", measure(assets_dir, "full", args.workers))
+
+        print("\nConverting to the mapped layout...")
+        convert(assets_dir)
+        try:
+            print_reports(f"Mapped assets, lean catalogue, {args.workers} workers", measure(assets_dir, "lean", args.workers))
+        finally:
+            if args.assets is not None:
+                # Leaves the given asset directory as it was
+                shutil.rmtree(mapped_dir)
+                os.remove(arrow_path)
+
+
+if __name__ == "__main__":
+    main()
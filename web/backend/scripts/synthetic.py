@@ -0,0 +1,144 @@
+"""
+Synthetic course catalogues for the benchmark and regression scripts.
+
+The real assets are stored in Git LFS; these helpers write files with the same
+layout (`courses/courses.parquet`, `courses/id_lookup.parquet`, embeddings) so
+the scripts can run anywhere.
+"""
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+RATING_KEYS = [
+    "theoretical_vs_practical", "usefulness", "interest", "stem_vs_humanities",
+    "abstract_vs_specific", "difficulty", "multidisciplinary", "project_based", "creative",
+]
+TEXT_FIELDS = [
+    "PREREQUISITES", "FIELDS_OF_STUDY", "LECTURES_SEMINARS_HOMEWORK", "SYLLABUS", "OBJECTIVES",
+    "TEXT_PREREQUISITS", "ASSESMENT_METHODS", "TEACHING_METHODS", "TEACHER_INFO",
+    "LEARNING_OUTCOMES", "LITERATURE", "FOLLOWUP_COURSES",
+]
+FACULTIES = ["FI", "PřF", "ESF", "FF", "LF", "PrF", "FSS", "PdF", "FSpS", "FaF"]
+
+
+def synthetic_embeddings(courses: int, dim: int, seed: int = 0, decay: float = 0.0, block_rows: int = 65536) -> np.ndarray:
+    """
+    Clustered float32 embeddings with varying norms, so near-duplicates occur like in real data.
+
+    :param decay: Component i is scaled by (i + 1) ** -decay, in a random basis. 0 gives isotropic
+        clusters; text embeddings rather have a decaying spectrum (e.g. 0.5), which is what
+        dimensionality reduction exploits.
+    :param block_rows: Rows generated at a time, bounding the float64 temporaries for large catalogues.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(courses // 50, 1), dim))
+    basis = np.linalg.qr(rng.standard_normal((dim, dim)))[0] if decay else None
+    embeds = np.empty((courses, dim), dtype=np.float32)
+    for start in range(0, courses, block_rows):
+        rows = min(block_rows, courses - start)
+        block = centers[rng.integers(len(centers), size=rows)] + 0.3 * rng.standard_normal((rows, dim))
+        if basis is not None:
+            block = (block * np.arange(1, dim + 1) ** -decay) @ basis
+        embeds[start:start + rows] = block * rng.uniform(0.5, 2.0, size=(rows, 1))
+    return embeds
+
+
+def synthetic_intersects(courses: int, per_row: int = 200, seed: int = 0) -> sp.csr_matrix:
+    """
+    Symmetric sparse keyword intersection matrix with about `per_row` nonzeros per course.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.repeat(np.arange(courses), per_row // 2)
+    cols = rng.integers(courses, size=len(rows))
+    data = rng.random(len(rows))
+    upper = sp.csr_matrix((data, (rows, cols)), shape=(courses, courses))
+    return (upper + upper.T).tocsr()
+
+
+def synthetic_courses(courses: int, seed: int = 0, text_length: int = 2000) -> pd.DataFrame:
+    """
+    A course table with every column of `Course`, small metadata and long free-text columns.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(["kurz", "analýza", "systém", "data", "metoda", "teorie", "praxe", "model", "jazyk", "právo"])
+    teachers = [f"doc. Teacher {i}" for i in range(max(courses // 10, 3))]
+    keywords = [f"keyword {i}" for i in range(max(courses // 5, 8))]
+
+    def text(i: int) -> str:
+        return " ".join(words[(i + np.arange(text_length // 8)) % len(words)])
+
+    rows = []
+    for i in range(courses):
+        name = "Diplomová práce" if i % 100 == 0 else f"Kurz {i}"
+        row = {
+            "CODE": f"SYN{i:06d}",
+            "FACULTY": FACULTIES[i % len(FACULTIES)],
+            "NAME": name,
+            "NAME_EN": "Master's thesis" if i % 100 == 0 else f"Course {i}",
+            "LANGUAGE": "Czech",
+            "SEMESTER": "autumn 2024",
+            "CREDITS": str(2 + i % 6),
+            "DEPARTMENT": f"Department {i % 200}",
+            "TEACHERS": " - ".join(teachers[j] for j in rng.choice(len(teachers), size=3, replace=False)),
+            "COMPLETION": "zk",
+            "TYPE_OF_STUDY": "bachelor",
+            "STUDENTS_ENROLLED": str(i % 300),
+            "STUDENTS_PASSED": str(i % 250),
+            "AVERAGE_GRADE": "B",
+            "KEYWORDS": [keywords[j] for j in rng.choice(len(keywords), size=8, replace=False)],
+            "DESCRIPTION": text(i)[:300],
+            "RATINGS": {key: str(rng.integers(10)) for key in RATING_KEYS},
+            "ID": i,
+        }
+        row.update({field: text(i + k) for k, field in enumerate(TEXT_FIELDS)})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_minimal_catalogue(directory: str, courses: int) -> str:
+    """
+    Writes only the columns the recommenders need (codes, IDs and names), for catalogues too
+    large for `synthetic_courses`, e.g. the ANN benchmark with a million courses.
+    """
+    os.makedirs(os.path.join(directory, "courses"), exist_ok=True)
+    ids = np.arange(courses)
+    pd.DataFrame({
+        "CODE": [f"SYN{i:07d}" for i in ids],
+        "NAME": [f"Kurz {i}" for i in ids],
+        "NAME_EN": [f"Course {i}" for i in ids],
+        "ID": ids,
+    }).to_parquet(os.path.join(directory, "courses", "courses.parquet"), engine="pyarrow")
+    pd.DataFrame({"ID": ids, "index": ids}).to_parquet(os.path.join(directory, "courses", "id_lookup.parquet"), engine="pyarrow")
+    return directory
+
+
+def write_catalogue(
+    directory: str,
+    courses: int,
+    dim: Optional[int] = None,
+    seed: int = 0,
+    text_length: int = 2000,
+    intersects_per_row: Optional[int] = None,
+) -> str:
+    """
+    Writes a synthetic asset directory and returns its path.
+
+    :param directory: Target asset directory.
+    :param courses: Number of courses.
+    :param dim: Embedding dimension, no embeddings are written when None.
+    :param intersects_per_row: Nonzeros per course of both keyword intersection matrices, none are written when None.
+    """
+    os.makedirs(os.path.join(directory, "courses"), exist_ok=True)
+    synthetic_courses(courses, seed, text_length).to_parquet(os.path.join(directory, "courses", "courses.parquet"), engine="pyarrow")
+    pd.DataFrame({"ID": np.arange(courses), "index": np.arange(courses)}).to_parquet(
+        os.path.join(directory, "courses", "id_lookup.parquet"), engine="pyarrow"
+    )
+    if dim is not None:
+        np.save(os.path.join(directory, "embeddings_tomas_03.npy"), synthetic_embeddings(courses, dim, seed))
+    if intersects_per_row is not None:
+        for offset, name in enumerate(["intersects_sparse.npz", "intersects_tfidf.npz"]):
+            sp.save_npz(os.path.join(directory, name), synthetic_intersects(courses, intersects_per_row, seed + offset))
+    return directory
@@ -14,7 +14,7 @@ const getRecommendations = async (
   let model = storageController.getPredictionModel() ?? "max_with_combinations";
   const relevance = storageController.getRelevance();
 
-  const res = (await api.post(`/recommendations?n=1&model=${model}&relevance=${relevance}`, {
+  const res = (await api.post(`/recommendations?n=1&model=${model}&relevance=${relevance}&view=summary`, {
     body: {
       liked: [...params.liked.values()].map((course) => course.CODE),
       disliked: [...params.disliked.values()].map((course) => course.CODE),